@@ -0,0 +1,133 @@
+import atexit
+import queue
+import threading
+import time
+import requests
+from metricas import metrics
+
+# ==========================================
+# 📨 ALERTAS DE TELEGRAM EN SEGUNDO PLANO
+# ==========================================
+# El escáner solo encola (send() vuelve al instante). Un hilo aparte:
+#   - junta las alertas que llegan en ráfaga en un solo mensaje "digest",
+#   - respeta el límite de Telegram por chat (1/s en privados, 20/min en grupos),
+#   - reintenta con backoff (y respeta retry_after en los 429),
+#   - reutiliza una sola conexión HTTP (requests.Session).
+# Al salir del proceso se vacía la cola (con un tope de espera).
+
+API_URL = "https://api.telegram.org"
+COALESCE_SECONDS = 1.0      # Ventana para juntar alertas de una misma ráfaga
+PRIVATE_INTERVAL = 1.0      # Segundos mínimos entre mensajes a un chat privado
+GROUP_INTERVAL = 3.0        # Grupos/canales (id negativo): 20 mensajes por minuto
+MAX_LENGTH = 4000           # Telegram corta en 4096 caracteres
+MAX_RETRIES = 5
+SEPARATOR = "\n\n〰️〰️〰️〰️〰️\n\n"
+
+
+def build_digests(messages, max_length=MAX_LENGTH):
+    """Une los mensajes en uno (o varios, si no entran en max_length)."""
+    if len(messages) == 1:
+        return list(messages)
+    digests = []
+    current = []
+    size = 0
+    for msg in messages:
+        extra = len(msg) + (len(SEPARATOR) if current else 0)
+        if current and size + extra > max_length:
+            digests.append(current)
+            current, size = [], 0
+            extra = len(msg)
+        current.append(msg)
+        size += extra
+    digests.append(current)
+    return [group[0] if len(group) == 1 else f"📦 {len(group)} alertas juntas:\n\n" + SEPARATOR.join(group)
+            for group in digests]
+
+
+class AlertDispatcher:
+    def __init__(self, token, chat_id, parse_mode=None, api_url=API_URL):
+        self.url = f"{api_url}/bot{token}/sendMessage"
+        self.chat_id = chat_id
+        self.parse_mode = parse_mode
+        self.interval = GROUP_INTERVAL if str(chat_id).startswith('-') else PRIVATE_INTERVAL
+        self.queue = queue.Queue()
+        self.session = requests.Session()
+        self.thread = None
+        self.last_sent = 0.0
+        self.lock = threading.Lock()
+
+    def send(self, text):
+        """Encola la alerta y vuelve enseguida (el envío lo hace el hilo de fondo)."""
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True, name="alertas-telegram")
+                self.thread.start()
+                atexit.register(self.close)
+        self.queue.put(text)
+        metrics.set('telegram_queue_size', self.queue.qsize())
+
+    def close(self, timeout=15):
+        """Espera (hasta timeout) a que se envíe lo encolado."""
+        if self.thread is None:
+            return
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.1)
+
+    # --- HILO DE FONDO ---
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            # Ventana de ráfaga + espera del límite por chat: lo que llegue mientras tanto se junta
+            deadline = max(time.monotonic() + COALESCE_SECONDS, self.last_sent + self.interval)
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            if len(batch) > 1:
+                metrics.inc('telegram_coalesced_total', len(batch))
+
+            for text in build_digests(batch):
+                wait = self.last_sent + self.interval - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                self._deliver(text)
+            for _ in batch:
+                self.queue.task_done()
+            metrics.set('telegram_queue_size', self.queue.qsize())
+
+    def _deliver(self, text):
+        payload = {'chat_id': self.chat_id, 'text': text}
+        if self.parse_mode:
+            payload['parse_mode'] = self.parse_mode
+        backoff = 1
+        for attempt in range(MAX_RETRIES):
+            try:
+                response = self.session.post(self.url, data=payload, timeout=10)
+                self.last_sent = time.monotonic()
+                if response.status_code == 200:
+                    metrics.inc('telegram_sent_total')
+                    return True
+                if response.status_code == 429:
+                    # Telegram indica cuánto esperar
+                    wait = response.json().get('parameters', {}).get('retry_after', backoff)
+                elif 400 <= response.status_code < 500:
+                    print(f"Error Telegram {response.status_code}: {response.text[:200]}")
+                    metrics.inc('telegram_errors_total', status=response.status_code)
+                    return False  # Mensaje inválido: reintentar no sirve
+                else:
+                    wait = backoff
+                metrics.inc('telegram_retries_total', status=response.status_code)
+            except Exception as e:
+                print(f"Error Telegram: {e}")
+                metrics.inc('telegram_retries_total', status='error')
+                wait = backoff
+            time.sleep(wait)
+            backoff = min(backoff * 2, 60)
+        metrics.inc('telegram_errors_total', status='reintentos')
+        print(f"❌ Alerta descartada tras {MAX_RETRIES} intentos: {text[:80]}...")
+        return False
@@ -0,0 +1,272 @@
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+import indicadores
+import reglas
+import config_acciones
+
+# ==========================================
+# 🧪 BACKTEST VECTORIZADO DE LAS REGLAS KDJ (LOS TRES BOTS)
+# ==========================================
+# Lee velas históricas de archivos locales y evalúa en CADA vela las mismas
+# condiciones que los bots en vivo, sin bucle vela a vela:
+#
+# - Para cada vela base se arma la ventana que el bot habría descargado en
+#   ese momento (N velas de cada timeframe, la última a medio formar) y se
+#   calculan los indicadores de todas las ventanas juntas con indicadores.py.
+#   Por eso el MACD sobre 35 velas del scalper da lo mismo que en vivo.
+# - Los cooldowns se aplican después, solo sobre las velas candidatas.
+#
+# Archivos: <carpeta>/<SIMBOLO>_<intervalo>.csv (formato klines de Binance,
+# con o sin encabezado) o .npy ([open_time, o, h, l, c, v], como la caché de
+# bot_acciones).
+#
+# Uso: python backtest.py scalper|rescate|acciones <carpeta> [salida.csv]
+
+CHUNK = 20000   # Ventanas por bloque de cálculo (acota la memoria)
+
+BOTS = {
+    # base: intervalo de los archivos; tfs: {tf: (bucket, ventana)}; horizons: en velas base
+    'scalper': {'base': '1m', 'tfs': {'1m': (60_000, 35), '3m': (180_000, 35), '5m': (300_000, 35)},
+                'macd': True, 'cooldown': 900, 'horizons': [5, 15, 60]},
+    'rescate': {'base': '15m', 'tfs': {'15m': (900_000, 100), '1h': (3_600_000, 100), '4h': (14_400_000, 100)},
+                'macd': False, 'cooldown': 14400, 'horizons': [4, 16, 96]},
+    'acciones': {'base': '1h', 'tfs': {'1h': ('1h', 154), '4h': ('4h', 44), '1d': ('1d', 126)},
+                 'macd': False, 'cooldown': 10800, 'horizons': [1, 7, 35]},
+}
+ACCIONES_TZ = 'America/New_York'
+
+
+# --- CARGA DE DATOS ---
+def load_candles(path):
+    """Devuelve {'open_time' (ms), 'open', 'high', 'low', 'close', 'volume'} ordenado y sin repetidos."""
+    if path.endswith('.npy'):
+        arr = np.load(path)
+    else:
+        df = pd.read_csv(path, header=None, usecols=range(6))
+        if not str(df.iloc[0, 0]).strip().lstrip('-').replace('.', '', 1).isdigit():
+            df = df.iloc[1:]  # Tenía encabezado
+        arr = df.to_numpy(dtype=np.float64)
+    t = arr[:, 0].astype(np.int64)
+    if len(t) and t.max() < 10 ** 11:
+        t = t * 1000      # Epoch en segundos (caché de acciones)
+    elif len(t) and t.max() > 10 ** 14:
+        t = t // 1000     # Epoch en microsegundos (dumps nuevos de Binance)
+    t, first = np.unique(t, return_index=True)
+    arr = arr[first]
+    return {'open_time': t, 'open': arr[:, 1], 'high': arr[:, 2], 'low': arr[:, 3],
+            'close': arr[:, 4], 'volume': arr[:, 5]}
+
+
+def find_files(folder, interval):
+    """{símbolo: ruta} de los archivos <SIMBOLO>_<intervalo>.csv|.npy de la carpeta."""
+    files = {}
+    for name in sorted(os.listdir(folder)):
+        stem, ext = os.path.splitext(name)
+        if ext in ('.csv', '.npy') and stem.endswith('_' + interval):
+            files[stem[:-len(interval) - 1]] = os.path.join(folder, name)
+    return files
+
+
+# --- VENTANAS "COMO SE VEÍAN EN VIVO" ---
+def buckets(frame, spec):
+    """Id de vela superior para cada vela base (entero o regla de calendario de acciones)."""
+    t = frame['open_time']
+    if isinstance(spec, int):
+        return t // spec
+    if spec == '1h':
+        return np.arange(len(t))
+    local = pd.to_datetime(t, unit='ms', utc=True).tz_convert(ACCIONES_TZ).tz_localize(None)
+    rule = '4h' if spec == '4h' else 'D'
+    return local.floor(rule).asi8
+
+
+def forming_windows(frame, bucket, window):
+    """
+    Para cada vela base i: matrices (N × window) de high/low/close del timeframe
+    superior tal como se veían al cierre de i (window-1 velas cerradas + la vela
+    en curso, parcial). `valid` marca las filas con historia suficiente.
+    """
+    high, low, close = frame['high'], frame['low'], frame['close']
+    new_block = np.r_[True, bucket[1:] != bucket[:-1]]
+    seg = np.cumsum(new_block) - 1
+    starts = np.flatnonzero(new_block)
+    ends = np.r_[starts[1:], len(bucket)]
+
+    # Velas superiores completas y vela en curso al cierre de cada vela base
+    closed_h = np.maximum.reduceat(high, starts)
+    closed_l = np.minimum.reduceat(low, starts)
+    closed_c = close[ends - 1]
+    part_h = pd.Series(high).groupby(seg).cummax().to_numpy()
+    part_l = pd.Series(low).groupby(seg).cummin().to_numpy()
+
+    prev = window - 1
+    pad = np.full(prev, np.nan)
+
+    def build(closed, partial, rows):
+        hist = np.lib.stride_tricks.sliding_window_view(np.r_[pad, closed], prev)[seg[rows]]
+        return np.concatenate([hist, partial[rows, None]], axis=1)
+
+    def windows(rows):
+        return build(closed_h, part_h, rows), build(closed_l, part_l, rows), build(closed_c, close, rows)
+
+    return windows, seg >= prev
+
+
+def indicator_table(frame, bot):
+    """
+    Indicadores de la última vela de cada ventana, para cada vela base:
+    {'j_<tf>', 'd_<tf>', ['s_<tf>']} + 'valid'.
+    """
+    cfg = BOTS[bot]
+    n = len(frame['close'])
+    table = {'valid': np.ones(n, dtype=bool)}
+    for tf, (spec, window) in cfg['tfs'].items():
+        windows, valid = forming_windows(frame, buckets(frame, spec), window)
+        table['valid'] &= valid
+        j = np.full(n, np.nan)
+        d = np.full(n, np.nan)
+        s = np.full(n, np.nan)
+        for start in range(0, n, CHUNK):
+            rows = np.arange(start, min(start + CHUNK, n))
+            rows = rows[valid[rows]]
+            if len(rows) == 0:
+                continue
+            H, L, C = windows(rows)
+            _, dd, jj = indicadores.kdj(H, L, C)
+            j[rows] = jj[:, -1]
+            d[rows] = dd[:, -1]
+            if cfg['macd']:
+                s[rows] = indicadores.macd(C)[1][:, -1]
+        table['j_' + tf] = j
+        table['d_' + tf] = d
+        if cfg['macd']:
+            table['s_' + tf] = s
+    return table
+
+
+def btc_change(frame, btc):
+    """Cambio % de la vela 1h de BTC en curso al cierre de cada vela base (0 si falta el dato)."""
+    if btc is None:
+        return np.zeros(len(frame['close']))
+    hour = btc['open_time'] // 3_600_000
+    new_block = np.r_[True, hour[1:] != hour[:-1]]
+    hour_open = btc['open'][np.flatnonzero(new_block)][np.cumsum(new_block) - 1]
+    chg = (btc['close'] - hour_open) / hour_open * 100
+    pos = np.minimum(np.searchsorted(btc['open_time'], frame['open_time']), len(hour) - 1)
+    found = btc['open_time'][pos] == frame['open_time']
+    out = np.zeros(len(frame['close']))
+    out[found] = chg[pos[found]]
+    return out
+
+
+# --- REGLAS (LAS MISMAS QUE USAN LOS BOTS, VER reglas.py) ---
+RULES = {
+    'scalper': reglas.from_config('scalper', reglas.SCALPER),
+    'rescate': reglas.from_config('rescate', reglas.RESCATE),
+    'acciones': reglas.RuleSet(config_acciones.REGLAS),
+}
+SIGNAL_NAMES = {'compra': 'BUY', 'venta': 'SELL'}
+
+
+def signals(bot, t, symbol=None, btc_chg=None):
+    """Devuelve {'LONG': máscara, 'SHORT': máscara} (o BUY/SELL para acciones)."""
+    rules = RULES[bot]
+    features = dict(t, portfolio=float(symbol in config_acciones.PORTFOLIO))
+    if btc_chg is not None:
+        features['btc_chg'] = btc_chg
+    first = rules.first_match(rules.masks(rules.matrix(features, len(t['valid']))))
+    out = {}
+    for r, name in enumerate(rules.names):
+        mask = t['valid'] & (first == r)
+        # acciones: sin BUSCAR_NUEVAS_ENTRADAS solo se mira el portfolio
+        if bot == 'acciones' and symbol not in config_acciones.PORTFOLIO and not config_acciones.BUSCAR_NUEVAS_ENTRADAS:
+            mask[:] = False
+        out[SIGNAL_NAMES.get(name, name)] = mask
+    return out
+
+
+def apply_cooldown(times_ms, cooldown_s):
+    """Índices (sobre times_ms ordenado) que sobreviven al cooldown del bot."""
+    if cooldown_s <= 0 or len(times_ms) == 0:
+        return np.arange(len(times_ms))
+    keep = []
+    next_ok = -np.inf
+    for i, t in enumerate(times_ms):  # Solo recorre velas candidatas (pocas)
+        if t >= next_ok:
+            keep.append(i)
+            next_ok = t + cooldown_s * 1000
+    return np.array(keep, dtype=np.int64)
+
+
+def forward_returns(close, idx, horizons):
+    """Retorno % desde el cierre de la señal hasta h velas después (NaN si no hay datos)."""
+    out = {}
+    for h in horizons:
+        fut = idx + h
+        r = np.full(len(idx), np.nan)
+        ok = fut < len(close)
+        r[ok] = (close[fut[ok]] / close[idx[ok]] - 1) * 100
+        out[f'ret_{h}'] = r
+    return out
+
+
+def backtest_symbol(bot, symbol, path, btc_path=None):
+    frame = load_candles(path)
+    cfg = BOTS[bot]
+    table = indicator_table(frame, bot)
+    btc = None
+    if bot == 'scalper':
+        btc = btc_change(frame, load_candles(btc_path) if btc_path else None)
+    masks = signals(bot, table, symbol, btc)
+
+    # Cooldown compartido entre tipos de señal (como el filtro de cooldowns.py antes de descargar)
+    any_signal = np.zeros(len(frame['close']), dtype=bool)
+    for mask in masks.values():
+        any_signal |= mask
+    cand = np.flatnonzero(any_signal)
+    cand = cand[apply_cooldown(frame['open_time'][cand], cfg['cooldown'])]
+
+    rows = {
+        'symbol': symbol,
+        'time': pd.to_datetime(frame['open_time'][cand], unit='ms', utc=True),
+        'signal': np.select([masks[k][cand] for k in masks], list(masks), default=''),
+        'price': frame['close'][cand],
+    }
+    for tf in cfg['tfs']:
+        rows['j_' + tf] = table['j_' + tf][cand]
+        rows['d_' + tf] = table['d_' + tf][cand]
+    rows.update(forward_returns(frame['close'], cand, cfg['horizons']))
+    return pd.DataFrame(rows), len(frame['close'])
+
+
+def run(bot, folder, out_path=None, workers=None):
+    cfg = BOTS[bot]
+    files = find_files(folder, cfg['base'])
+    btc_path = find_files(folder, '1m').get('BTCUSDT') if bot == 'scalper' else None
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(backtest_symbol, bot, s, p, btc_path) for s, p in files.items()]
+        parts = [f.result() for f in futures]
+    elapsed = time.perf_counter() - t0
+
+    result = pd.concat([p for p, _ in parts], ignore_index=True) if parts else pd.DataFrame()
+    bars = sum(n for _, n in parts)
+    print(f"🧪 {bot}: {len(files)} símbolos, {bars:,} velas en {elapsed:.1f}s -> {len(result)} señales")
+    if len(result):
+        ret_cols = [c for c in result.columns if c.startswith('ret_')]
+        print(result.groupby('signal')[ret_cols].agg(['count', 'mean']).round(3).to_string())
+    if out_path:
+        result.to_csv(out_path, index=False)
+        print(f"💾 Guardado en {out_path}")
+    return result
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3 or sys.argv[1] not in BOTS:
+        print("Uso: python backtest.py scalper|rescate|acciones <carpeta> [salida.csv]")
+        sys.exit(1)
+    run(sys.argv[1], sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
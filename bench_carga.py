@@ -0,0 +1,584 @@
+import argparse
+import contextlib
+import functools
+import io
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+import requests
+import velas
+from cache_velas import kline_weight
+
+# ==========================================
+# 🏋️ PRUEBA DE CARGA DE PUNTA A PUNTA (BINANCE / YAHOO / TELEGRAM FALSOS)
+# ==========================================
+# Levanta un servidor local (en otro proceso) que imita lo que usan los bots:
+#   - Binance Futures: /fapi/v1/klines, ticker/24hr, ticker/price, exchangeInfo
+#     (+ /api/v3/ping para python-binance), con el header de peso usado
+#   - Yahoo: /v8/finance/chart/{ticker} (ver download_chart más abajo)
+#   - Telegram: /bot{token}/sendMessage (registra la hora de llegada)
+# Velas: con --grabacion se reproducen velas reales grabadas (ver GRABACIÓN
+# más abajo); sin grabación (o para lo que no está grabado) son sintéticas
+# pero estables: cada moneda es una suma de ondas con fase propia (crc32 del
+# nombre), alineada al reloj real, así las cachés atadas al cierre de vela se
+# comportan como en vivo y las monedas pasan por los extremos de J/D.
+#
+# Fallas configurables: latencia (+ variación), % de errores 5xx, % de 429
+# (con Retry-After), tope de peso por minuto, % de errores de Telegram y una
+# caída total de Telegram de N segundos al arrancar.
+#
+# Los bots apuntan al servidor por configuración (las mismas claves sirven
+# para correr el bot real contra el servidor suelto):
+#   config.py:          BINANCE_URL, TELEGRAM_API_URL
+#   config_acciones.py: TELEGRAM_API_URL
+# yfinance no deja cambiar el servidor: para acciones la caché OHLCV recibe
+# acá un cliente propio de la API chart (download_chart). Esos números miden
+# la caché, la cascada y las alertas del bot, pero NO a yfinance.
+#
+# Uso:
+#   python bench_carga.py scalper  --monedas 1000 --latencia 80 --errores 0.01 --limite 0.01
+#   python bench_carga.py rescate  --monedas 200 --ciclos 5
+#   python bench_carga.py acciones --monedas 300 --telegram-caida 20
+#   python bench_carga.py servidor --monedas 1000      (solo el servidor, para el bot real)
+#   python bench_carga.py grabar grabacion.json --monedas 200   (necesita conexión)
+#   python bench_carga.py scalper --grabacion grabacion.json
+#
+# Reporta por ciclo: duración, monedas escaneadas, monedas/s, pedidos, errores
+# servidos y peso; al final, la latencia de las alertas desde el cierre de la
+# vela (inicio del ciclo − SCAN_OFFSET_SECONDS del bot) hasta el POST a Telegram.
+
+PORT = 8770
+RANGE_DAYS = {'5d': 5, '1mo': 31, '3mo': 92, '6mo': 183, '1y': 366}
+WEIGHTS = {'/fapi/v1/ticker/24hr': 40, '/fapi/v1/ticker/price': 2, '/fapi/v1/exchangeInfo': 1}
+SAMPLES = 5  # Puntos por vela para el máximo/mínimo
+
+
+# --- MERCADO SINTÉTICO ---
+def symbol_params(symbol):
+    rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+    calm = symbol.startswith('BTC')  # BTC quieto: el filtro BTC del scalper no corta todo
+    return {
+        'base': 30000.0 if calm else 10 ** rng.uniform(-2, 3),
+        'p1': rng.uniform(30, 240), 'a1': 0.001 if calm else rng.uniform(0.005, 0.02),         # Onda corta (min)
+        'p2': rng.uniform(1440, 7200), 'a2': 0.005 if calm else rng.uniform(0.05, 0.2),        # Onda larga (min)
+        'ph1': rng.uniform(0, 2 * math.pi), 'ph2': rng.uniform(0, 2 * math.pi),
+        'seed': float(zlib.crc32(symbol.encode()) % 1000),
+    }
+
+
+def price(params, minutes):
+    """Precio en `minutes` (minutos desde epoch, array) de una moneda."""
+    t = np.asarray(minutes, dtype=np.float64)
+    noise = np.modf(np.sin(np.floor(t * 4) * 12.9898 + params['seed']) * 43758.5453)[0]
+    wave = (params['a1'] * np.sin(2 * np.pi * t / params['p1'] + params['ph1'])
+            + params['a2'] * np.sin(2 * np.pi * t / params['p2'] + params['ph2']))
+    return params['base'] * np.exp(wave + 0.001 * noise)
+
+
+def candles(symbol, step_ms, opens_ms, now_ms):
+    """(open, high, low, close) de las velas que abren en opens_ms (la última puede estar en curso)."""
+    params = symbol_params(symbol)
+    offsets = np.linspace(0, step_ms - 1, SAMPLES)
+    points = np.minimum(opens_ms[:, None] + offsets[None, :], now_ms) / 60000
+    prices = price(params, points)
+    return prices[:, 0], prices.max(axis=1), prices.min(axis=1), prices[:, -1]
+
+
+def klines_body(symbol, interval, limit, now_ms):
+    step = velas.interval_ms(interval)
+    opens = (now_ms // step * step) - step * np.arange(limit - 1, -1, -1)
+    o, h, l, c = candles(symbol, step, opens, now_ms)
+    rows = [f'[{t},"{o_:.8g}","{h_:.8g}","{l_:.8g}","{c_:.8g}","1000",{t + step - 1},"100000",100,"500","50000","0"]'
+            for t, o_, h_, l_, c_ in zip(opens.tolist(), o, h, l, c)]
+    return ('[' + ','.join(rows) + ']').encode()
+
+
+def chart_body(ticker, interval, start_ms, now_ms, rows=None):
+    """Respuesta de /v8/finance/chart: de `rows` (velas grabadas, formato klines) o sintética."""
+    if rows is not None:
+        opens = np.array([r[0] for r in rows], dtype=np.int64)
+        o, h, l, c, v = (np.array([float(r[i]) for r in rows]) for i in range(1, 6))
+    else:
+        step = velas.interval_ms(interval)
+        opens = np.arange(-(-start_ms // step) * step, now_ms + 1, step, dtype=np.int64)
+        o, h, l, c = candles(ticker, step, opens, now_ms)
+        v = np.full(len(opens), 1000.0)
+    quote = {'open': o.tolist(), 'high': h.tolist(), 'low': l.tolist(), 'close': c.tolist(), 'volume': v.tolist()}
+    result = {'meta': {'symbol': ticker, 'exchangeTimezoneName': 'America/New_York'},
+              'timestamp': (opens // 1000).tolist(), 'indicators': {'quote': [quote]}}
+    return json.dumps({'chart': {'result': [result], 'error': None}}).encode()
+
+
+# --- GRABACIÓN ---
+# Formatos aceptados (velas tal como las devuelve /fapi/v1/klines):
+#   {símbolo: {intervalo: velas}}       verificar_mtf.py grabar, bench_carga.py grabar
+#   {símbolo: velas de 1m}              bench_micro.py grabar
+# bench_carga.py grabar agrega '_ticker_24hr' y '_exchangeInfo' (los de esas
+# monedas): se sirven tal cual, con el precio de la última vela reproducida.
+# Sin ellos se arman como en el mercado sintético.
+#
+# Reproducción: la grabación se corre en el tiempo (un múltiplo del intervalo
+# más largo, así los cierres caen en los cierres reales) para que al arrancar
+# el servidor queden --adelanto minutos por reproducir; a partir de ahí cada
+# vela aparece cuando le toca según el reloj. La vela en curso se sirve con
+# sus valores finales grabados. Al agotarse, la última vela queda quieta.
+RECORD_INTERVALS = ['1m', '3m', '5m', '15m', '1h', '4h']
+RECORD_BARS = 500
+
+
+class Recording:
+    def __init__(self, path, ahead_minutes, now_ms=None):
+        with open(path) as f:
+            raw = json.load(f)
+        self.tickers = {t['symbol']: t for t in raw.pop('_ticker_24hr', [])}
+        self.info = raw.pop('_exchangeInfo', None)
+        self.series = {}  # {(símbolo, intervalo): (open_times, velas)}
+        for symbol, data in raw.items():
+            if isinstance(data, list):
+                data = {'1m': data}  # bench_micro.py grabar
+            for interval, rows in data.items():
+                if rows:
+                    self.series[(symbol, interval)] = (np.array([r[0] for r in rows], dtype=np.int64), rows)
+        self.symbols = sorted({symbol for symbol, _ in self.series})
+        self.finest = {}  # {símbolo: intervalo más corto grabado} (para el precio)
+        self.end = self.offset = 0
+        if not self.series:
+            return
+        for symbol, interval in sorted(self.series, key=lambda key: velas.interval_ms(key[1]), reverse=True):
+            self.finest[symbol] = interval
+        self.end = min(opens[-1] + velas.interval_ms(i) - 1 for (_, i), (opens, _) in self.series.items())
+        begin = max(opens[0] for opens, _ in self.series.values())
+        cursor = max(begin, self.end - ahead_minutes * 60000)
+        align = max(velas.interval_ms(i) for _, i in self.series)
+        now_ms = time.time() * 1000 if now_ms is None else now_ms
+        self.offset = -(-int(now_ms - cursor) // align) * align  # Redondeo hacia arriba: quedan >= adelanto minutos
+
+    def rows(self, symbol, interval, now_ms, limit=None, start_ms=None):
+        """Velas grabadas visibles en now_ms, con los tiempos corridos al reloj actual (None = no grabado)."""
+        found = self.series.get((symbol, interval))
+        if found is None:
+            return None
+        opens, rows = found
+        stop = int(np.searchsorted(opens, min(now_ms - self.offset, self.end), side='right'))
+        first = max(0, stop - limit) if limit else int(np.searchsorted(opens, start_ms - self.offset))
+        return [[int(r[0]) + self.offset, *r[1:6], int(r[6]) + self.offset, *r[7:]] for r in rows[first:stop]]
+
+    def last_price(self, symbol, now_ms):
+        if symbol not in self.finest:
+            return None
+        rows = self.rows(symbol, self.finest[symbol], now_ms, limit=1)
+        return float(rows[-1][4]) if rows else None
+
+    def exhausted(self, now_ms):
+        return bool(self.series) and now_ms - self.offset > self.end
+
+
+def record(path, opts):
+    """Graba velas reales (+ ticker 24hr y exchangeInfo) de las --monedas más operadas o de opts.simbolos."""
+    base = "https://fapi.binance.com"
+    tickers = requests.get(base + "/fapi/v1/ticker/24hr", timeout=10).json()
+    symbols = opts.simbolos or [t['symbol'] for t in sorted(tickers, key=lambda t: -float(t['quoteVolume']))
+                                if t['symbol'].endswith('USDT')][:opts.monedas]
+    symbols = list(dict.fromkeys(['BTCUSDT'] + symbols))  # BTC siempre: filtro del scalper
+    recording = {}
+    for n, symbol in enumerate(symbols, 1):
+        recording[symbol] = {}
+        for interval in RECORD_INTERVALS:
+            params = {'symbol': symbol, 'interval': interval, 'limit': RECORD_BARS}
+            recording[symbol][interval] = requests.get(base + "/fapi/v1/klines", params=params, timeout=10).json()
+        print(f"   {n}/{len(symbols)} {symbol}", end='\r')
+    chosen = set(symbols)
+    recording['_ticker_24hr'] = [t for t in tickers if t['symbol'] in chosen]
+    info = requests.get(base + "/fapi/v1/exchangeInfo", timeout=10).json()
+    recording['_exchangeInfo'] = {'symbols': [{'symbol': s['symbol'], 'onboardDate': s.get('onboardDate')}
+                                              for s in info['symbols'] if s['symbol'] in chosen]}
+    with open(path, 'w') as f:
+        json.dump(recording, f)
+    print(f"💾 Grabación guardada: {path} ({len(symbols)} monedas × {len(RECORD_INTERVALS)} intervalos × {RECORD_BARS} velas)")
+
+
+@functools.lru_cache(maxsize=None)
+def recorded_symbols(path):
+    return tuple(s for s in Recording(path, 0).symbols if s != 'BTCUSDT')
+
+
+def universe(opts):
+    """Monedas del servidor (sin BTCUSDT): las grabadas o SYM0000USDT... sintéticas."""
+    if opts.grabacion:
+        return list(recorded_symbols(opts.grabacion))
+    return [f"SYM{i:04d}USDT" for i in range(opts.monedas)]
+
+
+# --- CLIENTE YAHOO DEL HARNESS ---
+CHART_WORKERS = 8  # Pedidos simultáneos a /v8/finance/chart
+
+
+def download_chart(chart_url, tickers, period=None, interval='1d', start=None):
+    """Reemplazo de datos_acciones.download_batch contra /v8/finance/chart (solo para este harness)."""
+    from concurrent.futures import ThreadPoolExecutor
+    import pandas as pd
+    from datos_acciones import EXCHANGE_TZ, FIELDS
+    from metricas import metrics
+
+    params = {'interval': interval}
+    if start is not None:
+        params['period1'] = int(pd.Timestamp(start, tz=EXCHANGE_TZ).timestamp())
+        params['period2'] = int(time.time())
+    else:
+        params['range'] = period
+    session = requests.Session()
+
+    def fetch(ticker):
+        response = session.get(f"{chart_url}/v8/finance/chart/{ticker}", params=params, timeout=10)
+        response.raise_for_status()
+        result = response.json()['chart']['result'][0]
+        quote = result['indicators']['quote'][0]
+        index = pd.to_datetime(result.get('timestamp', []), unit='s', utc=True).tz_convert(EXCHANGE_TZ)
+        if interval == '1d':
+            index = index.normalize()  # Como yf.download: el diario va indexado por fecha, no por hora de apertura
+        return pd.DataFrame({field: quote[field.lower()] for field in FIELDS}, index=index, dtype=np.float64).dropna(how='all')
+
+    frames, errors = {}, {}
+    metrics.inc('yahoo_downloads_total', interval=interval)
+    with metrics.timer('yahoo_download_seconds', interval=interval), ThreadPoolExecutor(max_workers=CHART_WORKERS) as pool:
+        futures = {ticker: pool.submit(fetch, ticker) for ticker in tickers}
+    for ticker, future in futures.items():
+        try:
+            df = future.result()
+        except Exception as e:
+            errors[ticker] = f"descarga fallida: {e}"
+        else:
+            if df.empty:
+                errors[ticker] = 'sin datos'
+            else:
+                frames[ticker] = df
+                continue
+        metrics.inc('yahoo_ticker_errors_total', interval=interval)
+    return frames, errors
+
+
+# --- SERVIDOR FALSO ---
+class FakeMarket:
+    def __init__(self, opts):
+        self.opts = opts
+        self.recording = Recording(opts.grabacion, opts.adelanto) if opts.grabacion else None
+        recorded = self.recording is not None
+        self.symbols = ['BTCUSDT'] + ([s for s in self.recording.symbols if s != 'BTCUSDT'] if recorded else universe(opts))
+        self.synthetic = set()  # Intervalos pedidos que faltan (en alguna moneda) en la grabación
+        self.exhausted = False
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.weight_minute = 0
+        self.weight = 0
+        self.telegram = []      # [(hora, alertas en el mensaje, código)]
+        self.reset()
+
+    def reset(self):
+        """Arranca un ciclo nuevo: devuelve lo contado desde el anterior."""
+        with self.lock:
+            stats = getattr(self, 'stats', None)
+            self.stats = {'pedidos': 0, 'errores': 0, 'limitados': 0, 'peso_max': 0, 'simbolos': set()}
+        if stats is not None:
+            stats['simbolos'] = len(stats['simbolos'])
+        return stats
+
+    def charge(self, weight):
+        """Suma peso al minuto en curso; devuelve el peso usado (lo que manda Binance en el header)."""
+        with self.lock:
+            minute = int(time.time() // 60)
+            if minute != self.weight_minute:
+                self.weight_minute, self.weight = minute, 0
+            self.weight += weight
+            self.stats['peso_max'] = max(self.stats['peso_max'], self.weight)
+            return self.weight
+
+    def fault(self, weight):
+        """Latencia + falla inyectada para un pedido a Binance/Yahoo: (código, peso usado) o (None, peso)."""
+        opts = self.opts
+        if opts.latencia:
+            time.sleep((opts.latencia + random.uniform(0, opts.variacion)) / 1000)
+        used = self.charge(weight)
+        with self.lock:
+            self.stats['pedidos'] += 1
+        if random.random() < opts.limite or (opts.peso_max and used > opts.peso_max):
+            with self.lock:
+                self.stats['limitados'] += 1
+            return 429, used
+        if random.random() < opts.errores:
+            with self.lock:
+                self.stats['errores'] += 1
+            return random.choice((500, 502, 503)), used
+        return None, used
+
+    def recorded(self, symbol, interval, now_ms, **window):
+        """Velas de la grabación, o None (y aviso, una vez) si hay que usar las sintéticas."""
+        if self.recording is None:
+            return None
+        rows = self.recording.rows(symbol, interval, now_ms, **window)
+        with self.lock:
+            if rows is None and interval not in self.synthetic:
+                self.synthetic.add(interval)
+                print(f"🧪 {interval} no está grabado (ej. {symbol}): esas velas son sintéticas")
+            if not self.exhausted and self.recording.exhausted(now_ms):
+                self.exhausted = True
+                print("⏹️ Grabación agotada: la última vela queda quieta (usar más --adelanto o una grabación más larga)")
+        return rows
+
+    def last_price(self, symbol, now_ms):
+        recorded = self.recording.last_price(symbol, now_ms) if self.recording is not None else None
+        return recorded if recorded is not None else float(price(symbol_params(symbol), now_ms / 60000))
+
+    def telegram_status(self):
+        opts = self.opts
+        if time.time() - self.started < opts.telegram_caida or random.random() < opts.telegram_errores:
+            return 502
+        return 429 if random.random() < opts.telegram_limite else 200
+
+
+def serve(opts, port):
+    market = FakeMarket(opts)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, como los servidores reales
+
+        def reply(self, status, body, headers=None):
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, str(value))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            now_ms = int(time.time() * 1000)
+            path = url.path
+
+            # Control del harness
+            if path == '/_carga/ciclo':
+                return self.reply(200, json.dumps(market.reset()).encode())
+            if path == '/_carga/telegram':
+                return self.reply(200, json.dumps(market.telegram).encode())
+            if path in ('/api/v3/ping', '/fapi/v1/ping'):
+                return self.reply(200, b'{}')
+            if path in ('/api/v3/time', '/fapi/v1/time'):
+                return self.reply(200, json.dumps({'serverTime': now_ms}).encode())
+
+            symbol = query.get('symbol', [None])[0]
+            limit = int(query.get('limit', ['500'])[0])
+            weight = kline_weight(limit) if path == '/fapi/v1/klines' else WEIGHTS.get(path, 1)
+            status, used = market.fault(weight)
+            headers = {'X-MBX-USED-WEIGHT-1M': used}
+            if status == 429:
+                return self.reply(429, b'{"code":-1003,"msg":"Too many requests."}', {**headers, 'Retry-After': 1})
+            if status is not None:
+                return self.reply(status, b'{"code":-1001,"msg":"Internal error; unable to process your request."}', headers)
+
+            if path == '/fapi/v1/klines':
+                with market.lock:
+                    market.stats['simbolos'].add(symbol)
+                rows = market.recorded(symbol, query['interval'][0], now_ms, limit=limit)
+                if rows is not None:
+                    return self.reply(200, json.dumps(rows).encode(), headers)
+                return self.reply(200, klines_body(symbol, query['interval'][0], limit, now_ms), headers)
+            if path.startswith('/v8/finance/chart/'):
+                ticker = path.rsplit('/', 1)[-1]
+                with market.lock:
+                    market.stats['simbolos'].add(ticker)
+                interval = query.get('interval', ['1d'])[0]
+                if 'period1' in query:
+                    start_ms = int(query['period1'][0]) * 1000
+                else:
+                    start_ms = now_ms - RANGE_DAYS.get(query.get('range', ['1mo'])[0], 31) * 86_400_000
+                rows = market.recorded(ticker, interval, now_ms, start_ms=start_ms)
+                return self.reply(200, chart_body(ticker, interval, start_ms, now_ms, rows), headers)
+            if path in ('/fapi/v1/ticker/24hr', '/fapi/v1/ticker/price'):
+                names = [symbol] if symbol else market.symbols
+                last = {s: market.last_price(s, now_ms) for s in names}
+                recorded = market.recording.tickers if market.recording is not None else {}
+                if path.endswith('24hr'):
+                    items = [{**recorded.get(s, {'symbol': s, 'quoteVolume': '500000000'}), 'lastPrice': f"{p:.8g}"}
+                             for s, p in last.items()]
+                else:
+                    items = [{'symbol': s, 'price': f"{p:.8g}"} for s, p in last.items()]
+                return self.reply(200, json.dumps(items[0] if symbol else items).encode(), headers)
+            if path == '/fapi/v1/exchangeInfo':
+                info = market.recording.info if market.recording is not None else None
+                info = info or {'symbols': [{'symbol': s, 'onboardDate': 1_569_398_400_000} for s in market.symbols]}
+                return self.reply(200, json.dumps(info).encode(), headers)
+            return self.reply(404, b'{"code":-1100,"msg":"Not found"}')
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+            if not urlparse(self.path).path.endswith('/sendMessage'):
+                return self.reply(404, b'{"ok":false}')
+            text = parse_qs(body).get('text', [''])[0]
+            alerts = int(text.split()[1]) if text.startswith('📦') else 1  # Digest: "📦 N alertas juntas"
+            status = market.telegram_status()
+            with market.lock:
+                market.telegram.append((time.time(), alerts, status))
+            if status == 429:
+                return self.reply(429, b'{"ok":false,"error_code":429,"parameters":{"retry_after":1}}')
+            if status != 200:
+                return self.reply(status, b'{"ok":false,"error_code":502,"description":"Bad Gateway"}')
+            return self.reply(200, b'{"ok":true,"result":{}}')
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 256
+
+    Server(('127.0.0.1', port), Handler).serve_forever()
+
+
+# --- BOTS ---
+def setup_bot(name, url, opts, workdir):
+    """Importa el bot apuntado al servidor. Devuelve (ciclo, offset, telegram, cerrar)."""
+    import cooldowns
+    db = os.path.join(workdir, 'cooldowns.sqlite')
+    if name == 'acciones':
+        import config_acciones as config
+        config.TELEGRAM_API_URL = url
+        config.BUSCAR_NUEVAS_ENTRADAS = True
+        names = universe(opts) if opts.grabacion else [f"T{i:04d}" for i in range(opts.monedas)]
+        config.WATCHLIST_DICT = {name: name for name in names}
+        import bot_acciones as bot
+        import datos_acciones
+        download = lambda tickers, **window: download_chart(url, tickers, **window)  # En lugar de yfinance
+        bot.ohlcv_cache = datos_acciones.OHLCVCache(os.path.join(workdir, 'cache_ohlcv'), download=download)
+        bot.alert_cooldowns = cooldowns.CooldownStore('acciones', {'*': bot.COOLDOWN_SECONDS}, path=db)
+        return bot.escanear_oportunidades, bot.SCAN_OFFSET_SECONDS, bot.telegram, lambda: None
+
+    import config
+    config.BINANCE_URL = url
+    config.TELEGRAM_API_URL = url
+    if name == 'rescate':
+        import bot_rescate as bot
+        bot.WATCHLIST = universe(opts)
+        bot.alert_cooldowns = cooldowns.CooldownStore('rescate', {'*': bot.COOLDOWN_SECONDS}, path=db)
+        return bot.scan_cycle, bot.SCAN_OFFSET_SECONDS, bot.telegram, lambda: None
+
+    from concurrent.futures import ThreadPoolExecutor
+    import bot_scalper as bot
+    bot.alert_cooldowns = cooldowns.CooldownStore('scalper', bot.COOLDOWN_SECONDS, path=db)
+    pool = ThreadPoolExecutor(max_workers=bot.MAX_WORKERS)
+    shards = bot.ShardCoordinator(opts.shards, base_url=url) if opts.shards > 1 else None
+    close = shards.close if shards is not None else (lambda: None)
+    return lambda: bot.scan_cycle(pool, shards), bot.SCAN_OFFSET_SECONDS, bot.telegram, close
+
+
+def run(opts):
+    from metricas import metrics
+    ctx = multiprocessing.get_context('spawn')
+    server = ctx.Process(target=serve, args=(opts, opts.puerto), daemon=True)
+    server.start()
+    url = f"http://127.0.0.1:{opts.puerto}"
+    for _ in range(50):
+        try:
+            requests.get(url + '/_carga/ciclo', timeout=1)
+            break
+        except requests.ConnectionError:
+            time.sleep(0.1)
+
+    workdir = tempfile.mkdtemp(prefix='bench_carga_')
+    quiet = contextlib.redirect_stdout(io.StringIO()) if not opts.verbose else contextlib.nullcontext()
+    with quiet:
+        cycle, offset, telegram, close = setup_bot(opts.bot, url, opts, workdir)
+
+    source = f"grabación {opts.grabacion} ({len(universe(opts))} monedas)" if opts.grabacion else f"{opts.monedas} monedas sintéticas"
+    print(f"🏋️ {opts.bot}: {source} | latencia {opts.latencia}+{opts.variacion}ms | "
+          f"errores {opts.errores:.1%} | 429 {opts.limite:.1%} | Telegram caído {opts.telegram_caida}s "
+          f"+ {opts.telegram_errores:.1%} errores")
+    if opts.bot == 'acciones':
+        print("⚠️ acciones: las velas llegan por el cliente chart del harness, no por yfinance "
+              "(los tiempos NO incluyen a yf.download)")
+    print(f"{'ciclo':>6}{'seg':>8}{'monedas':>9}{'mon/s':>8}{'pedidos':>9}{'5xx':>6}{'429':>6}{'peso':>7}{'alertas':>9}")
+    closes, produced = [], []
+    for n in range(opts.ciclos):
+        requests.get(url + '/_carga/ciclo')
+        alerts_before = sum(v for (name, _), v in metrics.counters.items() if name == 'alerts_total')
+        closes.append(time.time() - offset)  # El planificador dispara `offset` segundos después del cierre
+        t0 = time.perf_counter()
+        with quiet:
+            cycle()
+        seconds = time.perf_counter() - t0
+        stats = requests.get(url + '/_carga/ciclo').json()
+        scanned = metrics.gauges.get(('symbols_scanned', ()), stats['simbolos'])
+        alerts = sum(v for (name, _), v in metrics.counters.items() if name == 'alerts_total') - alerts_before
+        produced.append(alerts)
+        print(f"{n + 1:>6}{seconds:>8.2f}{scanned:>9}{scanned / seconds:>8.0f}{stats['pedidos']:>9}"
+              f"{stats['errores']:>6}{stats['limitados']:>6}{stats['peso_max']:>7}{alerts:>9}")
+        if opts.pausa:
+            time.sleep(opts.pausa)
+
+    # Latencia de alertas: la cola sale en orden, así que la i-ésima alerta entregada
+    # es la i-ésima generada y se mide desde el cierre del ciclo que la generó
+    telegram.close(timeout=opts.espera_telegram)
+    posts = requests.get(url + '/_carga/telegram').json()
+    generated = np.repeat(closes, produced)
+    delivered = np.repeat([t for t, _, status in posts if status == 200],
+                          [alerts for _, alerts, status in posts if status == 200])
+    count = min(len(generated), len(delivered))
+    latencies = delivered[:count] - generated[:count]
+    failed = sum(1 for _, _, status in posts if status != 200)
+    print(f"📨 Telegram: {len(posts)} POST ({failed} fallidos) | {len(delivered)} de {len(generated)} alertas entregadas")
+    if count:
+        p50, p95 = np.percentile(latencies, [50, 95])
+        print(f"⏱️ Latencia cierre de vela → POST: p50 {p50:.1f}s | p95 {p95:.1f}s | máx {latencies.max():.1f}s")
+    close()
+    server.terminate()
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Prueba de carga con Binance/Yahoo/Telegram falsos")
+    parser.add_argument('bot', choices=['scalper', 'rescate', 'acciones', 'servidor', 'grabar'])
+    parser.add_argument('simbolos', nargs='*', help="grabar: archivo y (opcional) símbolos")
+    parser.add_argument('--monedas', type=int, default=500, help="Monedas (o tickers) del universo")
+    parser.add_argument('--grabacion', help="JSON de velas grabadas a reproducir (sin esto: mercado sintético)")
+    parser.add_argument('--adelanto', type=float, default=60, help="Minutos de grabación por reproducir al arrancar")
+    parser.add_argument('--ciclos', type=int, default=3)
+    parser.add_argument('--pausa', type=float, default=0, help="Segundos entre ciclos")
+    parser.add_argument('--latencia', type=float, default=50, help="ms por pedido")
+    parser.add_argument('--variacion', type=float, default=50, help="ms extra al azar por pedido")
+    parser.add_argument('--errores', type=float, default=0.0, help="Fracción de pedidos con 5xx")
+    parser.add_argument('--limite', type=float, default=0.0, help="Fracción de pedidos con 429")
+    parser.add_argument('--peso-max', type=int, default=2400, help="Peso por minuto antes de responder 429 (0 = sin tope)")
+    parser.add_argument('--telegram-caida', type=float, default=0, help="Segundos iniciales con Telegram caído")
+    parser.add_argument('--telegram-errores', type=float, default=0.0, help="Fracción de POST con 502")
+    parser.add_argument('--telegram-limite', type=float, default=0.0, help="Fracción de POST con 429")
+    parser.add_argument('--espera-telegram', type=float, default=60, help="Tope para vaciar la cola de alertas al final")
+    parser.add_argument('--shards', type=int, default=1, help="Procesos del scalper")
+    parser.add_argument('--puerto', type=int, default=PORT)
+    parser.add_argument('--verbose', action='store_true', help="Muestra la salida del bot")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    opts = parse_args(sys.argv[1:])
+    if opts.bot == 'grabar':
+        if not opts.simbolos:
+            sys.exit("Uso: python bench_carga.py grabar grabacion.json [SIMBOLOS...] [--monedas N]")
+        path, opts.simbolos = opts.simbolos[0], opts.simbolos[1:]
+        record(path, opts)
+    elif opts.bot == 'servidor':
+        print(f"🏋️ Servidor falso en http://127.0.0.1:{opts.puerto} ({len(universe(opts))} monedas"
+              f"{', grabación ' + opts.grabacion if opts.grabacion else ''})")
+        print(f"   config.py: BINANCE_URL = TELEGRAM_API_URL = 'http://127.0.0.1:{opts.puerto}'")
+        print(f"   config_acciones.py: TELEGRAM_API_URL = 'http://127.0.0.1:{opts.puerto}' (yfinance sigue yendo a Yahoo)")
+        serve(opts, opts.puerto)
+    else:
+        run(opts)
@@ -0,0 +1,82 @@
+import time
+import numpy as np
+import pandas as pd
+import indicadores
+
+# ==========================================
+# ⏱️ BENCHMARK: KDJ/MACD/BOLLINGER VECTORIZADO vs BUCLE POR MONEDA
+# ==========================================
+# Uso: python bench_indicadores.py [monedas] [velas]
+# Compara la versión original (pandas + bcwsma en Python puro, una moneda a
+# la vez) contra indicadores.py (todas las monedas en un solo paso) y
+# verifica que los resultados coincidan.
+
+def bcwsma_original(series, length, weight):
+    result = [series[0]]
+    for i in range(1, len(series)):
+        result.append((weight * series[i] + (length - weight) * result[-1]) / length)
+    return pd.Series(result)
+
+def calculate_kdj_original(df):
+    low = df['low'].rolling(9).min()
+    high = df['high'].rolling(9).max()
+    rsv = 100 * ((df['close'] - low) / (high - low))
+    k = bcwsma_original(rsv.fillna(50), 3, 1)
+    d = bcwsma_original(k.fillna(50), 3, 1)
+    j = 3 * k - 2 * d
+    return k, d, j
+
+def calculate_macd_original(df):
+    close = df['close']
+    macd = close.ewm(span=12).mean() - close.ewm(span=26).mean()
+    sig = macd.ewm(span=9).mean()
+    return macd, sig
+
+def calculate_bollinger_original(df, period=20, std_dev=2):
+    sma = df['close'].rolling(period).mean()
+    std = df['close'].rolling(period).std()
+    return sma + (std * std_dev), sma - (std * std_dev)
+
+def random_candles(n_symbols, n_bars, seed=0):
+    """Velas sintéticas (random walk) con forma monedas × velas."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.004, (n_symbols, n_bars)), axis=1))
+    high = close * (1 + rng.random((n_symbols, n_bars)) * 0.003)
+    low = close * (1 - rng.random((n_symbols, n_bars)) * 0.003)
+    return high, low, close
+
+def run(n_symbols=500, n_bars=35, timeframes=3):
+    high, low, close = random_candles(n_symbols, n_bars)
+    frames = [pd.DataFrame({'high': high[s], 'low': low[s], 'close': close[s]}) for s in range(n_symbols)]
+
+    # --- ORIGINAL: una moneda a la vez ---
+    t0 = time.perf_counter()
+    for _ in range(timeframes):
+        ref = [(calculate_kdj_original(df), calculate_macd_original(df), calculate_bollinger_original(df)) for df in frames]
+    t_orig = time.perf_counter() - t0
+
+    # --- VECTORIZADO: todo el universo de una vez ---
+    t0 = time.perf_counter()
+    for _ in range(timeframes):
+        k, d, j = indicadores.kdj(high, low, close)
+        _, sig = indicadores.macd(close)
+        upper, lower = indicadores.bollinger(close)
+    t_vec = time.perf_counter() - t0
+
+    # --- VERIFICACIÓN ---
+    for s, ((k0, d0, j0), (_, sig0), (up0, _)) in enumerate(ref):
+        assert np.array_equal(k0.to_numpy(), k[s]), f"K distinto en moneda {s}"
+        assert np.array_equal(d0.to_numpy(), d[s]), f"D distinto en moneda {s}"
+        assert np.array_equal(j0.to_numpy(), j[s]), f"J distinto en moneda {s}"
+        assert np.array_equal(sig0.to_numpy(), sig[s]), f"MACD distinto en moneda {s}"
+        assert np.allclose(up0.to_numpy(), upper[s], rtol=1e-12, equal_nan=True), f"Bollinger distinto en moneda {s}"
+
+    print(f"📊 {n_symbols} monedas × {n_bars} velas × {timeframes} timeframes")
+    print(f"   Original:    {t_orig * 1000:9.1f} ms")
+    print(f"   Vectorizado: {t_vec * 1000:9.1f} ms")
+    print(f"   Aceleración: {t_orig / t_vec:9.1f}x (resultados verificados)")
+
+if __name__ == '__main__':
+    import sys
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
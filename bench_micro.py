@@ -0,0 +1,247 @@
+import json
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import indicadores
+import velas
+from bench_indicadores import random_candles
+
+# ==========================================
+# ⏱️ MICRO-BENCHMARKS: INDICADORES Y PARSEO DE VELAS
+# ==========================================
+# Mide el tiempo por llamada y la memoria (tracemalloc) de cada camino
+# caliente con los tamaños reales de los bots:
+#   35 velas  -> bot_scalper (1m/3m/5m)
+#   100 velas -> bot_rescate (15m/1h/4h)
+#   720 velas -> historial largo (bot_acciones 1h, backtest)
+# y de 1 a 500 monedas. La línea base es propia de cada máquina (no se versiona).
+#
+# Uso:
+#   python bench_micro.py                      -> corre y compara contra la línea base
+#   python bench_micro.py guardar              -> corre y guarda la línea base
+#   python bench_micro.py grabar [SIMBOLOS...] -> graba velas reales en FIXTURE_PATH
+#
+# Si existe FIXTURE_PATH se usan esas velas (formato /fapi/v1/klines);
+# si no, velas sintéticas con el mismo formato (strings, 12 columnas).
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_klines.json')
+BARS = [35, 100, 720]
+SYMBOLS = [1, 50, 500]
+TOLERANCE = 0.25        # +25% de tiempo o memoria sobre la línea base = regresión
+MIN_DELTA_MS = 0.05     # Diferencias menores a esto son ruido del reloj
+MIN_SECONDS = 0.2       # Tiempo mínimo de medición por caso
+BASE_URL = "https://fapi.binance.com"
+
+
+# --- FIXTURES ---
+def synthetic_klines(n_symbols, n_bars, seed=0):
+    """Velas con el formato crudo de /fapi/v1/klines (valores como strings)."""
+    high, low, close = random_candles(n_symbols, n_bars, seed)
+    open_ = np.concatenate([close[:, :1], close[:, :-1]], axis=1)
+    t0 = 1_700_000_000_000
+    out = []
+    for s in range(n_symbols):
+        rows = []
+        for i in range(n_bars):
+            t = t0 + i * 60_000
+            rows.append([t, f"{open_[s, i]:.4f}", f"{high[s, i]:.4f}", f"{low[s, i]:.4f}", f"{close[s, i]:.4f}",
+                         "1234.5", t + 59_999, "98765.4", 321, "600.1", "48000.2", "0"])
+        out.append(rows)
+    return out
+
+
+def load_klines(n_symbols, n_bars):
+    """n_symbols series de n_bars velas (del fixture grabado si existe; se reciclan símbolos)."""
+    if os.path.exists(FIXTURE_PATH):
+        with open(FIXTURE_PATH) as f:
+            recorded = [rows for rows in json.load(f).values() if len(rows) >= n_bars]
+        if recorded:
+            return [recorded[s % len(recorded)][-n_bars:] for s in range(n_symbols)]
+    return synthetic_klines(n_symbols, n_bars)
+
+
+def record(symbols, limit=max(BARS)):
+    import requests
+    fixture = {}
+    for symbol in symbols:
+        params = {'symbol': symbol, 'interval': '1m', 'limit': limit}
+        fixture[symbol] = requests.get(BASE_URL + "/fapi/v1/klines", params=params, timeout=10).json()
+    with open(FIXTURE_PATH, 'w') as f:
+        json.dump(fixture, f)
+    print(f"💾 Fixture guardado: {FIXTURE_PATH} ({len(symbols)} monedas × {limit} velas)")
+
+
+# --- CAMINOS MEDIDOS ---
+# parse_dataframe es el parseo que usaban get_klines (bot_scalper) y
+# get_klines_safe (bot_rescate) antes de velas.parse_klines: queda como
+# referencia de tiempo, memoria y resultados.
+def parse_dataframe(raw):
+    df = pd.DataFrame(raw, columns=['timestamp', 'open', 'high', 'low', 'close', 'v', 'ct', 'q', 'n', 'V', 'Q', 'i'])
+    out = df[['open', 'high', 'low', 'close']].astype(float)
+    out['open_time'] = df['timestamp'].astype('int64')
+    return out
+
+
+def check_parsing(klines):
+    """Los indicadores tienen que dar exactamente igual con arrays que con DataFrames."""
+    outputs = []
+    for parse in (parse_dataframe, velas.parse_klines):
+        frames = [parse(raw) for raw in klines]
+        high, low, close = (indicadores.stack_columns(frames, col) for col in ('high', 'low', 'close'))
+        outputs.append(indicadores.kdj(high, low, close) + indicadores.macd(close) + indicadores.bollinger(close))
+    return all(np.array_equal(a, b, equal_nan=True) for a, b in zip(*outputs))
+
+
+def build_cases(klines):
+    """{nombre: función sin argumentos} para un juego de velas (lista de series crudas)."""
+    frames = [velas.parse_klines(raw) for raw in klines]
+    high = indicadores.stack_columns(frames, 'high')
+    low = indicadores.stack_columns(frames, 'low')
+    close = indicadores.stack_columns(frames, 'close')
+    rsv = indicadores._fillna(indicadores.rsv(high, low, close), 50)
+    payloads = [json.dumps(raw).encode() for raw in klines]
+
+    def per_symbol(fn):
+        return lambda: [fn(df) for df in frames]
+
+    return {
+        # Universo completo en un paso (bot_scalper, backtest)
+        'bcwsma': lambda: indicadores.bcwsma(rsv, 3, 1),
+        'kdj': lambda: indicadores.kdj(high, low, close),
+        'macd': lambda: indicadores.macd(close),
+        'bollinger': lambda: indicadores.bollinger(close),
+        # Una moneda a la vez, como calculate_kdj / calculate_bollinger_bands de rescate y acciones
+        'kdj_por_moneda': per_symbol(lambda df: indicadores.kdj(df['high'], df['low'], df['close'])),
+        'bollinger_por_moneda': per_symbol(lambda df: indicadores.bollinger(df['close'])),
+        # Respuesta HTTP -> JSON (velas.loads usa orjson si está instalado)
+        'json_stdlib': lambda: [json.loads(body) for body in payloads],
+        'json_velas': lambda: [velas.loads(body) for body in payloads],
+        # JSON de klines -> velas
+        'parseo_dataframe': lambda: [parse_dataframe(raw) for raw in klines],
+        'parseo_arrays': lambda: [velas.parse_klines(raw) for raw in klines],
+    }
+
+
+# --- MEDICIÓN ---
+def time_call(fn):
+    """Mejor tiempo por llamada (s), repitiendo hasta MIN_SECONDS (el mínimo es lo más estable)."""
+    fn()  # Calentamiento
+    samples = []
+    start = time.perf_counter()
+    while len(samples) < 5 or time.perf_counter() - start < MIN_SECONDS:
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return min(samples)
+
+
+def alloc_call(fn):
+    """(pico de memoria en KB, bloques asignados) durante una llamada."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+    return peak / 1024, blocks
+
+
+def calibrate():
+    """
+    Tiempo (ms) de una carga fija de Python + numpy. Se guarda con la línea
+    base y se usa para escalar los tiempos: así una máquina más lenta (o más
+    cargada) en general no se confunde con una regresión del código.
+    """
+    data = np.random.default_rng(0).random((200, 200))
+    items = [str(x) for x in range(20000)]
+
+    def work():
+        np.cumsum(data, axis=1).sum()
+        [float(x) for x in items]
+    return time_call(work) * 1000
+
+
+def run(bars=BARS, symbols=SYMBOLS):
+    results = {'_calibracion': calibrate()}
+    print(f"{'caso':<22}{'velas':>6}{'monedas':>8}{'ms/llamada':>12}{'µs/moneda':>11}{'KB pico':>10}{'bloques':>9}")
+    for n_bars in bars:
+        for n_symbols in symbols:
+            for name, fn in build_cases(load_klines(n_symbols, n_bars)).items():
+                seconds = time_call(fn)
+                peak_kb, blocks = alloc_call(fn)
+                key = f"{name}|{n_bars}|{n_symbols}"
+                results[key] = {'ms': seconds * 1000, 'kb': peak_kb, 'bloques': blocks}
+                print(f"{name:<22}{n_bars:>6}{n_symbols:>8}{seconds * 1000:>12.3f}"
+                      f"{seconds * 1e6 / n_symbols:>11.1f}{peak_kb:>10.0f}{blocks:>9}")
+    # Calibración al principio y al final: promedia cambios de carga durante la corrida
+    results['_calibracion'] = (results['_calibracion'] + calibrate()) / 2
+    return results
+
+
+def retime(results, keys, rounds=2):
+    """Vuelve a medir los casos marcados (ruido de la máquina) y se queda con el mejor tiempo."""
+    by_size = {}
+    for key in keys:
+        name, n_bars, n_symbols = key.split('|')
+        by_size.setdefault((int(n_bars), int(n_symbols)), []).append(name)
+    for (n_bars, n_symbols), names in by_size.items():
+        cases = build_cases(load_klines(n_symbols, n_bars))
+        for name in names:
+            key = f"{name}|{n_bars}|{n_symbols}"
+            for _ in range(rounds):
+                results[key]['ms'] = min(results[key]['ms'], time_call(cases[name]) * 1000)
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Lista de regresiones (texto) contra la línea base (tiempos escalados por la calibración)."""
+    scale = baseline.get('_calibracion', 1.0) / results.get('_calibracion', 1.0)
+    regressions = []
+    for key, now in results.items():
+        ref = baseline.get(key)
+        if ref is None or key.startswith('_'):
+            continue
+        for metric, value, floor in (('ms', now['ms'] * scale, MIN_DELTA_MS), ('kb', now['kb'], 1)):
+            if value - ref[metric] > floor and value > ref[metric] * (1 + tolerance):
+                regressions.append(f"{key} {metric}: {ref[metric]:.3f} -> {value:.3f} "
+                                   f"(+{(value / ref[metric] - 1) * 100:.0f}%)")
+    return regressions
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args and args[0] == 'grabar':
+        record(args[1:] or ['BTCUSDT', 'ETHUSDT', 'SOLUSDT', 'XRPUSDT', 'DOGEUSDT'])
+        sys.exit(0)
+
+    print(f"🧪 Velas: {'fixture ' + FIXTURE_PATH if os.path.exists(FIXTURE_PATH) else 'sintéticas'}")
+    if not all(check_parsing(load_klines(50, n_bars)) for n_bars in BARS):
+        print("❌ velas.parse_klines no da los mismos indicadores que el parseo con DataFrame")
+        sys.exit(1)
+    results = run()
+
+    if args and args[0] == 'guardar':
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(results, f, indent=1)
+        print(f"💾 Línea base guardada: {BASELINE_PATH}")
+    elif os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+        print(f"⚖️ Máquina {results['_calibracion'] / baseline.get('_calibracion', results['_calibracion']):.2f}x "
+              f"más lenta que en la línea base (los tiempos se escalan)")
+        regressions = compare(results, baseline)
+        if regressions:
+            print(f"🔁 Re-midiendo {len(regressions)} casos sospechosos...")
+            retime(results, {line.split(' ')[0] for line in regressions})
+            regressions = compare(results, baseline)
+        for line in regressions:
+            print(f"❌ Regresión: {line}")
+        print("✅ Sin regresiones." if not regressions else f"❌ {len(regressions)} regresiones (tolerancia {TOLERANCE:.0%}).")
+        sys.exit(1 if regressions else 0)
+    else:
+        print("ℹ️ Sin línea base. Guardala con: python bench_micro.py guardar")
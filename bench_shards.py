@@ -0,0 +1,97 @@
+import json
+import zlib
+import socket
+import sys
+import time
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import bench_micro
+
+# ==========================================
+# ⏱️ BENCHMARK: SHARDING DEL SCALPER EN N PROCESOS
+# ==========================================
+# Uso: python bench_shards.py [monedas] [max_shards]
+# Levanta un Binance falso local (varios procesos escuchando el mismo puerto
+# con SO_REUSEPORT) que sirve velas grabadas (bench_micro.FIXTURE_PATH, o
+# sintéticas con el formato del exchange) y corre el ciclo real del scalper
+# (descarga + parseo + MTF + indicadores + reglas) con 1, 2, 4... shards.
+# Necesita config.py como el bot (se importa bot_scalper).
+
+PORT = 8766
+SERVER_PROCS = 2
+BARS = 185  # MTF_1M_LIMIT
+
+
+def klines_payloads(n_series=50):
+    """Respuestas JSON ya serializadas (se reciclan entre monedas)."""
+    series = bench_micro.load_klines(n_series, BARS)
+    return [json.dumps(rows).encode() for rows in series]
+
+
+def serve(port, payloads):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, como Binance
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            symbol = parse_qs(url.query).get('symbol', [''])[0]
+            body = payloads[zlib.crc32(symbol.encode()) % len(payloads)]
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+
+        def server_bind(self):
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            super().server_bind()
+
+    Server(('127.0.0.1', port), Handler).serve_forever()
+
+
+def run(n_symbols=400, max_shards=None):
+    import bot_scalper
+    max_shards = max_shards or multiprocessing.cpu_count()
+    ctx = multiprocessing.get_context('spawn')
+    payloads = klines_payloads()
+    servers = [ctx.Process(target=serve, args=(PORT, payloads), daemon=True) for _ in range(SERVER_PROCS)]
+    for p in servers:
+        p.start()
+    time.sleep(1)
+
+    base_url = f"http://127.0.0.1:{PORT}"
+    symbols = [f"SYM{i:04d}USDT" for i in range(n_symbols)]
+    print(f"📊 {n_symbols} monedas × {BARS} velas 1m (3m/5m/1h derivadas) | {multiprocessing.cpu_count()} núcleos")
+    print(f"{'shards':>7}{'ciclo s':>10}{'monedas/s':>11}{'escala':>8}{'señales':>9}")
+
+    base = None
+    shards = 1
+    while shards <= max_shards:
+        coordinator = bot_scalper.ShardCoordinator(shards, base_url=base_url)
+        coordinator.scan(symbols[:shards * 4], 0.0)  # Calentamiento (arranque de procesos, conexiones)
+        times = []
+        for _ in range(3):
+            t0 = time.perf_counter()
+            signals, stats = coordinator.scan(symbols, 0.0)
+            times.append(time.perf_counter() - t0)
+        coordinator.close()
+        assert stats['monedas'] == n_symbols, f"se escanearon {stats['monedas']} de {n_symbols}"
+        best = min(times)
+        base = base or best
+        print(f"{shards:>7}{best:>10.2f}{n_symbols / best:>11.0f}{base / best:>7.2f}x{len(signals):>9}")
+        shards *= 2
+
+    for p in servers:
+        p.terminate()
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
@@ -1,11 +1,17 @@
 import time
 import pandas as pd
-import yfinance as yf
-import requests
-import schedule
 from datetime import datetime
 import pytz
 import config_acciones as config 
+import indicadores
+import datos_acciones
+import metricas
+import alertas
+import cooldowns
+import planificador
+import reglas
+import prioridad
+from metricas import metrics
 
 # ==========================================
 # ⚙️ CONFIGURACIÓN GENERAL
@@ -14,19 +20,38 @@ TIMEZONE = pytz.timezone('America/Argentina/Cordoba')
 
 # COOLDOWN: 10800 segundos = 3 HORAS
 # El bot no repetirá la alerta del MISMO activo en menos de este tiempo.
+# Vive en cooldowns.sqlite (ver cooldowns.py): sobrevive a un reinicio y lo
+# comparten varias copias del bot.
 COOLDOWN_SECONDS = 10800  
 
+# MÉTRICAS: http://127.0.0.1:9103/metrics (None = apagado)
+METRICS_PORT = 9103
+PROFILE_DIR = None  # Carpeta para volcar un perfil cProfile por escaneo (None = apagado)
+
+# PLANIFICACIÓN: escaneo 20s después de cada cierre de vela de 5m (Yahoo tarda
+# unos segundos en publicar), solo con el mercado abierto
+SCAN_INTERVAL = '5m'
+SCAN_OFFSET_SECONDS = 20
+
+# NIVELES DE ESCANEO: el portfolio (venta y recompra) en cada ciclo; la
+# watchlist cada 1, 3 o 6 ciclos según qué tan cerca está su J/D diario de la
+# zona de compra (distancia: lo que les falta a J y D en puntos / 100)
+WATCHLIST_REFRESH = {'caliente': 1, 'tibia': 3, 'fria': 6}
+WATCHLIST_HOT = 0.4         # Hasta acá: caliente (ej. J 1D=25, D 1D=40)
+WATCHLIST_WARM = 1.0        # Hasta acá: tibia; más: fría
+WATCHLIST_CHUNK = 25        # Activos de la watchlist por tanda
+SCAN_BUDGET_SECONDS = 120   # Tope por ciclo: las tandas que no entran pasan al próximo
+
 # ==========================================
 # 🧠 FUNCIONES AUXILIARES
 # ==========================================
 
+# Cola en segundo plano (ver alertas.py): el escáner no espera a Telegram
+telegram = alertas.AlertDispatcher(config.TELEGRAM_TOKEN, config.TELEGRAM_CHAT_ID, parse_mode='Markdown',
+                                   api_url=getattr(config, 'TELEGRAM_API_URL', alertas.API_URL))
+
 def send_telegram(msg):
-    try:
-        url = f'https://api.telegram.org/bot{config.TELEGRAM_TOKEN}/sendMessage'
-        payload = {'chat_id': config.TELEGRAM_CHAT_ID, 'text': msg, 'parse_mode': 'Markdown'}
-        requests.post(url, data=payload, timeout=10)
-    except Exception as e:
-        print(f"Error Telegram: {e}")
+    telegram.send(msg)
 
 def mercado_abierto():
     """Devuelve True si es Lunes-Viernes entre 11:00 y 17:00 (Hora Arg)"""
@@ -35,26 +60,11 @@ def mercado_abierto():
     if 11 <= now.hour < 17: return True
     return False
 
-def bcwsma(series, length, weight):
-    # Media móvil suavizada para el cálculo preciso del KDJ
-    result = []
-    for i in range(len(series)):
-        if i == 0: result.append(series[i])
-        else:
-            prev = result[-1]
-            val = (weight * series[i] + (length - weight) * prev) / length
-            result.append(val)
-    return pd.Series(result, index=series.index)
-
 def calculate_kdj(df):
+    # KDJ preciso (bcwsma) desde el motor compartido indicadores.py
     try:
-        low = df['Low'].rolling(9).min()
-        high = df['High'].rolling(9).max()
-        rsv = 100 * ((df['Close'] - low) / (high - low))
-        k = bcwsma(rsv.fillna(50), 3, 1)
-        d = bcwsma(k.fillna(50), 3, 1)
-        j = 3 * k - 2 * d
-        return k, d, j
+        k, d, j = indicadores.kdj(df['High'], df['Low'], df['Close'])
+        return pd.Series(k, index=df.index), pd.Series(d, index=df.index), pd.Series(j, index=df.index)
     except:
         return None, None, None
 
@@ -65,16 +75,45 @@ def get_last_kdj(df):
     if k is None: return None, None
     return j.iloc[-1], d.iloc[-1]
 
+# Reglas de compra/venta (REGLAS en config_acciones.py), compiladas una vez
+RULES = reglas.RuleSet(config.REGLAS)
+# Solo la parte diaria de la compra: mide qué tan cerca está cada activo de la watchlist
+ZONA_COMPRA = reglas.RuleSet({'compra': [c for c in config.REGLAS['compra'] if c[1] == '1d']})
+
+def filtrar_cascada(vivas, X, symbols, tf, data):
+    """
+    Calcula J/D de `tf` para los activos con alguna regla viva, los carga en
+    la matriz X y descarta las reglas que ya no se cumplen (todo el universo
+    en una sola evaluación). Devuelve los activos que siguen en carrera.
+    """
+    fila = {symbol: i for i, symbol in enumerate(symbols)}
+    en_carrera = [symbol for symbol in symbols if vivas[fila[symbol]].any()]
+    for symbol in en_carrera:
+        df = data.get(symbol)
+        j, d = get_last_kdj(df) if df is not None else (None, None)
+        if j is None:
+            metrics.inc('symbols_skipped_total', reason='sin_datos')
+            continue  # Queda en NaN: ninguna condición de este tf se cumple
+        X[fila[symbol], RULES.features.index(f"j_{tf}")] = j
+        X[fila[symbol], RULES.features.index(f"d_{tf}")] = d
+    vivas &= RULES.masks(X, timeframes=[tf])
+    return [symbol for symbol in en_carrera if vivas[fila[symbol]].any()]
+
 # ==========================================
 # 🎯 TAREA PRINCIPAL: ESCÁNER TRIPLE CONFLUENCIA (ASIMÉTRICO)
 # ==========================================
-last_alerts = {} 
+alert_cooldowns = cooldowns.CooldownStore('acciones', {'*': COOLDOWN_SECONDS})
+ohlcv_cache = datos_acciones.OHLCVCache()  # Se lee del disco recién cuando se usa
+watch_priority = prioridad.ScanPriority(WATCHLIST_REFRESH, WATCHLIST_HOT, WATCHLIST_WARM)
 
 def job_escanear_oportunidades():
-    # 1. Chequeo de horario
-    if not mercado_abierto():
-        return
+    # 1. El horario lo filtra el planificador (gate=mercado_abierto)
+    t0 = time.perf_counter()
+    with metricas.profile_cycle(PROFILE_DIR, 'acciones'):
+        escanear_oportunidades()
+    metrics.observe('cycle_seconds', time.perf_counter() - t0)
 
+def escanear_oportunidades():
     print(f"⚡ Escaneando (Compra Estricta / Venta Calibrada)... ({datetime.now(TIMEZONE).strftime('%H:%M')})")
     
     # 2. Preparar lista de activos (Portfolio + Watchlist)
@@ -86,43 +125,109 @@ def job_escanear_oportunidades():
         for t, n in config.WATCHLIST_DICT.items():
             if t not in full_watchlist: full_watchlist[t] = n
 
-    # 3. Analizar cada activo
-    for symbol, name in full_watchlist.items():
+    # 3. Cooldown primero: no descargamos lo que no vamos a evaluar
+    # Si ya avisamos de este activo hace menos de 3 horas, pasamos al siguiente
+    cooled = alert_cooldowns.cooled()
+    symbols = [s for s in full_watchlist if s not in cooled]
+    metrics.inc('symbols_skipped_total', len(full_watchlist) - len(symbols), reason='cooldown')
+    if not symbols: return
+
+    # 4. Niveles: portfolio completo primero; de la watchlist solo los que
+    # tocan este ciclo, de los más cercanos a la zona de compra a los más lejanos
+    t_cycle = time.perf_counter()
+    watch_priority.forget([s for s in full_watchlist if s not in config.PORTFOLIO])
+    due = watch_priority.plan([s for s in symbols if s not in config.PORTFOLIO])
+    tandas = [('portfolio', [s for s in symbols if s in config.PORTFOLIO])]
+    tandas += [('watchlist', due[i:i + WATCHLIST_CHUNK]) for i in range(0, len(due), WATCHLIST_CHUNK)]
+
+    tiempos = {}
+    escaneados = 0
+    for n, (nivel, tanda) in enumerate(tandas):
+        if not tanda: continue
+        if nivel == 'watchlist' and time.perf_counter() - t_cycle > SCAN_BUDGET_SECONDS:
+            resto = [s for _, t in tandas[n:] for s in t]
+            watch_priority.defer(resto)
+            print(f"⌛ Presupuesto de {SCAN_BUDGET_SECONDS}s agotado: {len(resto)} activos de la watchlist pasan al próximo ciclo")
+            break
+        t0 = time.perf_counter()
+        X = escanear_tanda(tanda, full_watchlist)
+        if nivel == 'watchlist':
+            watch_priority.update(tanda, puntajes_zona_compra(tanda, X))
+        tiempos[nivel] = tiempos.get(nivel, 0.0) + time.perf_counter() - t0
+        escaneados += len(tanda)
+
+    for nivel, segundos in tiempos.items():
+        metrics.observe('tier_seconds', segundos, tier=nivel)
+    metrics.set('symbols_scanned', escaneados)
+    print(f"⏱️ Niveles: {' | '.join(f'{nivel} {segundos:.1f}s' for nivel, segundos in tiempos.items()) or '-'} "
+          f"({escaneados} de {len(symbols)} activos, {len(symbols) - escaneados} descansan)")
+
+def puntajes_zona_compra(symbols, X):
+    """{symbol: distancia del J/D diario a la zona de compra} (NaN sin datos: vuelve como caliente)."""
+    Z = ZONA_COMPRA.matrix({f: X[:, RULES.features.index(f)] for f in ZONA_COMPRA.features}, len(symbols))
+    return dict(zip(symbols, prioridad.scores(ZONA_COMPRA, Z, 100, 0)))
+
+def escanear_tanda(symbols, full_watchlist):
+    """Cascada + avisos de una tanda de activos. Devuelve la matriz activos × features de RULES."""
+    # 1. Reglas posibles por activo ANTES de descargar nada (condiciones sin
+    # timeframe): la venta solo aplica al portfolio
+    X = RULES.matrix({'portfolio': [symbol in config.PORTFOLIO for symbol in symbols]}, len(symbols))
+    vivas = RULES.masks(X, timeframes=[None])
+    ramas = [symbol for symbol, posibles in zip(symbols, vivas) if posibles.any()]
+
+    # 2. Cascada perezosa: 1D primero (el más selectivo y el más barato: casi
+    # siempre sale de la caché), 1H solo para los que sobreviven, y 4H (que se
+    # arma desde 1H) al final. Todas las condiciones son AND: si un timeframe
+    # falla, la rama ya no se puede cumplir.
+    t_calc = time.perf_counter()
+    data_1d, errores_1d, stats_1d = ohlcv_cache.get(ramas, "6mo", "1d")
+    t_fetch = time.perf_counter() - t_calc
+    for symbol, motivo in errores_1d.items():
+        print(f"⚠️ {symbol}: sin datos 1D ({motivo})")
+    vivos_1d = filtrar_cascada(vivas, X, symbols, '1d', data_1d)
+
+    t0 = time.perf_counter()
+    data_1h, errores_1h, stats_1h = ohlcv_cache.get(vivos_1d, "1mo", "1h")
+    t_fetch += time.perf_counter() - t0
+    for symbol, motivo in errores_1h.items():
+        print(f"⚠️ {symbol}: sin datos 1H ({motivo})")
+    vivos_1h = filtrar_cascada(vivas, X, symbols, '1h', data_1h)
+
+    # B) Construir 4H desde 1H (Resampling matemático)
+    agg_dict = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+    data_4h = {}
+    for symbol in vivos_1h:
+        try:
+            data_4h[symbol] = data_1h[symbol].resample('4h').agg(agg_dict).dropna()
+        except Exception as e:
+            print(f"⚠️ {symbol}: error armando 4H ({e})")
+            metrics.inc('symbols_skipped_total', reason='error')
+    vivos_4h = filtrar_cascada(vivas, X, symbols, '4h', data_4h)
+
+    for interval, stats in (('1h', stats_1h), ('1d', stats_1d)):
+        for kind, n in stats.items():
+            metrics.inc('cache_fetches_total', n, interval=interval, kind=kind)
+    for etapa, n in (('1d', len(ramas)), ('1h', len(vivos_1d)), ('4h', len(vivos_1h)), ('final', len(vivos_4h))):
+        metrics.inc('cascade_symbols_total', n, stage=etapa)
+    metrics.observe('fetch_seconds', t_fetch)
+    print(f"🔎 Cascada: 1D {len(ramas)} → 1H {len(vivos_1d)} → 4H {len(vivos_1h)} → {len(vivos_4h)} en zona | "
+          f"Descargas 1D: {stats_1d['incrementales']} incr. / {stats_1d['completas']} compl. / {stats_1d['reajustadas']} reaj. | "
+          f"1H: {stats_1h['incrementales']} incr. / {stats_1h['completas']} compl. / {stats_1h['reajustadas']} reaj. "
+          f"(de {len(ramas)} activos)")
+
+    # 3. Armar los avisos de los que pasaron toda la cascada (si cumple las
+    # dos reglas gana la primera: la compra)
+    fila = {symbol: i for i, symbol in enumerate(symbols)}
+    regla = RULES.first_match(vivas)
+    for symbol in vivos_4h:
+        name = full_watchlist[symbol]
         try:
-            # --- FILTRO 1: COOLDOWN ---
-            # Si ya avisamos de este activo hace menos de 3 horas, pasamos al siguiente
-            if symbol in last_alerts:
-                if time.time() - last_alerts[symbol] < COOLDOWN_SECONDS:
-                    continue
-
-            ticker_obj = yf.Ticker(symbol)
-            
-            # --- OBTENER DATOS (Los 3 timeframes) ---
-            
-            # A) Datos Intradía (1H)
-            df_1h = ticker_obj.history(period="1mo", interval="1h")
-            if df_1h.empty: continue
-            
-            # B) Construir 4H desde 1H (Resampling matemático)
-            agg_dict = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
-            try:
-                df_4h = df_1h.resample('4h').agg(agg_dict).dropna()
-            except:
-                continue
-
-            # C) Datos Diario (1D)
-            df_1d = ticker_obj.history(period="6mo", interval="1d")
-            if df_1d.empty: continue
-
-            # --- CÁLCULO DE INDICADORES ---
-            j1, d1 = get_last_kdj(df_1h)
-            j4, d4 = get_last_kdj(df_4h)
-            jd, dd = get_last_kdj(df_1d)
-
-            # Si falla algún cálculo, abortamos este activo
-            if j1 is None or j4 is None or jd is None: continue
-
-            precio = df_1h['Close'].iloc[-1]
+            x = dict(zip(RULES.features, X[fila[symbol]]))
+            j1, d1 = x['j_1h'], x['d_1h']
+            j4, d4 = x['j_4h'], x['d_4h']
+            jd, dd = x['j_1d'], x['d_1d']
+            señal = RULES.names[regla[fila[symbol]]]
+            precio = data_1h[symbol]['Close'].iloc[-1]
 
             # --- LÓGICA DE DECISIÓN (ASIMÉTRICA) ---
             msg = ""
@@ -132,9 +237,7 @@ def job_escanear_oportunidades():
             # 1. CONDICIÓN DE COMPRA (ESTRICTA) - SIN CAMBIOS
             # Regla: Todos en suelo (J<=0, D<=25)
             # -----------------------------------------------------------
-            if (j1 <= 0 and d1 <= 25) and \
-               (j4 <= 0 and d4 <= 25) and \
-               (jd <= 0 and dd <= 25):
+            if señal == 'compra':
                 
                 if symbol in config.PORTFOLIO:
                     tipo = "RECOMPRA MAESTRA 📉🔥"
@@ -145,21 +248,20 @@ def job_escanear_oportunidades():
 
             # -----------------------------------------------------------
             # 2. CONDICIÓN DE VENTA (CALIBRADA / CASCADA) - NUEVA LÓGICA V4
-            # Regla ajustada:
-            # 1H: J>=100, D>=75 (Gatillo rápido)
-            # 4H: J>=95,  D>=70 (Confirmación fuerte)
-            # 1D: J>=90,  D>=65 (Contexto de techo)
+            # Regla ajustada (ver REGLAS en config_acciones.py):
+            # 1H: J>=95, D>=70 (Gatillo rápido)
+            # 4H: J>=90, D>=65 (Confirmación fuerte)
+            # 1D: J>=80, D>=60 (Contexto de techo)
             # -----------------------------------------------------------
-            elif (j1 >= 95 and d1 >= 70) and \
-                 (j4 >= 90  and d4 >= 65) and \
-                 (jd >= 80  and dd >= 60):
+            elif señal == 'venta':
                 
                 if symbol in config.PORTFOLIO:
                     tipo = "TOMA DE GANANCIAS 💰⚡"
                     msg = "Techo confirmado: 1H(Extremo) + 4H(Alto) + 1D(Zona Alta)."
 
             # SI SE CUMPLE ALGUNA, ENVIAR AVISO
-            if msg:
+            # Reserva atómica del cooldown: si otra copia del bot ya avisó, no se repite
+            if msg and alert_cooldowns.claim(symbol, señal):
                 alerta = (f"🚨 **{tipo}**\n"
                           f"Ticker: {symbol} ({name})\n"
                           f"Precio: ${precio:.2f}\n"
@@ -172,15 +274,17 @@ def job_escanear_oportunidades():
                           f"💡 {msg}")
                 
                 send_telegram(alerta)
+                metrics.inc('alerts_total', type=señal)
                 print(f"✅ ALERTA ENVIADA: {symbol}")
-                
-                # Activamos el Cooldown de 3 horas para este ticker
-                last_alerts[symbol] = time.time()
-                time.sleep(1)
 
         except Exception as e:
+            metrics.inc('symbols_skipped_total', reason='error')
+            print(f"⚠️ Error en {symbol}: {e}")
             continue
 
+    metrics.observe('compute_seconds', time.perf_counter() - t_calc - t_fetch)
+    return X
+
 # ==========================================
 # 🔔 AVISOS MERCADO
 # ==========================================
@@ -199,15 +303,11 @@ def job_avisos_mercado():
 # ==========================================
 if __name__ == "__main__":
     print("🤖 BOT ACCIONES (V4 CALIBRADO) INICIADO")
+    metrics.start('acciones', METRICS_PORT)
     send_telegram(f"🤖 **BOT ACTIVO V4**\nEstrategia: Compra Estricta / Venta Calibrada\nCooldown: 3 Horas.")
     
-    # Escaneo cada 5 minutos
-    schedule.every(5).minutes.do(job_escanear_oportunidades)
-    schedule.every(1).minutes.do(job_avisos_mercado)
-
-    if mercado_abierto():
-        job_escanear_oportunidades()
-
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
+    # Escaneo al cierre de cada vela de 5m (y uno apenas arranca), avisos cada minuto
+    plan = planificador.Planificador('acciones')
+    plan.every(SCAN_INTERVAL, job_escanear_oportunidades, offset=SCAN_OFFSET_SECONDS, gate=mercado_abierto, run_now=True)
+    plan.every('1m', job_avisos_mercado, offset=1)
+    plan.run()
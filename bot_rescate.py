@@ -1,149 +1,307 @@
 import time
+import atexit
+import asyncio
 import pandas as pd
-import requests
 from binance.client import Client
+import indicadores
+import stream_velas
+import cache_velas
+import metricas
+import alertas
+import estado
+import cooldowns
+import planificador
+import reglas
+import gatillos
+from metricas import metrics
 import config  # <--- IMPORTAMOS TU CAJA FUERTE (config.py)
 
 # --- CONEXIÓN SEGURA ---
+# BINANCE_URL en config.py apunta el cliente a otro servidor (ej. el Binance falso de bench_carga.py)
+BINANCE_URL = getattr(config, 'BINANCE_URL', None)
+if BINANCE_URL:
+    Client.API_URL = Client.API_TESTNET_URL = BINANCE_URL + '/api'
+    Client.FUTURES_URL = Client.FUTURES_TESTNET_URL = BINANCE_URL + '/fapi'
 client = Client(config.BINANCE_API_KEY, config.BINANCE_API_SECRET, testnet=config.TESTNET_MODE)
+client.session.hooks['response'].append(metrics.http_hook)  # Pedidos, códigos, latencia y peso usado
 
 # --- 🚑 LISTA DE PACIENTES ---
 WATCHLIST = ['DEGENUSDT', 'TRXUSDT', 'WIFUSDT', 'DEXEUSDT', 'ATHUSDT']
 
 # --- ❄️ TIEMPO DE SILENCIO (4 Horas) ---
+# Compartido con los otros bots y con otras copias de este (ver cooldowns.py)
 COOLDOWN_SECONDS = 14400
-last_alert_times = {}
+alert_cooldowns = cooldowns.CooldownStore('rescate', {'*': COOLDOWN_SECONDS})
+
+# --- 🕯️ VELAS POR INTERVALO (ventana de cálculo, ver cache_velas.py) ---
+KLINE_WINDOW = {'15m': 100, '1h': 100, '4h': 100}
+
+# --- 📡 MODO STREAM (WebSocket en vez de REST cada 60s) ---
+STREAM_MODE = False
+STREAM_URL = stream_velas.STREAM_URL    # ws://127.0.0.1:8765 para probar con replay_ws.py
+STREAM_BUFFER = {'15m': 100, '1h': 100, '4h': 100}  # Velas guardadas por intervalo
+EVAL_THROTTLE_SECONDS = 5               # Máximo una evaluación cada 5s por moneda (salvo cierres)
+
+# --- 🎯 NIVELES GATILLO (ver gatillos.py) ---
+# Entre cierres de 15m: un solo pedido de precios por ciclo; velas solo para
+# las monedas cuyo precio entró en la banda de alguna regla
+TRIGGER_WATCH = True
+
+# --- 📈 MÉTRICAS ---
+METRICS_PORT = 9102         # http://127.0.0.1:9102/metrics (None = apagado)
+PROFILE_DIR = None          # Carpeta para volcar un perfil cProfile por ciclo (None = apagado)
+
+# --- ⏰ PLANIFICACIÓN (escaneo alineado al cierre de vela) ---
+# Con '1m' se sigue la vela en curso como antes (un escaneo por minuto), pero
+# justo después de cada cierre; '15m' escanea solo al cierre de las de 15m.
+SCAN_INTERVAL = '1m'
+SCAN_OFFSET_SECONDS = 2
+
+# --- 💾 REINICIO EN CALIENTE (estado de indicadores / buffers; los cooldowns viven en cooldowns.sqlite) ---
+SNAPSHOT_PATH = estado.snapshot_path('rescate')
 
 # --- TELEGRAM ---
+# Cola en segundo plano: el radar no se frena esperando a Telegram (ver alertas.py)
+telegram = alertas.AlertDispatcher(config.TELEGRAM_TOKEN, config.TELEGRAM_CHAT_ID,
+                                   api_url=getattr(config, 'TELEGRAM_API_URL', alertas.API_URL))
+
 def send_telegram_alert(message):
-    try:
-        url = f'https://api.telegram.org/bot{config.TELEGRAM_TOKEN}/sendMessage'
-        payload = {'chat_id': config.TELEGRAM_CHAT_ID, 'text': message}
-        requests.post(url, data=payload, timeout=10)
-    except Exception as e:
-        print(f"Error Telegram: {e}")
+    telegram.send(message)
 
 # --- INDICADORES MATEMÁTICOS ---
-def bcwsma(series, length, weight):
-    result = []
-    for i in range(len(series)):
-        if i == 0:
-            result.append(series[i])
-        else:
-            prev = result[-1]
-            value = (weight * series[i] + (length - weight) * prev) / length
-            result.append(value)
-    return pd.Series(result)
-
+# (El cálculo vive en indicadores.py, compartido por los tres bots)
 def calculate_kdj(df, ilong=9, isig=3):
-    low_list = df['low'].rolling(window=ilong).min()
-    high_list = df['high'].rolling(window=ilong).max()
-    rsv = 100 * ((df['close'] - low_list) / (high_list - low_list))
     # K es rápido, D es lento (media de K), J es volátil
-    k = bcwsma(rsv.fillna(50), isig, 1)
-    d = bcwsma(k.fillna(50), isig, 1)
-    j = 3 * k - 2 * d
-    return k, d, j
+    k, d, j = indicadores.kdj(df['high'], df['low'], df['close'], ilong, isig)
+    return pd.Series(k), pd.Series(d), pd.Series(j)
 
 def calculate_bollinger_bands(df, period=20, std_dev=2):
-    sma = df['close'].rolling(window=period).mean()
-    std = df['close'].rolling(window=period).std()
-    upper = sma + (std_dev * std)
-    lower = sma - (std_dev * std)
-    return upper, lower
+    upper, lower = indicadores.bollinger(df['close'], period, std_dev)
+    return pd.Series(upper), pd.Series(lower)
 
-def get_klines_safe(symbol, interval):
+# --- VELAS + ESTADO INCREMENTAL POR (SÍMBOLO, INTERVALO) ---
+# La caché (ver cache_velas.py) baja la ventana de 100 velas una sola vez;
+# después, entre cierres, solo la vela en curso (limit=1) y tras un cierre
+# la que cerró + la nueva (limit=2). Con esas velas nuevas el estado de los
+# indicadores se actualiza en O(1); si se bajó la ventana completa (o hay un
+# hueco) se vuelve a sembrar desde la ventana guardada.
+kline_cache = cache_velas.KlineCache(
+    lambda symbol, interval, limit: client.futures_klines(symbol=symbol, interval=interval, limit=limit),
+    KLINE_WINDOW)
+indicator_state = {}
+
+def get_indicators(symbol, interval):
+    key = (symbol, interval)
     try:
-        # Pedimos 100 velas para asegurar cálculos correctos
-        klines = client.futures_klines(symbol=symbol, interval=interval, limit=100)
-        df = pd.DataFrame(klines, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'q', 'n', 'v', 'q2', 'i'])
-        df[['open', 'high', 'low', 'close']] = df[['open', 'high', 'low', 'close']].astype(float)
-        return df
+        with metrics.timer('fetch_seconds', interval=interval):
+            klines, full = kline_cache.get(symbol, interval)
     except:
-        return pd.DataFrame()
+        metrics.inc('http_errors_total', endpoint='/fapi/v1/klines')
+        return None
+
+    with metrics.timer('compute_seconds', interval=interval):
+        state = indicator_state.get(key)
+        if state is not None and not full:
+            if all(state.update(k[0], k[2], k[3], k[4]) for k in klines):
+                return state.values()
+        if state is not None:
+            metrics.inc('reseeds_total', interval=interval)
+
+        frame = kline_cache.frame(symbol, interval)
+        if len(frame['close']) < 2:
+            return None
+        state = indicadores.IncrementalIndicators.from_history(frame['open_time'], frame['high'], frame['low'], frame['close'])
+    indicator_state[key] = state
+    return state.values()
+
+# --- REGLAS (ver reglas.py; se pueden cambiar con REGLAS_RESCATE en config.py) ---
+# LONG (piso extremo): J <= 0 y D <= 25 en 4H, 1H y 15m
+# SHORT (techo extremo): J >= 100 y D >= 75 en 4H, 1H y 15m
+RULES = reglas.from_config('rescate', reglas.RESCATE)
+
+triggers = gatillos.TriggerBands(RULES)
+
+def get_prices():
+    """{symbol: precio} de todo el mercado en un solo pedido ({} si falla: se evalúa todo)."""
+    try:
+        return {item['symbol']: float(item['price']) for item in client.futures_symbol_ticker()}
+    except Exception:
+        metrics.inc('http_errors_total', endpoint='/fapi/v1/ticker/price')
+        return {}
+
+def classify_values(values):
+    """values: {symbol: {'15m': v, '1h': v, '4h': v}} -> {symbol: 'LONG'|'SHORT'|None}, todas juntas."""
+    features = {f"{key}_{tf}": [v[tf][key] for v in values.values()]
+                for tf in STREAM_BUFFER for key in ('j', 'd')}
+    return dict(zip(values, RULES.classify(RULES.matrix(features, len(values)))))
+
+def evaluate_symbol(symbol, v15, v1h, v4h):
+    """Aplica las reglas LONG/SHORT y envía la alerta. Devuelve True si avisó."""
+    signal_type = classify_values({symbol: {'15m': v15, '1h': v1h, '4h': v4h}})[symbol]
+    return send_signal(symbol, signal_type, v15, v1h, v4h)
+
+def send_signal(symbol, signal_type, v15, v1h, v4h):
+    """Envía la alerta de una señal ya detectada (None: nada). Devuelve True si avisó."""
+    if not signal_type:
+        return False
+    # Reserva atómica: si otro proceso ya avisó esta señal, no se repite
+    if not alert_cooldowns.claim(symbol, signal_type):
+        return False
+
+    # Valores actuales (última vela cerrada)
+    j15_v = v15['j']; d15_v = v15['d']
+    j1h_v = v1h['j']; d1h_v = v1h['d']
+    j4h_v = v4h['j']; d4h_v = v4h['d']
+
+    close = v15['close']
+    piso_4h = v4h['lower']
+    techo_4h = v4h['upper']
+
+    # --- LONG (PISO EXTREMO) ---
+    if signal_type == 'LONG':
+        msg = (f"💎 OPORTUNIDAD LONG (Suelo Extremo) en {symbol}\n"
+               f"Precio: {close}\n"
+               f"----------------\n"
+               f"J(4H/1H/15m): {j4h_v:.1f} / {j1h_v:.1f} / {j15_v:.1f}\n"
+               f"D(4H/1H/15m): {d4h_v:.1f} / {d1h_v:.1f} / {d15_v:.1f}\n"
+               f"Soporte BB 4H: {piso_4h:.4f}")
+
+    # --- SHORT (TECHO EXTREMO) ---
+    else:
+        msg = (f"⚠️ OPORTUNIDAD {signal_type} (Techo Extremo) en {symbol}\n"
+               f"Precio: {close}\n"
+               f"----------------\n"
+               f"J(4H/1H/15m): {j4h_v:.1f} / {j1h_v:.1f} / {j15_v:.1f}\n"
+               f"D(4H/1H/15m): {d4h_v:.1f} / {d1h_v:.1f} / {d15_v:.1f}\n"
+               f"Resistencia BB 4H: {techo_4h:.4f}")
+
+    send_telegram_alert(msg)
+    metrics.inc('alerts_total', type=signal_type)
+    print(f"✅ Alerta {signal_type} enviada para {symbol}.")
+    return True
 
 # --- LÓGICA DE RESCATE (FRANCOTIRADOR V4) ---
+def scan_cycle():
+    t_cycle = time.perf_counter()
+
+    # 1. Chequeo de Cooldown (una consulta por ciclo, antes de pedir velas) y
+    # de niveles gatillo: con el precio alcanza para descartar las que no pueden dar señal
+    cooled = alert_cooldowns.cooled()
+    pending = [symbol for symbol in WATCHLIST if symbol not in cooled]
+    metrics.inc('symbols_skipped_total', len(WATCHLIST) - len(pending), reason='cooldown')
+    if TRIGGER_WATCH and pending:
+        due = triggers.due(pending, get_prices())
+        metrics.inc('symbols_skipped_total', len(pending) - len(due), reason='gatillo')
+        pending = due
+
+    values = {}
+    for symbol in pending:
+        try:
+            # 2. Indicadores (J y D) de la vela en curso, actualizados en O(1)
+            with metrics.timer('symbol_seconds', symbol=symbol):
+                v15 = get_indicators(symbol, '15m')
+                v1h = get_indicators(symbol, '1h')
+                v4h = get_indicators(symbol, '4h')
+
+            if v4h is None or v1h is None or v15 is None:
+                metrics.inc('symbols_skipped_total', reason='sin_datos')
+                continue
+
+            values[symbol] = {'15m': v15, '1h': v1h, '4h': v4h}
+            triggers.update([symbol], {tf: gatillos.state_from_incremental(indicator_state[(symbol, tf)]) for tf in triggers.tfs})
+            if TRIGGER_WATCH:
+                print(f"🎯 {symbol}: {triggers.describe(symbol)}")
+
+        except Exception as e:
+            metrics.inc('symbols_skipped_total', reason='error')
+            print(f"Error en {symbol}: {e}")
+            continue
+
+    # 3. Reglas sobre toda la lista de una vez
+    if values:
+        for symbol, signal_type in classify_values(values).items():
+            v = values[symbol]
+            send_signal(symbol, signal_type, v['15m'], v['1h'], v['4h'])
+
+    # Peso de Binance gastado en velas vs bajar siempre las ventanas completas
+    used, full = kline_cache.reset_weight()
+    metrics.set('kline_weight_cycle', used)
+    metrics.set('kline_weight_saved_cycle', full - used)
+    if full:
+        print(f"🗄️ Peso klines del ciclo: {used} (sin caché: {full}, -{(1 - used / full) * 100:.0f}%)")
+    metrics.observe('cycle_seconds', time.perf_counter() - t_cycle)
+
 def run_rescue_bot():
     print("🚑 Bot de Rescate V4 (Francotirador J+D) Iniciado...")
-    send_telegram_alert(f"🚑 Bot V4 ONLINE. Configuración:\nLONG: J<=0 y D<=25\nSHORT: J>=100 y D>=75")
+    metrics.start('rescate', METRICS_PORT)
 
-    while True:
-        current_time = time.time()
+    # Estado incremental + ventanas de velas al día: si faltan velas,
+    # get_indicators baja la ventana y vuelve a sembrar solo ese par
+    saved = estado.load(SNAPSHOT_PATH)
+    indicator_state.update(saved.get('indicadores', {}))
+    estado.restore_store(kline_cache.store, saved.get('velas'))
+    snapshot = estado.Snapshotter(SNAPSHOT_PATH, lambda: {'indicadores': dict(indicator_state), 'velas': kline_cache.store})
+    atexit.register(snapshot.maybe_save, True)
+    send_telegram_alert("🚑 Bot V4 ONLINE. Configuración:\nLONG: J<=0 y D<=25\nSHORT: J>=100 y D>=75")
 
-        for symbol in WATCHLIST:
-            try:
-                # 1. Chequeo de Cooldown
-                if symbol in last_alert_times:
-                    tiempo_pasado = current_time - last_alert_times[symbol]
-                    if tiempo_pasado < COOLDOWN_SECONDS:
-                        continue
-
-                # 2. Descargar datos
-                df_15m = get_klines_safe(symbol, '15m')
-                df_1h = get_klines_safe(symbol, '1h')
-                df_4h = get_klines_safe(symbol, '4h')
-
-                if df_4h.empty: continue
-
-                # 3. Indicadores (J y D)
-                _, d15, j15 = calculate_kdj(df_15m)
-                _, d1h, j1h = calculate_kdj(df_1h)
-                _, d4h, j4h = calculate_kdj(df_4h)
-
-                up_4h, low_4h = calculate_bollinger_bands(df_4h)
-
-                # Valores actuales (última vela cerrada)
-                j15_v = j15.iloc[-1]; d15_v = d15.iloc[-1]
-                j1h_v = j1h.iloc[-1]; d1h_v = d1h.iloc[-1]
-                j4h_v = j4h.iloc[-1]; d4h_v = d4h.iloc[-1]
-                
-                close = df_15m['close'].iloc[-1]
-                piso_4h = low_4h.iloc[-1]
-                techo_4h = up_4h.iloc[-1]
-
-                alerta_enviada = False
-
-                # --- CONDICIÓN LONG (PISO EXTREMO) ---
-                # J <= 0 y D <= 25 en 4H, 1H y 15m
-                cond_j_long = (j4h_v <= 0) and (j1h_v <= 0) and (j15_v <= 0)
-                cond_d_long = (d4h_v <= 25) and (d1h_v <= 25) and (d15_v <= 25)
-
-                if cond_j_long and cond_d_long:
-                    msg = (f"💎 OPORTUNIDAD LONG (Suelo Extremo) en {symbol}\n"
-                           f"Precio: {close}\n"
-                           f"----------------\n"
-                           f"J(4H/1H/15m): {j4h_v:.1f} / {j1h_v:.1f} / {j15_v:.1f}\n"
-                           f"D(4H/1H/15m): {d4h_v:.1f} / {d1h_v:.1f} / {d15_v:.1f}\n"
-                           f"Soporte BB 4H: {piso_4h:.4f}")
-                    send_telegram_alert(msg)
-                    print(f"✅ Alerta LONG enviada para {symbol}.")
-                    alerta_enviada = True
-
-                # --- CONDICIÓN SHORT (TECHO EXTREMO) ---
-                # J >= 100 y D >= 75 en 4H, 1H y 15m
-                cond_j_short = (j4h_v >= 100) and (j1h_v >= 100) and (j15_v >= 100)
-                cond_d_short = (d4h_v >= 75) and (d1h_v >= 75) and (d15_v >= 75)
-
-                if cond_j_short and cond_d_short:
-                    msg = (f"⚠️ OPORTUNIDAD SHORT (Techo Extremo) en {symbol}\n"
-                           f"Precio: {close}\n"
-                           f"----------------\n"
-                           f"J(4H/1H/15m): {j4h_v:.1f} / {j1h_v:.1f} / {j15_v:.1f}\n"
-                           f"D(4H/1H/15m): {d4h_v:.1f} / {d1h_v:.1f} / {d15_v:.1f}\n"
-                           f"Resistencia BB 4H: {techo_4h:.4f}")
-                    send_telegram_alert(msg)
-                    print(f"✅ Alerta SHORT enviada para {symbol}.")
-                    alerta_enviada = True
-
-                if alerta_enviada:
-                    last_alert_times[symbol] = current_time
+    def cycle():
+        with metricas.profile_cycle(PROFILE_DIR, 'rescate'):
+            scan_cycle()
+        snapshot.maybe_save(force=True)
+        print("⚡ Radar V4: Escaneando...")
+
+    # Un escaneo por cierre de vela, nunca dos a la vez (ver planificador.py)
+    plan = planificador.Planificador('rescate')
+    plan.every(SCAN_INTERVAL, cycle, offset=SCAN_OFFSET_SECONDS, name='radar', run_now=True)
+    plan.run()
+
+# --- MODO STREAM ---
+def ring_values(frame):
+    # Mismos valores que get_indicators, calculados sobre el buffer del stream
+    _, d, j = indicadores.kdj(frame['high'], frame['low'], frame['close'])
+    upper, lower = indicadores.bollinger(frame['close'])
+    return {'j': j[-1], 'd': d[-1], 'close': frame['close'][-1], 'upper': upper[-1], 'lower': lower[-1]}
+
+def run_stream_rescue_bot():
+    print("🚑 Bot de Rescate V4 (MODO STREAM) Iniciado...")
+    metrics.start('rescate', METRICS_PORT)
+    send_telegram_alert("🚑 Bot V4 ONLINE (Stream). Configuración:\nLONG: J<=0 y D<=25\nSHORT: J>=100 y D>=75")
+
+    # 1. Buffers del snapshot que siguen al día; el resto se siembra con el historial REST
+    store = stream_velas.CandleStore(STREAM_BUFFER)
+    saved = estado.load(SNAPSHOT_PATH)
+    print(f"♻️ {estado.restore_store(store, saved.get('velas'))} buffers recuperados del snapshot")
+    snapshot = estado.Snapshotter(SNAPSHOT_PATH, lambda: {'velas': store})
+    atexit.register(snapshot.maybe_save, True)
 
+    for symbol in WATCHLIST:
+        for interval, size in STREAM_BUFFER.items():
+            if (symbol, interval) in store.rings: continue
+            try:
+                store.seed(symbol, interval, client.futures_klines(symbol=symbol, interval=interval, limit=size))
             except Exception as e:
-                print(f"Error en {symbol}: {e}")
-                continue
+                print(f"Error sembrando {symbol} {interval}: {e}")
 
-        print("⚡ Radar V4: Escaneando...")
-        time.sleep(60)
+    throttle = stream_velas.Throttle(EVAL_THROTTLE_SECONDS)
+
+    # 2. Evaluar las reglas apenas se mueve una vela
+    def on_update(symbol, interval, closed):
+        metrics.inc('stream_updates_total', interval=interval)
+        snapshot.maybe_save()
+        if not throttle.ready(symbol, force=closed): return
+        if alert_cooldowns.blocked(symbol): return  # SQLite: solo cuando toca evaluar, no en cada mensaje
+        try:
+            frames = store.frames(symbol, STREAM_BUFFER)
+            if frames is None: return
+            with metrics.timer('compute_seconds', interval='stream'):
+                evaluate_symbol(symbol, ring_values(frames['15m']), ring_values(frames['1h']), ring_values(frames['4h']))
+        except Exception as e:
+            metrics.inc('symbols_skipped_total', reason='error')
+            print(f"Error en {symbol}: {e}")
+
+    # Hueco tras una caída del stream: se re-siembra por REST antes de evaluar
+    reseed = lambda symbol, interval, limit: client.futures_klines(symbol=symbol, interval=interval, limit=limit)
+    asyncio.run(stream_velas.run_stream(store, WATCHLIST, list(STREAM_BUFFER), on_update, base_url=STREAM_URL, reseed=reseed))
 
 if __name__ == '__main__':
-    run_rescue_bot()
+    run_stream_rescue_bot() if STREAM_MODE else run_rescue_bot()
@@ -1,44 +1,105 @@
 import time
 import requests
+import numpy as np
 import pandas as pd
 import sys
 import os
+import asyncio
+import atexit
+import zlib
+import signal
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+import indicadores
+import stream_velas
+import velas
+import metricas
+import alertas
+import estado
+import cooldowns
+import planificador
+import reglas
+import prioridad
+import universo
+import gatillos
+from metricas import metrics
 
 # --- IMPORTACIÓN SEGURA ---
 try:
+    import config
     from config import TELEGRAM_TOKEN, TELEGRAM_CHAT_ID
 except ImportError:
     print("⚠️ ERROR CRÍTICO: No se encontró 'config.py'. Asegúrate de tenerlo en la carpeta.")
     sys.exit()
 
 # --- CONFIGURACIÓN FUTUROS GLOBAL ---
-BASE_URL = "https://fapi.binance.com"
+BASE_URL = getattr(config, 'BINANCE_URL', "https://fapi.binance.com")  # BINANCE_URL en config.py: otro servidor (ej. bench_carga.py)
 MIN_VOLUMEN_24H = 30000000  # 30 Millones
 MIN_ANTIGUEDAD_DIAS = 100   # Mínimo 100 días de vida
+TIMEFRAMES = ['1m', '3m', '5m']
+TF_MINUTES = {'1m': 1, '3m': 3, '5m': 5}
+MTF_FROM_1M = True          # 1 pedido de 1m por moneda y derivar 3m/5m/1h (en vez de 4 pedidos)
+MTF_1M_LIMIT = 185          # 35 velas de 5m + vela en curso + bloque inicial incompleto
+MAX_WORKERS = 16            # Descargas de velas simultáneas (y conexiones abiertas)
+# --- MODO STREAM (WebSocket en vez de REST cada 60s) ---
+STREAM_MODE = False
+STREAM_URL = stream_velas.STREAM_URL    # ws://127.0.0.1:8765 para probar con replay_ws.py
+STREAM_BUFFER = {'1m': 35, '3m': 35, '5m': 35, '1h': 2}  # Velas guardadas por intervalo
+EVAL_THROTTLE_SECONDS = 1               # Máximo una evaluación por segundo y moneda (salvo cierres)
+# --- MÉTRICAS ---
+METRICS_PORT = 9101         # http://127.0.0.1:9101/metrics (None = apagado)
+PROFILE_DIR = None          # Carpeta para volcar un perfil cProfile por ciclo (None = apagado)
+SNAPSHOT_PATH = estado.snapshot_path('scalper')  # Buffers del modo stream (reinicio en caliente)
+# --- SHARDING (varios procesos) ---
+SHARDS = 1                  # Procesos que se reparten las monedas (1 = todo en este proceso)
+# --- PLANIFICACIÓN (escaneo alineado al cierre de vela) ---
+SCAN_INTERVAL = '1m'        # Un escaneo por cada cierre de vela de 1m...
+SCAN_OFFSET_SECONDS = 2     # ...2s después del cierre (margen para que el exchange la publique)
+# --- PRIORIDAD (monedas cerca de los umbrales primero, ver prioridad.py) ---
+PRIORITY_SCAN = True        # False = todas las monedas en cada ciclo, en el orden del ticker
+SCAN_BUDGET_SECONDS = 40    # Tope por ciclo: lo que no entra (lo más frío) pasa al próximo
+PRIORITY_CHUNK = 100        # Monedas por tanda (las alertas de cada tanda salen enseguida)
+# --- PRE-FILTRO (antes de pedir velas, ver universo.py) ---
+PRESCREEN = True            # Solo piden velas las monedas cerca del mínimo/máximo de sus últimos minutos
+# --- NIVELES GATILLO (ver gatillos.py) ---
+TRIGGER_WATCH = True        # Solo piden velas las monedas cuyo precio entró en la banda de 3m/5m (1m cierra en cada ciclo)
+# --- COOLDOWN (compartido entre procesos y bots, ver cooldowns.py) ---
+COOLDOWN_SECONDS = {'LONG': 900, 'SHORT': 900, '*': 900}  # Por tipo de señal: 3 velas de 5m sin repetir la alerta
 EXCLUDED_SYMBOLS = ['USDCUSDT', 'BUSDUSDT', 'USDPUSDT', 'TUSDUSDT', 'DAIUSDT', 'USDUSDT', 'BNXUSDT', 'FISUSDT', 'PAXGUSDT']
 
 # --- FUNCIONES DE CONEXIÓN ---
+# Sesión compartida: reutiliza las conexiones keep-alive entre pedidos (y entre hilos)
+session = requests.Session()
+_adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=MAX_WORKERS)
+session.mount('https://', _adapter)
+session.mount('http://', _adapter)
+session.hooks['response'].append(metrics.http_hook)  # Pedidos, códigos, latencia y peso usado
+
 def get_binance_data(endpoint, params=None):
     try:
         url = BASE_URL + endpoint
-        response = requests.get(url, params=params, timeout=5) # Timeout corto para velocidad
-        return response.json() if response.status_code == 200 else None
+        response = session.get(url, params=params, timeout=5) # Timeout corto para velocidad
+        return velas.loads(response.content) if response.status_code == 200 else None
     except:
+        metrics.inc('http_errors_total', endpoint=endpoint)
         return None
 
+# Fechas de alta de exchangeInfo (cambian muy de vez en cuando) y precios de
+# cada ciclo para el pre-filtro (ver universo.py)
+onboard_cache = universo.OnboardCache(lambda: get_binance_data("/fapi/v1/exchangeInfo"))
+ticker_history = universo.TickerHistory()
+
 def get_liquid_symbols():
     print(f"🔍 Escaneando Mercado (Vol > {MIN_VOLUMEN_24H/1000000}M y Edad > {MIN_ANTIGUEDAD_DIAS} días)...")
     
-    # 1. Obtenemos datos de volumen
+    # 1. Obtenemos datos de volumen (y el último precio de todas, para el pre-filtro)
     ticker_data = get_binance_data("/fapi/v1/ticker/24hr")
-    # 2. Obtenemos información de la moneda (para saber su fecha de creación)
-    exchange_info = get_binance_data("/fapi/v1/exchangeInfo")
+    # 2. Mapa de fechas de creación {simbolo: fecha_ms} (caché de exchangeInfo)
+    onboard_dates = onboard_cache.get()
     
-    if not ticker_data or not exchange_info: 
+    if not ticker_data or not onboard_dates: 
         return []
-    
-    # Mapa de fechas de creación {simbolo: fecha_ms}
-    onboard_dates = {item['symbol']: item['onboardDate'] for item in exchange_info['symbols']}
+    ticker_history.record(ticker_data)
     
     # Calcular fecha límite en milisegundos
     limit_time_ms = (time.time() * 1000) - (MIN_ANTIGUEDAD_DIAS * 24 * 60 * 60 * 1000)
@@ -73,158 +134,493 @@ def get_liquid_symbols():
 def get_klines(symbol, interval, limit=50):
     params = {'symbol': symbol, 'interval': interval, 'limit': limit}
     raw = get_binance_data("/fapi/v1/klines", params)
-    if not raw: return pd.DataFrame()
-    
-    # Columnas básicas para velocidad
-    df = pd.DataFrame(raw, columns=['timestamp', 'open', 'high', 'low', 'close', 'v', 'ct', 'q', 'n', 'V', 'Q', 'i'])
-    return df[['open', 'high', 'low', 'close']].astype(float)
+    # Directo a arrays (sin DataFrame): es lo que consumen velas.py e indicadores.py
+    return velas.parse_klines(raw or [])
+
+def derive_timeframes(df_1m):
+    """
+    Arma 1m/3m/5m (35 velas) y la vela 1h en curso desde UNA sola serie de 1m.
+    Cortes alineados como el exchange (ver velas.resample).
+    """
+    tfs = {}
+    for tf in TIMEFRAMES:
+        minutes = TF_MINUTES[tf]
+        frame = df_1m if minutes == 1 else velas.resample(df_1m, minutes)
+        tfs[tf] = velas.tail(frame, 35)
+    return tfs, velas.resample(df_1m, 60)
+
+def fetch_all_klines(pool, symbols):
+    """
+    Descarga en paralelo las velas de todo el ciclo.
+    Con MTF_FROM_1M: una serie de 1m por moneda (3m/5m/1h se derivan de ella).
+    Sin MTF_FROM_1M: 1m/3m/5m + 1h nativas de cada moneda (4 pedidos).
+    Devuelve (frames, coin_chg) listos para calculate_batch.
+    """
+    if MTF_FROM_1M:
+        jobs = [(symbol, '1m', MTF_1M_LIMIT) for symbol in symbols]
+    else:
+        jobs = [(symbol, tf, 35) for symbol in symbols for tf in TIMEFRAMES]
+        jobs += [(symbol, '1h', 2) for symbol in symbols]
+    dfs = pool.map(lambda job: get_klines(*job), jobs)
+    data = {(symbol, tf): df for (symbol, tf, _), df in zip(jobs, dfs)}
+
+    frames = {}
+    coin_chg = {}
+    for symbol in symbols:
+        try:
+            if MTF_FROM_1M:
+                if len(data[(symbol, '1m')]['close']) == 0:
+                    metrics.inc('symbols_skipped_total', reason='sin_datos')
+                    continue
+                tfs, df_1h_coin = derive_timeframes(data[(symbol, '1m')])
+            else:
+                tfs = {tf: data[(symbol, tf)] for tf in TIMEFRAMES}
+                df_1h_coin = data[(symbol, '1h')]
+            
+            # Necesitamos data suficiente
+            if len(tfs['5m']['close']) < 25 or len(tfs['1m']['close']) == 0 or len(tfs['3m']['close']) == 0:
+                metrics.inc('symbols_skipped_total', reason='sin_datos')
+                continue
+            
+            # Obtenemos cambio 1H de la moneda (para el reporte)
+            coin_chg_1h = 0.0
+            if len(df_1h_coin['close']) > 0:
+                  open_1h = np.asarray(df_1h_coin['open'])[-1]
+                  coin_chg_1h = ((np.asarray(df_1h_coin['close'])[-1] - open_1h) / open_1h) * 100
+
+            frames[symbol] = tfs
+            coin_chg[symbol] = coin_chg_1h
+        except Exception:
+            metrics.inc('symbols_skipped_total', reason='error')
+            continue
+
+    return frames, coin_chg
+
+# Las alertas salen por un hilo aparte (ver alertas.py): el escaneo no espera a Telegram
+telegram = alertas.AlertDispatcher(TELEGRAM_TOKEN, TELEGRAM_CHAT_ID, api_url=getattr(config, 'TELEGRAM_API_URL', alertas.API_URL))
 
 def send_telegram_alert(message):
-    try:
-        url = f'https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage'
-        payload = {'chat_id': TELEGRAM_CHAT_ID, 'text': message}
-        requests.post(url, data=payload, timeout=5)
-    except: pass
+    telegram.send(message)
 
 # --- INDICADORES TÉCNICOS ---
-def bcwsma(series, length, weight):
-    result = [series[0]]
-    for i in range(1, len(series)):
-        result.append((weight * series[i] + (length - weight) * result[-1]) / length)
-    return pd.Series(result)
-
+# (El cálculo vive en indicadores.py, compartido por los tres bots)
 def calculate_kdj(df):
-    low = df['low'].rolling(9).min()
-    high = df['high'].rolling(9).max()
-    rsv = 100 * ((df['close'] - low) / (high - low))
-    k = bcwsma(rsv.fillna(50), 3, 1)
-    d = bcwsma(k.fillna(50), 3, 1)
-    j = 3 * k - 2 * d
-    return k, d, j
+    k, d, j = indicadores.kdj(df['high'], df['low'], df['close'])
+    return pd.Series(k), pd.Series(d), pd.Series(j)
 
 def calculate_macd(df):
-    close = df['close']
-    macd = close.ewm(span=12).mean() - close.ewm(span=26).mean()
-    sig = macd.ewm(span=9).mean()
-    return macd, sig
+    macd, sig = indicadores.macd(df['close'])
+    return pd.Series(macd), pd.Series(sig)
 
 def calculate_bollinger(df, period=20, std_dev=2):
     # Usamos la data de 5m para las bandas referenciales
-    sma = df['close'].rolling(period).mean()
-    std = df['close'].rolling(period).std()
-    upper = sma + (std * std_dev)
-    lower = sma - (std * std_dev)
-    return upper, lower
+    upper, lower = indicadores.bollinger(df['close'], period, std_dev)
+    return pd.Series(upper), pd.Series(lower)
+
+def calculate_batch(frames):
+    """
+    Calcula los indicadores de TODAS las monedas en un solo paso vectorizado.
+    frames: {symbol: {'1m': df, '3m': df, '5m': df}}
+    Devuelve {symbol: {'j': [1m,3m,5m], 'd': [...], 's': [...], 'price', 'up_band', 'low_band',
+              'gatillo': {tf: (Kp, Dp, lo, hi, cierre_ms)}}}
+    """
+    results = {symbol: {'j': [], 'd': [], 's': [], 'gatillo': {}} for symbol in frames}
+
+    for tf in TIMEFRAMES:
+        by_tf = {symbol: tfs[tf] for symbol, tfs in frames.items()}
+        for _, group in indicadores.group_by_length(by_tf).items():
+            dfs = [by_tf[symbol] for symbol in group]
+            high = indicadores.stack_columns(dfs, 'high')
+            low = indicadores.stack_columns(dfs, 'low')
+            close = indicadores.stack_columns(dfs, 'close')
+
+            k, d, j = indicadores.kdj(high, low, close)
+            _, sig = indicadores.macd(close)
+            if tf == '5m':
+                upper, lower = indicadores.bollinger(close)
+            # Estado de la vela en curso para los niveles gatillo
+            trigger = gatillos.state_from_arrays(indicadores.stack_columns(dfs, 'open_time'), high, low, k, d,
+                                                 TF_MINUTES[tf] * 60000)
+
+            for row, symbol in enumerate(group):
+                res = results[symbol]
+                res['j'].append(j[row, -1])
+                res['d'].append(d[row, -1])
+                res['s'].append(sig[row, -1])
+                res['gatillo'][tf] = tuple(float(x[row]) for x in trigger)
+                if tf == '5m':
+                    res['price'] = close[row, -1]
+                    res['up_band'] = upper[row, -1]
+                    res['low_band'] = lower[row, -1]
+
+    return results
+
+# --- REGLAS DE ENTRADA (ver reglas.py; se pueden cambiar con REGLAS_SCALPER en config.py) ---
+# LONG: BTC estable/subiendo + J negativo + D bajo + MACD negativo (sobreventa) en 1m/3m/5m
+# SHORT: BTC estable/bajando + J alto + D alto + MACD positivo (sobrecompra) en 1m/3m/5m
+RULES = reglas.from_config('scalper', reglas.SCALPER)
+
+def feature_matrix(results, btc_chg):
+    """Matriz monedas × features de RULES a partir de calculate_batch."""
+    features = {'btc_chg': btc_chg}
+    for i, tf in enumerate(TIMEFRAMES):
+        for key in ('j', 'd', 's'):
+            features[f"{key}_{tf}"] = [res[key][i] for res in results.values()]
+    return RULES.matrix(features, len(results))
+
+def classify_batch(results, btc_chg):
+    """Señal de cada moneda de calculate_batch en una sola pasada vectorizada: {symbol: 'LONG'|'SHORT'|None}."""
+    return dict(zip(results, RULES.classify(feature_matrix(results, btc_chg))))
+
+def priority_scores(results, btc_chg):
+    """Puntaje de prioridad de cada moneda (ver prioridad.py): {symbol: puntaje}, menor = más caliente."""
+    if not results:
+        return {}
+    X = feature_matrix(results, btc_chg)
+    price = np.array([res['price'] for res in results.values()])
+    # Escala de cada indicador: J y D en puntos de 100, MACD en 0.5% del precio, BTC en puntos de %
+    scale = np.ones_like(X)
+    for i, name in enumerate(RULES.features):
+        if name[:2] in ('j_', 'd_'):
+            scale[:, i] = 100
+        elif name.startswith('s_'):
+            scale[:, i] = price * 0.005
+    volatility = [(res['up_band'] - res['low_band']) / res['price'] * 100 for res in results.values()]
+    return dict(zip(results, prioridad.scores(RULES, X, scale, volatility)))
+
+def evaluate_signal(symbol, res, btc_chg, coin_chg_1h):
+    """Aplica las reglas LONG/SHORT a una moneda. Devuelve (signal_type, msg) o (None, None)."""
+    signal_type = classify_batch({symbol: res}, btc_chg)[symbol]
+    if not signal_type:
+        return None, None
+    return signal_type, format_signal(symbol, res, signal_type, coin_chg_1h)
+
+def format_signal(symbol, res, signal_type, coin_chg_1h):
+    """Mensaje de Telegram de una señal ya detectada."""
+    # Valores actuales (última vela cerrada o actual)
+    j_val = res['j']
+    d_val = res['d']
+    price = res['price']
+    if signal_type == "LONG":
+        ref_band = res['low_band']
+        band_name = "Inf"
+    else:
+        ref_band = res['up_band']
+        band_name = "Sup"
+
+    # Calcular distancia a la banda
+    dist_pct = ((price - ref_band) / ref_band) * 100
+    state_str = f"ROMPIENDO ({abs(dist_pct):.2f}%)" if (signal_type=="LONG" and price<ref_band) or (signal_type=="SHORT" and price>ref_band) else f"Cercano ({abs(dist_pct):.2f}%)"
+    
+    icon = "🟢" if signal_type == "LONG" else "🔴"
+    
+    msg = (
+        f"{icon} {signal_type} {symbol}\n"
+        f"Precio: {price}\n"
+        f"Banda {band_name} (5m): {ref_band:.4f}\n"
+        f"Estado: {state_str}\n"
+        f"Cambio 1h: {coin_chg_1h:.2f}%\n"
+        f"----------------\n"
+        f"J(1,3,5): {j_val[0]:.1f}|{j_val[1]:.1f}|{j_val[2]:.1f}\n"
+        f"D(1,3,5): {d_val[0]:.1f}|{d_val[1]:.1f}|{d_val[2]:.1f}"
+    )
+    return msg
 
 # --- MAIN LOOP ---
+def scan_symbols(pool, symbols, btc_chg):
+    """
+    Descarga, calcula y evalúa `symbols`. No envía nada: devuelve
+    ([(symbol, signal_type, msg)], stats) para que decida quien coordina.
+    """
+    # 2. Descarga de velas (todas las monedas en paralelo)
+    t_fetch = time.perf_counter()
+    frames, coin_chg = fetch_all_klines(pool, symbols)
+    t_calc = time.perf_counter()
+
+    # 3. Cálculos de todo el universo en un solo paso
+    results = calculate_batch(frames)
+    t_eval = time.perf_counter()
+
+    # 4. Reglas sobre todo el universo de una vez; mensaje solo para las que dieron señal
+    signals = []
+    for symbol, signal_type in classify_batch(results, btc_chg).items():
+        if not signal_type: continue
+        try:
+            signals.append((symbol, signal_type, format_signal(symbol, results[symbol], signal_type, coin_chg[symbol])))
+        except Exception:
+            metrics.inc('symbols_skipped_total', reason='error')
+            continue
+
+    scores = priority_scores(results, btc_chg) if PRIORITY_SCAN else {}
+    trigger_states = {symbol: res['gatillo'] for symbol, res in results.items()} if TRIGGER_WATCH else {}
+
+    metrics.observe('fetch_seconds', t_calc - t_fetch)
+    metrics.observe('compute_seconds', t_eval - t_calc)
+    return signals, {'monedas': len(frames), 'velas': t_calc - t_fetch, 'calculo': t_eval - t_calc, 'puntajes': scores,
+                     'gatillos': trigger_states}
+
+# --- SHARDING: N procesos, cada uno con su parte de las monedas ---
+# Cada shard tiene su propia sesión HTTP (pool de conexiones) y sus hilos de
+# descarga; el coordinador (el proceso principal) tiene el filtro BTC y es el
+# ÚNICO que envía alertas. Cada moneda cae siempre en el mismo shard (crc32).
+# Los shards arrancan de cero ('spawn'): la configuración del módulo (las
+# constantes en MAYÚSCULAS, con lo que se haya cambiado en tiempo de
+# ejecución) viaja con cada shard, así escanean igual que un solo proceso.
+SHARD_SETTING_TYPES = (bool, int, float, str, list, tuple, dict, type(None), reglas.RuleSet)
+
+def shard_settings():
+    """Configuración actual del módulo para los shards: {NOMBRE: valor}."""
+    return {name: value for name, value in globals().items()
+            if name.isupper() and isinstance(value, SHARD_SETTING_TYPES)}
+
+def shard_worker(conn, base_url, settings=None):
+    globals().update(settings or {})
+    global BASE_URL
+    BASE_URL = base_url
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C lo maneja el coordinador
+    pool = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    while True:
+        job = conn.recv()
+        if job is None: break
+        symbols, btc_chg = job
+        try:
+            signals, stats = scan_symbols(pool, symbols, btc_chg)
+        except Exception as e:
+            print(f"⚠️ Shard: error en el escaneo ({e})")
+            signals, stats = [], {'monedas': 0, 'velas': 0.0, 'calculo': 0.0, 'puntajes': {}, 'gatillos': {}}
+        conn.send((signals, stats, metrics.drain()))
+
+class ShardCoordinator:
+    def __init__(self, n_shards, base_url=None, settings=None):
+        # 'spawn': cada shard arranca limpio (sin heredar sockets ni hilos del coordinador)
+        self.ctx = multiprocessing.get_context('spawn')
+        self.base_url = base_url or BASE_URL
+        self.settings = settings  # None = shard_settings() al lanzar cada shard (toma los cambios hasta ese momento)
+        self.shards = [self._spawn() for _ in range(n_shards)]
+
+    def _spawn(self):
+        parent, child = self.ctx.Pipe()
+        settings = self.settings if self.settings is not None else shard_settings()
+        proc = self.ctx.Process(target=shard_worker, args=(child, self.base_url, settings), daemon=True)
+        proc.start()
+        return proc, parent
+
+    def split(self, symbols):
+        parts = [[] for _ in self.shards]
+        for symbol in symbols:
+            parts[zlib.crc32(symbol.encode()) % len(parts)].append(symbol)
+        return parts
+
+    def scan(self, symbols, btc_chg):
+        """Reparte, espera a todos los shards y junta señales + stats + métricas."""
+        parts = self.split(symbols)
+        for (_, conn), part in zip(self.shards, parts):
+            conn.send((part, btc_chg))
+        signals = []
+        stats = {'monedas': 0, 'velas': 0.0, 'calculo': 0.0, 'puntajes': {}, 'gatillos': {}}
+        for i, (proc, conn) in enumerate(self.shards):
+            try:
+                shard_signals, shard_stats, shard_metrics = conn.recv()
+            except (EOFError, OSError):
+                print(f"⚠️ Shard {i} caído: se relanza ({len(parts[i])} monedas sin escanear este ciclo)")
+                metrics.inc('shard_restarts_total')
+                self.shards[i] = self._spawn()
+                continue
+            signals += shard_signals
+            metrics.merge(shard_metrics)
+            stats['monedas'] += shard_stats['monedas']
+            stats['puntajes'].update(shard_stats['puntajes'])
+            stats['gatillos'].update(shard_stats['gatillos'])
+            # Los shards corren en paralelo: cuenta el más lento
+            stats['velas'] = max(stats['velas'], shard_stats['velas'])
+            stats['calculo'] = max(stats['calculo'], shard_stats['calculo'])
+        return signals, stats
+
+    def close(self):
+        for proc, conn in self.shards:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+        for proc, _ in self.shards:
+            proc.join(timeout=5)
+
+priority = prioridad.ScanPriority()
+triggers = gatillos.TriggerBands(RULES)
+
+def update_triggers(trigger_states):
+    """Niveles gatillo de las monedas recién evaluadas (un solo cálculo vectorizado)."""
+    if not trigger_states:
+        return
+    symbols = list(trigger_states)
+    triggers.update(symbols, {tf: tuple(np.array([trigger_states[s][tf][i] for s in symbols]) for i in range(5))
+                              for tf in triggers.tfs})
+alert_cooldowns = cooldowns.CooldownStore('scalper', COOLDOWN_SECONDS)
+
+def scan_cycle(pool, shards=None):
+    t_cycle = time.perf_counter()
+
+    # Actualizamos la lista en cada vuelta grande por si el volumen cambia
+    symbols = get_liquid_symbols()
+
+    # 1. Chequeo BTC (Termómetro del mercado)
+    btc_df = get_klines('BTCUSDT', '1h', 2)
+    if len(btc_df['close']) > 0:
+        btc_chg = ((btc_df['close'][-1] - btc_df['open'][-1]) / btc_df['open'][-1]) * 100
+        print(f"⏳ BTC 1h: {btc_chg:.2f}% | Analizando {len(symbols)} monedas...")
+    else:
+        btc_chg = 0
+
+    # 2. Fuera las que están en cooldown (ya avisadas por este u otro proceso) y
+    # pre-filtro con los precios en bloque: fuera las que no pueden estar en un extremo
+    cooled = alert_cooldowns.cooled()
+    candidates = [symbol for symbol in symbols if symbol not in cooled]
+    metrics.inc('symbols_skipped_total', len(symbols) - len(candidates), reason='cooldown')
+    if PRESCREEN and candidates:
+        listed = candidates
+        sides = universo.possible_sides(RULES, btc_chg)
+        keep = universo.passes(universo.range_position(ticker_history.matrix(listed)), sides)
+        candidates = [symbol for symbol, ok in zip(listed, keep) if ok]
+        metrics.set('prescreen_pass_ratio', len(candidates) / len(listed))
+        metrics.inc('prescreen_dropped_total', len(listed) - len(candidates))
+        print(f"🌐 Pre-filtro: {len(candidates)} de {len(listed)} monedas pasan (lados posibles: {', '.join(sorted(sides)) or 'ninguno'})")
+
+    # 3. Niveles gatillo: con el precio del ticker alcanza para descartar las que no
+    # pueden dar señal antes de que cierre su vela de 3m/5m
+    if TRIGGER_WATCH and candidates:
+        triggers.forget(symbols)
+        prices = dict(zip(candidates, ticker_history.matrix(candidates)[:, -1]))
+        due = triggers.due(candidates, prices)
+        metrics.inc('symbols_skipped_total', len(candidates) - len(due), reason='gatillo')
+        print(f"🎯 Gatillos: {len(due)} de {len(candidates)} monedas con el precio en alguna banda")
+        candidates = due
+
+    # 4. Qué monedas tocan este ciclo y en qué orden (las calientes primero)
+    if PRIORITY_SCAN:
+        priority.forget(symbols)
+        due = priority.plan(candidates)
+        batches = [due[i:i + PRIORITY_CHUNK] for i in range(0, len(due), PRIORITY_CHUNK)]
+    else:
+        batches = [candidates]
+
+    # 5-7. Por tandas: velas + cálculos + reglas (en este proceso o repartido
+    # entre los shards) y envío de alertas apenas termina cada tanda
+    totals = {'monedas': 0, 'velas': 0.0, 'calculo': 0.0}
+    for n, batch in enumerate(batches):
+        if PRIORITY_SCAN and n > 0 and time.perf_counter() - t_cycle > SCAN_BUDGET_SECONDS:
+            deferred = sum(len(rest) for rest in batches[n:])
+            priority.defer([s for rest in batches[n:] for s in rest])
+            print(f"⌛ Presupuesto de {SCAN_BUDGET_SECONDS}s agotado: {deferred} monedas frías pasan al próximo ciclo")
+            break
+        if shards is not None:
+            signals, stats = shards.scan(batch, btc_chg)
+        else:
+            signals, stats = scan_symbols(pool, batch, btc_chg)
+        if PRIORITY_SCAN:
+            priority.update(batch, stats['puntajes'])
+        update_triggers(stats['gatillos'])
+        for key in totals:
+            totals[key] += stats[key]
+
+        # Envío de alertas: solo desde acá (el coordinador), nunca desde los shards
+        for symbol, signal_type, msg in signals:
+            if not alert_cooldowns.claim(symbol, signal_type): continue  # Ya la avisó otro proceso
+            print(f"\n{msg}\n")
+            send_telegram_alert(msg)
+            metrics.inc('alerts_total', type=signal_type)
+            metrics.observe('signal_seconds', time.perf_counter() - t_cycle)  # Del inicio del ciclo a la alerta
+
+    # Tiempo del ciclo (para ver la latencia real de la señal)
+    t_end = time.perf_counter()
+    metrics.observe('cycle_seconds', t_end - t_cycle)
+    metrics.set('symbols_listed', len(symbols))
+    metrics.set('symbols_scanned', totals['monedas'])
+    print(f"⏱️ Ciclo: {t_end - t_cycle:.1f}s (velas {totals['velas']:.1f}s | cálculo {totals['calculo']:.2f}s | "
+          f"{totals['monedas']} de {len(symbols)} monedas)")
+
 def run_bot():
     print("🚀 SCALPER ACTIVO (V8.0 - Filtro 100 Días)")
-    
-    while True:
+    metrics.start('scalper', METRICS_PORT)
+    pool = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    shards = ShardCoordinator(SHARDS) if SHARDS > 1 else None
+    if shards is not None:
+        print(f"🧩 Sharding: {SHARDS} procesos")
+        atexit.register(shards.close)
+
+    def cycle():
+        with metricas.profile_cycle(PROFILE_DIR, 'scalper'):
+            scan_cycle(pool, shards)
+
+    # Un escaneo por cierre de vela, nunca dos a la vez (ver planificador.py)
+    plan = planificador.Planificador('scalper')
+    plan.every(SCAN_INTERVAL, cycle, offset=SCAN_OFFSET_SECONDS, name='escaneo', run_now=True)
+    try:
+        plan.run()
+    except KeyboardInterrupt:
+        print("\n🛑 Fin.")
+        sys.exit()
+
+# --- MODO STREAM ---
+def ring_change(store, symbol):
+    # Cambio % de la vela 1h en curso (desde el buffer del stream)
+    ring = store.rings.get((symbol, '1h'))
+    if ring is None or len(ring) == 0: return 0.0
+    candle = ring.arrays()
+    return ((candle['close'][-1] - candle['open'][-1]) / candle['open'][-1]) * 100
+
+def run_stream_bot():
+    print("📡 SCALPER ACTIVO (MODO STREAM)")
+    metrics.start('scalper', METRICS_PORT)
+    # El universo se fija al arrancar (reiniciar para refrescarlo)
+    symbols = get_liquid_symbols()
+    watched = set(symbols)
+    subscribed = sorted(watched | {'BTCUSDT'})
+
+    # 1. Buffers del snapshot que siguen al día; el resto se siembra con el historial REST (en paralelo)
+    store = stream_velas.CandleStore(STREAM_BUFFER)
+    saved = estado.load(SNAPSHOT_PATH)
+    print(f"♻️ {estado.restore_store(store, saved.get('velas'))} buffers recuperados del snapshot")
+    jobs = [(symbol, tf, size) for symbol in subscribed for tf, size in STREAM_BUFFER.items()
+            if (symbol, tf) not in store.rings]
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        raws = pool.map(lambda job: get_binance_data("/fapi/v1/klines", {'symbol': job[0], 'interval': job[1], 'limit': job[2]}), jobs)
+        for (symbol, tf, _), raw in zip(jobs, raws):
+            if raw: store.seed(symbol, tf, raw)
+
+    throttle = stream_velas.Throttle(EVAL_THROTTLE_SECONDS)
+    snapshot = estado.Snapshotter(SNAPSHOT_PATH, lambda: {'velas': store})
+    atexit.register(snapshot.maybe_save, True)
+
+    # 2. Evaluar las reglas apenas se mueve una vela
+    def on_update(symbol, interval, closed):
+        metrics.inc('stream_updates_total', interval=interval)
+        snapshot.maybe_save()
+        if symbol not in watched or interval not in TIMEFRAMES: return
+        if not throttle.ready(symbol, force=closed): return
         try:
-            # Actualizamos la lista en cada vuelta grande por si el volumen cambia
-            symbols = get_liquid_symbols()
-
-            # 1. Chequeo BTC (Termómetro del mercado)
-            btc_df = get_klines('BTCUSDT', '1h', 2)
-            if not btc_df.empty:
-                btc_chg = ((btc_df['close'].iloc[-1] - btc_df['open'].iloc[-1]) / btc_df['open'].iloc[-1]) * 100
-                print(f"⏳ BTC 1h: {btc_chg:.2f}% | Analizando {len(symbols)} monedas...")
-            else:
-                btc_chg = 0
-
-            # 2. Escaneo de Monedas
-            for symbol in symbols:
-                try:
-                    # Obtenemos Dataframes
-                    df_1m = get_klines(symbol, '1m', 35)
-                    df_3m = get_klines(symbol, '3m', 35)
-                    df_5m = get_klines(symbol, '5m', 35)
-                    
-                    # Necesitamos data suficiente
-                    if len(df_5m) < 25: continue
-                    
-                    # Obtenemos cambio 1H de la moneda (para el reporte)
-                    df_1h_coin = get_klines(symbol, '1h', 2)
-                    coin_chg_1h = 0.0
-                    if not df_1h_coin.empty:
-                          coin_chg_1h = ((df_1h_coin['close'].iloc[-1] - df_1h_coin['open'].iloc[-1]) / df_1h_coin['open'].iloc[-1]) * 100
-
-                    # --- CÁLCULOS ---
-                    k1, d1, j1 = calculate_kdj(df_1m)
-                    k3, d3, j3 = calculate_kdj(df_3m)
-                    k5, d5, j5 = calculate_kdj(df_5m)
-                    _, sig1 = calculate_macd(df_1m)
-                    _, sig3 = calculate_macd(df_3m)
-                    _, sig5 = calculate_macd(df_5m)
-                    
-                    # Bandas Bollinger (Usamos 5m como referencia visual)
-                    upper_bb, lower_bb = calculate_bollinger(df_5m)
-                    
-                    # Valores actuales (última vela cerrada o actual)
-                    j_val = [j1.iloc[-1], j3.iloc[-1], j5.iloc[-1]]
-                    d_val = [d1.iloc[-1], d3.iloc[-1], d5.iloc[-1]]
-                    s_val = [sig1.iloc[-1], sig3.iloc[-1], sig5.iloc[-1]]
-                    
-                    price = df_5m['close'].iloc[-1]
-                    up_band = upper_bb.iloc[-1]
-                    low_band = lower_bb.iloc[-1]
-                    
-                    signal_type = None
-
-                    # --- LÓGICA DE ENTRADA ---
-                    # LONG: BTC estable/subiendo + J negativo + D bajo + MACD negativo (sobreventa)
-                    if (btc_chg > -1.2 and 
-                        j_val[0]<0 and d_val[0]<25 and s_val[0]<0 and 
-                        j_val[1]<0 and d_val[1]<25 and s_val[1]<0 and 
-                        j_val[2]<0 and d_val[2]<25 and s_val[2]<0):
-                        signal_type = "LONG"
-                        ref_band = low_band
-                        band_name = "Inf"
-
-                    # SHORT: BTC estable/bajando + J alto + D alto + MACD positivo (sobrecompra)
-                    elif (btc_chg < 1.2 and 
-                          j_val[0]>100 and d_val[0]>75 and s_val[0]>0 and 
-                          j_val[1]>100 and d_val[1]>75 and s_val[1]>0 and 
-                          j_val[2]>100 and d_val[2]>75 and s_val[2]>0):
-                        signal_type = "SHORT"
-                        ref_band = up_band
-                        band_name = "Sup"
-
-                    # --- ENVÍO DE ALERTA ---
-                    if signal_type:
-                        # Calcular distancia a la banda
-                        dist_pct = ((price - ref_band) / ref_band) * 100
-                        state_str = f"ROMPIENDO ({abs(dist_pct):.2f}%)" if (signal_type=="LONG" and price<ref_band) or (signal_type=="SHORT" and price>ref_band) else f"Cercano ({abs(dist_pct):.2f}%)"
-                        
-                        icon = "🟢" if signal_type == "LONG" else "🔴"
-                        
-                        msg = (
-                            f"{icon} {signal_type} {symbol}\n"
-                            f"Precio: {price}\n"
-                            f"Banda {band_name} (5m): {ref_band:.4f}\n"
-                            f"Estado: {state_str}\n"
-                            f"Cambio 1h: {coin_chg_1h:.2f}%\n"
-                            f"----------------\n"
-                            f"J(1,3,5): {j_val[0]:.1f}|{j_val[1]:.1f}|{j_val[2]:.1f}\n"
-                            f"D(1,3,5): {d_val[0]:.1f}|{d_val[1]:.1f}|{d_val[2]:.1f}"
-                        )
-                        print(f"\n{msg}\n")
-                        send_telegram_alert(msg)
-                        time.sleep(2) # Pequeña pausa para no saturar si salen varias juntas
-
-                except Exception as e:
-                    continue
-            
-            # Pausa entre ciclos de escaneo completo
-            print("💤 Esperando 60s...")
-            time.sleep(60)
+            frames = store.frames(symbol, TIMEFRAMES)
+            if frames is None or len(frames['5m']['close']) < 25: return
+
+            with metrics.timer('compute_seconds'):
+                res = calculate_batch({symbol: frames})[symbol]
+                signal_type, msg = evaluate_signal(symbol, res, ring_change(store, 'BTCUSDT'), ring_change(store, symbol))
+            metrics.inc('evaluations_total')
+            # ≈ una alerta por vela, como en el modo REST (y nunca dos entre procesos)
+            if not signal_type or not alert_cooldowns.claim(symbol, signal_type): return
 
-        except KeyboardInterrupt:
-            print("\n🛑 Fin.")
-            sys.exit()
-        except:
-            time.sleep(10)
+            print(f"\n{msg}\n")
+            send_telegram_alert(msg)
+            metrics.inc('alerts_total', type=signal_type)
+        except Exception as e:
+            metrics.inc('symbols_skipped_total', reason='error')
+            print(f"Error en {symbol}: {e}")
+
+    # Hueco tras una caída del stream: se re-siembra por REST antes de evaluar
+    reseed = lambda symbol, interval, limit: get_binance_data("/fapi/v1/klines", {'symbol': symbol, 'interval': interval, 'limit': limit})
+    asyncio.run(stream_velas.run_stream(store, subscribed, list(STREAM_BUFFER), on_update, base_url=STREAM_URL, reseed=reseed))
 
 if __name__ == '__main__':
-    run_bot()
+    try:
+        run_stream_bot() if STREAM_MODE else run_bot()
+    except KeyboardInterrupt:
+        print("\n🛑 Fin.")
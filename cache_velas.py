@@ -0,0 +1,83 @@
+import time
+import stream_velas
+import velas
+from metricas import metrics
+
+# ==========================================
+# 🗄️ CACHÉ DE KLINES REST ATADA AL CIERRE DE LAS VELAS
+# ==========================================
+# Una ventana de 4h cambia de verdad una vez cada 4 horas: entre cierres lo
+# único que se mueve es la vela en curso. Por (símbolo, intervalo) se guarda
+# la ventana en un CandleRing (el mismo buffer del modo stream) y en cada
+# pedido se trae solo lo que puede haber cambiado:
+#
+#   - sin ventana (o con un hueco de más de un cierre): la ventana completa
+#   - misma vela en curso que la guardada:            limit=1 (la vela en curso)
+#   - cerró una vela desde el último pedido:          limit=2 (la que cerró + la nueva)
+#
+# Qué vela está en curso se sabe por el reloj: los cortes de Binance son
+# múltiplos del intervalo desde epoch (UTC). Si el exchange todavía no
+# publicó la vela nueva, el pedido de limit=2 se repite en el próximo ciclo.
+#
+# fetch(symbol, interval, limit) devuelve klines crudas (/fapi/v1/klines);
+# en bot_rescate es client.futures_klines, así se reutiliza su sesión.
+
+
+def kline_weight(limit):
+    """Peso de /fapi/v1/klines según limit (tabla de Binance Futures)."""
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    return 5 if limit <= 1000 else 10
+
+
+class KlineCache:
+    def __init__(self, fetch, sizes):
+        self.fetch = fetch
+        self.store = stream_velas.CandleStore(sizes)  # {interval: velas de la ventana}
+        self.weight = 0         # Peso pedido desde el último reset_weight()
+        self.full_weight = 0    # Lo que hubiera costado bajar siempre la ventana completa
+
+    def limit_for(self, symbol, interval, now_ms=None):
+        """Cuántas velas hay que pedir para tener al día la ventana de (symbol, interval)."""
+        size = self.store.sizes[interval]
+        ring = self.store.rings.get((symbol, interval))
+        if ring is None or len(ring) == 0:
+            return size
+        step = velas.interval_ms(interval)
+        now_ms = time.time() * 1000 if now_ms is None else now_ms
+        closes = int(now_ms // step * step - ring.last_open_time()) // step
+        if closes <= 0:
+            return 1
+        return 2 if closes == 1 else size
+
+    def get(self, symbol, interval, now_ms=None):
+        """
+        Pone al día la ventana y devuelve (velas nuevas, completa). completa=True
+        si se bajó la ventana entera (hay que recalcular todo desde frame()).
+        """
+        size = self.store.sizes[interval]
+        limit = self.limit_for(symbol, interval, now_ms)
+        klines = self.fetch(symbol, interval, limit)
+        self.weight += kline_weight(limit)
+        self.full_weight += kline_weight(size)
+        metrics.inc('kline_cache_requests_total', interval=interval, kind='completa' if limit == size else 'parcial')
+        if limit == size:
+            self.store.rings.pop((symbol, interval), None)
+        self.store.seed(symbol, interval, klines)
+        return klines, limit == size
+
+    def frame(self, symbol, interval):
+        """La ventana guardada como dict de arrays (ver velas.py)."""
+        return self.store.ring(symbol, interval).arrays()
+
+    def drop(self, symbol, interval):
+        """Descarta la ventana (el próximo get() la baja completa)."""
+        self.store.rings.pop((symbol, interval), None)
+
+    def reset_weight(self):
+        """Devuelve (peso pedido, peso sin caché) desde la última llamada y los pone en 0."""
+        used, full = self.weight, self.full_weight
+        self.weight = self.full_weight = 0
+        return used, full
@@ -71,3 +71,26 @@ WATCHLIST_DICT = {
 # True (Verdadero) = Busca NUEVAS oportunidades en los 70 tickers (Escenario A).
 # False (Falso)    = SOLO revisa tu Portfolio para VENTA o RECOMPRA (Escenarios B y C).
 BUSCAR_NUEVAS_ENTRADAS = True
+
+
+# ==========================================
+# 📐 REGLAS DE SEÑALES (ver reglas.py)
+# ==========================================
+# Cada condición: (indicador, timeframe, comparador, umbral). Se tienen que
+# cumplir todas; si un activo cumple las dos reglas, gana la primera.
+# 'portfolio' vale 1 para los activos de PORTFOLIO y 0 para el resto.
+REGLAS = {
+    # COMPRA (ESTRICTA): todos en suelo
+    'compra': [
+        ('j', '1h', '<=', 0), ('d', '1h', '<=', 25),
+        ('j', '4h', '<=', 0), ('d', '4h', '<=', 25),
+        ('j', '1d', '<=', 0), ('d', '1d', '<=', 25),
+    ],
+    # VENTA (CALIBRADA): solo portfolio. 1H gatillo rápido, 4H confirmación, 1D contexto de techo
+    'venta': [
+        ('portfolio', None, '==', 1),
+        ('j', '1h', '>=', 95), ('d', '1h', '>=', 70),
+        ('j', '4h', '>=', 90), ('d', '4h', '>=', 65),
+        ('j', '1d', '>=', 80), ('d', '1d', '>=', 60),
+    ],
+}
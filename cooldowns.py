@@ -0,0 +1,94 @@
+import os
+import sqlite3
+import threading
+import time
+from metricas import metrics
+
+# ==========================================
+# ❄️ COOLDOWNS DE ALERTAS COMPARTIDOS (SQLITE EN MODO WAL)
+# ==========================================
+# Un solo archivo para los tres bots (y para varias copias del mismo bot):
+# cada alerta "reclama" (bot, símbolo, tipo de señal) por un TTL. El reclamo
+# es atómico (un UPSERT condicional): si dos procesos detectan la misma
+# señal, solo uno la envía.
+#
+#   store = cooldowns.CooldownStore('rescate', {'*': 14400})
+#   cooled = store.cooled()               # Una consulta por ciclo, antes de pedir velas
+#   if symbol in cooled: ...              # Chequeo O(1) en memoria
+#   if store.claim(symbol, 'LONG'): enviar(...)
+#
+# TTL por tipo de señal: {'LONG': 900, 'SHORT': 600, '*': 900} ('*' = el resto).
+# Los vencidos se borran solos cada EVICT_EVERY_SECONDS. WAL deja leer
+# mientras otro proceso escribe; la base sobrevive a los reinicios.
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cooldowns.sqlite')
+EVICT_EVERY_SECONDS = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cooldowns (
+    bot TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (bot, symbol, kind)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cooldowns_expires ON cooldowns (expires_at);
+"""
+
+
+class CooldownStore:
+    def __init__(self, bot, ttls, path=DB_PATH):
+        self.bot = bot
+        self.ttls = ttls
+        self.lock = threading.Lock()  # Una conexión por proceso, compartida entre hilos
+        self.db = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.last_evict = 0.0
+
+    def ttl(self, kind):
+        return self.ttls.get(kind, self.ttls['*'])
+
+    def cooled(self, now=None):
+        """Símbolos con algún cooldown vigente de este bot (para filtrar antes de descargar)."""
+        now = time.time() if now is None else now
+        self.evict(now)
+        with self.lock:
+            rows = self.db.execute("SELECT DISTINCT symbol FROM cooldowns WHERE bot = ? AND expires_at > ?",
+                                   (self.bot, now)).fetchall()
+        return {symbol for symbol, in rows}
+
+    def blocked(self, symbol, now=None):
+        """¿El símbolo tiene algún cooldown vigente? (una consulta por la clave primaria)"""
+        now = time.time() if now is None else now
+        with self.lock:
+            row = self.db.execute("SELECT 1 FROM cooldowns WHERE bot = ? AND symbol = ? AND expires_at > ? LIMIT 1",
+                                  (self.bot, symbol, now)).fetchone()
+        return row is not None
+
+    def claim(self, symbol, kind, now=None):
+        """
+        Reserva (symbol, kind) por su TTL. Devuelve False si ya estaba reservado
+        (por este u otro proceso): en ese caso la alerta NO se envía.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            cursor = self.db.execute(
+                "INSERT INTO cooldowns (bot, symbol, kind, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (bot, symbol, kind) DO UPDATE SET expires_at = excluded.expires_at "
+                "WHERE cooldowns.expires_at <= ?",
+                (self.bot, symbol, kind, now + self.ttl(kind), now))
+        claimed = cursor.rowcount == 1
+        metrics.inc('cooldown_claims_total', result='ok' if claimed else 'duplicada')
+        return claimed
+
+    def evict(self, now=None):
+        """Borra los vencidos (de todos los bots) como mucho cada EVICT_EVERY_SECONDS."""
+        now = time.time() if now is None else now
+        if now - self.last_evict < EVICT_EVERY_SECONDS:
+            return
+        self.last_evict = now
+        with self.lock:
+            removed = self.db.execute("DELETE FROM cooldowns WHERE expires_at <= ?", (now,)).rowcount
+        metrics.inc('cooldown_evicted_total', removed)
@@ -0,0 +1,178 @@
+import os
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from metricas import metrics
+
+# ==========================================
+# 📥 DESCARGA EN LOTE (YAHOO FINANCE)
+# ==========================================
+# Un solo yf.download multi-ticker por intervalo en lugar de un
+# yf.Ticker(...).history() por activo. Los lotes van en secuencia porque
+# yf.download guarda sus resultados en variables globales del módulo
+# (dos descargas simultáneas se pisan); dentro de cada lote yfinance ya
+# baja los tickers en paralelo (threads=True).
+
+CHUNK_SIZE = 40                       # Tickers por llamada a yf.download
+EXCHANGE_TZ = 'America/New_York'      # Mismo huso que devuelve Ticker.history()
+
+
+def _split(raw, tickers):
+    """Separa el DataFrame multi-ticker en {ticker: df} (sin filas vacías)."""
+    frames = {}
+    for ticker in tickers:
+        try:
+            df = raw[ticker] if raw.columns.nlevels > 1 else raw
+        except KeyError:
+            continue
+        df = df.dropna(how='all')
+        if df.empty:
+            continue
+        if df.index.tz is None:
+            df = df.tz_localize(EXCHANGE_TZ)  # Diario: yfinance lo devuelve sin huso
+        else:
+            df = df.tz_convert(EXCHANGE_TZ)
+        frames[ticker] = df
+    return frames
+
+
+def download_batch(tickers, period=None, interval='1d', start=None, chunk_size=CHUNK_SIZE):
+    """
+    Descarga `period` (o desde `start`) en `interval` de todos los tickers.
+    Devuelve (frames, errores): {ticker: df} y {ticker: motivo} para los que fallaron.
+    """
+    window = {'start': start} if start is not None else {'period': period}
+    tickers = list(tickers)
+    frames = {}
+    errors = {}
+    for i in range(0, len(tickers), chunk_size):
+        chunk = tickers[i:i + chunk_size]
+        metrics.inc('yahoo_downloads_total', interval=interval)
+        try:
+            with metrics.timer('yahoo_download_seconds', interval=interval):
+                raw = yf.download(chunk, interval=interval, group_by='ticker',
+                                  auto_adjust=True, threads=True, progress=False, **window)
+        except Exception as e:
+            metrics.inc('yahoo_ticker_errors_total', len(chunk), interval=interval)
+            for ticker in chunk:
+                errors[ticker] = f"descarga fallida: {e}"
+            continue
+
+        # yfinance deja el motivo de cada ticker fallido en shared._ERRORS
+        yf_errors = getattr(getattr(yf, 'shared', None), '_ERRORS', {}) or {}
+        got = _split(raw, chunk)
+        frames.update(got)
+        for ticker in chunk:
+            if ticker not in got:
+                errors[ticker] = str(yf_errors.get(ticker, 'sin datos'))
+                metrics.inc('yahoo_ticker_errors_total', interval=interval)
+    return frames, errors
+
+
+# ==========================================
+# 💾 CACHÉ OHLCV EN DISCO (INCREMENTAL)
+# ==========================================
+# Un archivo .npy por (ticker, intervalo) con columnas [epoch_s, O, H, L, C, V].
+# En cada escaneo solo se piden las velas desde la última guardada: esa
+# última vela (que pudo estar a medio formar) se reemplaza por la nueva.
+# Al arrancar no se lee nada: cada archivo se abre (mmap) recién cuando se usa.
+#
+# Splits y dividendos: los precios vienen ajustados (auto_adjust=True), así
+# que un ajuste nuevo cambia TODA la historia. Por eso la descarga
+# incremental arranca una vela cerrada antes: si esa vela ya no coincide con
+# la guardada (más allá de ADJUST_RTOL), el ticker se baja completo otra vez.
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache_ohlcv')
+PERIOD_DAYS = {'5d': 5, '1mo': 31, '3mo': 92, '6mo': 183, '1y': 366}
+KEEP_BARS = {'1h': 600, '1d': 400}    # Compactación: velas máximas guardadas por archivo
+FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+PRICE_FIELDS = ['Open', 'High', 'Low', 'Close']
+ADJUST_RTOL = 1e-4                    # Diferencia relativa que delata un ajuste nuevo
+
+
+def _to_array(df):
+    epoch = df.index.tz_convert('UTC').tz_localize(None).to_numpy(dtype='datetime64[s]').astype(np.int64)
+    return np.column_stack([epoch.astype(np.float64), df[FIELDS].to_numpy(dtype=np.float64)])
+
+
+def _to_frame(arr):
+    index = pd.to_datetime(arr[:, 0].astype(np.int64), unit='s', utc=True).tz_convert(EXCHANGE_TZ)
+    return pd.DataFrame(np.array(arr[:, 1:]), index=index, columns=FIELDS)
+
+
+class OHLCVCache:
+    def __init__(self, path=CACHE_DIR, download=download_batch):
+        self.path = path
+        self.download = download  # Misma firma que download_batch (bench_carga.py inyecta otro)
+        self.frames = {}  # {(ticker, interval): df} ya leídos (o None si no hay archivo)
+
+    def _file(self, ticker, interval):
+        return os.path.join(self.path, f"{ticker}_{interval}.npy")
+
+    def load(self, ticker, interval):
+        key = (ticker, interval)
+        if key not in self.frames:
+            f = self._file(ticker, interval)
+            self.frames[key] = _to_frame(np.load(f, mmap_mode='r')) if os.path.exists(f) else None
+        return self.frames[key]
+
+    def save(self, ticker, interval, df):
+        df = df.iloc[-KEEP_BARS.get(interval, 1000):]
+        self.frames[(ticker, interval)] = df
+        os.makedirs(self.path, exist_ok=True)
+        f = self._file(ticker, interval)
+        tmp = f + '.tmp'
+        with open(tmp, 'wb') as fh:
+            np.save(fh, _to_array(df))
+        os.replace(tmp, f)  # Escritura atómica: nunca queda un archivo a medias
+
+    def get(self, tickers, period, interval):
+        """
+        Igual que download_batch(tickers, period, interval) pero usando la caché.
+        Devuelve (frames, errores, stats) con stats = {'completas': n, 'incrementales': n, 'reajustadas': n}.
+        Un ticker que no se pudo actualizar va a errores y no a frames (nunca velas viejas).
+        """
+        cutoff = pd.Timestamp.now(tz=EXCHANGE_TZ) - pd.Timedelta(days=PERIOD_DAYS[period])
+        full = []
+        by_start = {}  # {fecha_desde: [tickers]} -> una descarga por fecha
+        for ticker in tickers:
+            cached = self.load(ticker, interval)
+            if cached is None or len(cached) < 2 or cached.index[-1] < cutoff:
+                full.append(ticker)
+            else:
+                # Desde la última vela CERRADA (la anterior a la parcial): se usa para detectar ajustes
+                start = cached.index[-2].strftime('%Y-%m-%d')
+                by_start.setdefault(start, []).append(ticker)
+
+        errors = {}
+        adjusted = []
+        for start, group in by_start.items():
+            fresh, failed = self.download(group, interval=interval, start=start)
+            # Sin la parte nueva lo guardado está viejo: se informa y no se devuelve
+            errors.update({ticker: f"sin actualizar: {motivo}" for ticker, motivo in failed.items()})
+            for ticker, df in fresh.items():
+                cached = self.frames[(ticker, interval)]
+                overlap = cached.index[-2]
+                if overlap not in df.index or not np.allclose(df.loc[overlap, PRICE_FIELDS].to_numpy(dtype=np.float64),
+                                                              cached.loc[overlap, PRICE_FIELDS].to_numpy(dtype=np.float64),
+                                                              rtol=ADJUST_RTOL, atol=0):
+                    adjusted.append(ticker)  # Split/dividendo: la historia guardada quedó en otra escala
+                    continue
+                # Se descarta lo guardado desde la primera vela nueva (incluye la vela parcial)
+                merged = pd.concat([cached[cached.index < df.index[0]], df[FIELDS]])
+                self.save(ticker, interval, merged[merged.index >= cutoff])
+
+        if full or adjusted:
+            fresh, failed = self.download(full + adjusted, period=period, interval=interval)
+            errors.update(failed)
+            for ticker, df in fresh.items():
+                self.save(ticker, interval, df)
+
+        frames = {}
+        for ticker in tickers:
+            df = self.frames.get((ticker, interval))
+            if ticker not in errors and df is not None and not df.empty:
+                frames[ticker] = df[df.index >= cutoff]
+        stats = {'completas': len(full), 'incrementales': sum(len(g) for g in by_start.values()) - len(adjusted),
+                 'reajustadas': len(adjusted)}
+        return frames, errors, stats
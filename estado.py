@@ -0,0 +1,93 @@
+import os
+import pickle
+import time
+import velas
+
+# ==========================================
+# 💾 SNAPSHOTS PARA REINICIO EN CALIENTE
+# ==========================================
+# Cada bot guarda periódicamente (y al salir) lo que no quiere perder en un
+# reinicio: buffers de velas y estado incremental de indicadores (los
+# cooldowns de alertas viven aparte, en cooldowns.sqlite). Un solo pickle
+# por bot, escrito de forma atómica.
+# Al arrancar se valida: snapshot muy viejo o de otra versión = se ignora;
+# buffers con velas faltantes se descartan de a uno.
+
+SNAPSHOT_VERSION = 1
+MAX_AGE_SECONDS = 6 * 3600      # Más viejo que esto no sirve (hay que re-sembrar todo igual)
+SAVE_EVERY_SECONDS = 60
+
+
+def snapshot_path(name):
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), f"estado_{name}.pkl")
+
+
+def save(path, data):
+    payload = {'version': SNAPSHOT_VERSION, 'saved_at': time.time(), 'data': data}
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as fh:
+        pickle.dump(payload, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)  # Nunca queda un snapshot a medias
+
+
+def load(path, max_age=MAX_AGE_SECONDS):
+    """Devuelve el dict guardado, o {} si no hay snapshot utilizable."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'rb') as fh:
+            payload = pickle.load(fh)
+    except Exception as e:
+        print(f"⚠️ Snapshot ilegible ({e}): arranque en frío.")
+        return {}
+    age = time.time() - payload.get('saved_at', 0)
+    if payload.get('version') != SNAPSHOT_VERSION or age > max_age:
+        print(f"ℹ️ Snapshot descartado (versión {payload.get('version')}, {age / 60:.0f} min): arranque en frío.")
+        return {}
+    print(f"♻️ Snapshot de hace {age:.0f}s recuperado.")
+    return payload['data']
+
+
+def ring_is_current(ring, interval, now_ms=None):
+    """
+    ¿El buffer llega hasta la vela EN CURSO? Si la última vela guardada es
+    anterior, falta (al menos) el cierre de una vela y hay que re-sembrarlo.
+    """
+    last = ring.last_open_time()
+    if last is None:
+        return False
+    now_ms = time.time() * 1000 if now_ms is None else now_ms
+    step = velas.interval_ms(interval)
+    return last == int(now_ms // step * step)
+
+
+def restore_store(store, saved, now_ms=None):
+    """Pasa a `store` los buffers de `saved` (un CandleStore del snapshot) que siguen al día."""
+    if saved is None:
+        return 0
+    kept = 0
+    for (symbol, interval), ring in saved.rings.items():
+        if store.sizes.get(interval) == ring.size and ring_is_current(ring, interval, now_ms):
+            ring.interval_ms = velas.interval_ms(interval)  # Snapshots viejos: sin chequeo de huecos
+            store.rings[(symbol, interval)] = ring
+            kept += 1
+    return kept
+
+
+class Snapshotter:
+    """Guarda collect() en path como mucho cada `every` segundos (y siempre con force=True)."""
+
+    def __init__(self, path, collect, every=SAVE_EVERY_SECONDS):
+        self.path = path
+        self.collect = collect
+        self.every = every
+        self.last = time.monotonic()
+
+    def maybe_save(self, force=False):
+        if not force and time.monotonic() - self.last < self.every:
+            return
+        self.last = time.monotonic()
+        try:
+            save(self.path, self.collect())
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar el snapshot: {e}")
@@ -0,0 +1,162 @@
+import time
+import numpy as np
+
+# ==========================================
+# 🎯 NIVELES GATILLO: ¿A QUÉ PRECIO PUEDE SALTAR LA SEÑAL?
+# ==========================================
+# Con la vela en curso, K/D/J son funciones lineales del RSV (isig=3):
+#
+#   K = (rsv + 2·Kp) / 3
+#   D = (rsv + 2·Kp + 6·Dp) / 9
+#   J = (7·rsv + 14·Kp − 12·Dp) / 9
+#
+# (Kp/Dp = K/D de la última vela cerrada). El RSV solo depende del precio y
+# del rango de las últimas `ilong` velas: rsv = 100·(P − lo)/(hi − lo), y si
+# P sale del rango pasa a ser el nuevo mínimo/máximo (rsv 0/100). Entonces
+# cada condición J/D de una regla es un tope de RSV; por ejemplo el LONG del
+# rescate (J <= 0 y D <= 25) pide rsv <= min((12·Dp − 14·Kp)/7, 225 − 2·Kp − 6·Dp).
+#
+# Después de cada evaluación completa se guardan esos topes por (moneda,
+# regla, timeframe). Entre evaluaciones alcanza con el precio (un pedido en
+# bloque para todas): solo se piden velas de las monedas cuyo precio entró
+# en la banda de alguna regla. Vale mientras no cierre la vela del timeframe:
+# uno que ya cerró deja de restringir (su Kp/Dp cambió). Las condiciones que
+# no son J/D/K (MACD, filtro BTC, portfolio) no se miran: la banda solo puede
+# quedar más ancha, nunca más angosta. RSV_MARGIN cubre los máximos/mínimos
+# intra-vela que el precio muestreado no ve.
+
+RSV_MARGIN = 5.0  # Puntos de RSV de tolerancia a cada lado
+
+
+def linear_terms(k_prev, d_prev, isig=3):
+    """{'k'|'d'|'j': (pendiente, ordenada)}: valor de la vela en curso = pendiente·rsv + ordenada."""
+    c = 1.0 / isig
+    return {
+        'k': (c, (1 - c) * k_prev),
+        'd': (c * c, c * (1 - c) * k_prev + (1 - c) * d_prev),
+        'j': (3 * c - 2 * c * c, (1 - c) * (3 - 2 * c) * k_prev - 2 * (1 - c) * d_prev),
+    }
+
+
+def state_from_incremental(ind):
+    """(Kp, Dp, lo, hi, cierre_ms) de un IncrementalIndicators (NaN si todavía no hay ventana)."""
+    open_time, high, low, _ = ind.forming
+    if len(ind.highs) < ind.ilong - 1:
+        return ind.k_prev, ind.d_prev, np.nan, np.nan, open_time + ind.step
+    return ind.k_prev, ind.d_prev, min(min(ind.lows), low), max(max(ind.highs), high), open_time + ind.step
+
+
+def state_from_arrays(open_time, high, low, k, d, step, ilong=9):
+    """Lo mismo desde matrices monedas × velas (la última es la vela en curso) y el k/d de indicadores.kdj."""
+    lo = np.asarray(low, dtype=np.float64)[..., -ilong:].min(axis=-1)
+    hi = np.asarray(high, dtype=np.float64)[..., -ilong:].max(axis=-1)
+    return k[..., -2], d[..., -2], lo, hi, np.asarray(open_time)[..., -1] + step
+
+
+class TriggerBands:
+    def __init__(self, rules, margin=RSV_MARGIN, isig=3):
+        self.rules = rules          # reglas.RuleSet
+        self.margin = margin
+        self.isig = isig
+        self.tfs = [tf for tf in rules.timeframes
+                    if any(ind in ('j', 'd', 'k') and t == tf for conds in rules.rules.values() for ind, t, _, _ in conds)]
+        self.levels = {}            # {symbol: {'lo', 'hi', 'closes_at': (tfs,), 'rsv_lo', 'rsv_hi': (reglas, tfs)}}
+
+    def bounds(self, states):
+        """
+        states: {tf: (Kp, Dp, lo, hi, cierre_ms)}, cada uno escalar o array de monedas.
+        Devuelve (rsv_lo, rsv_hi) con forma (..., reglas, tfs) y (lo, hi, closes_at) con forma (..., tfs).
+        """
+        shape = np.shape(states[self.tfs[0]][0])
+        rsv_lo = np.full(shape + (len(self.rules.names), len(self.tfs)), -np.inf)
+        rsv_hi = np.full(shape + (len(self.rules.names), len(self.tfs)), np.inf)
+        for t, tf in enumerate(self.tfs):
+            k_prev, d_prev = (np.asarray(x, dtype=np.float64) for x in states[tf][:2])
+            terms = linear_terms(k_prev, d_prev, self.isig)
+            for r, name in enumerate(self.rules.names):
+                for ind, cond_tf, op, thr in self.rules.rules[name]:
+                    if cond_tf != tf or ind not in terms:
+                        continue
+                    slope, offset = terms[ind]
+                    limit = (thr - offset) / slope
+                    if op in ('<', '<=', '=='):
+                        rsv_hi[..., r, t] = np.minimum(rsv_hi[..., r, t], limit)
+                    if op in ('>', '>=', '=='):
+                        rsv_lo[..., r, t] = np.maximum(rsv_lo[..., r, t], limit)
+        window = [np.stack([np.asarray(states[tf][i], dtype=np.float64) for tf in self.tfs], axis=-1) for i in (2, 3, 4)]
+        return rsv_lo, rsv_hi, window[0], window[1], window[2]
+
+    def update(self, symbols, states):
+        """Guarda los niveles de `symbols` (en el orden de los arrays de states) tras una evaluación completa."""
+        rsv_lo, rsv_hi, lo, hi, closes_at = self.bounds(states)
+        if np.ndim(lo) == 1:
+            rsv_lo, rsv_hi, lo, hi, closes_at = (x[None] for x in (rsv_lo, rsv_hi, lo, hi, closes_at))
+        for i, symbol in enumerate(symbols):
+            self.levels[symbol] = {'rsv_lo': rsv_lo[i], 'rsv_hi': rsv_hi[i], 'lo': lo[i], 'hi': hi[i], 'closes_at': closes_at[i]}
+
+    def possible(self, symbol, price, now_ms=None):
+        """¿Alguna regla puede cumplirse con este precio? True si no hay niveles vigentes."""
+        level = self.levels.get(symbol)
+        if level is None or price is None or not np.isfinite(price):
+            return True
+        now_ms = time.time() * 1000 if now_ms is None else now_ms
+        # El precio visto también estira el rango de la vela en curso
+        level['lo'] = np.fmin(level['lo'], price)
+        level['hi'] = np.fmax(level['hi'], price)
+        active = (now_ms < level['closes_at']) & np.isfinite(level['lo'])
+        if not active.any():
+            return True
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsv = 100 * (price - level['lo']) / (level['hi'] - level['lo'])
+        rsv = np.where(np.isnan(rsv), 50.0, rsv)  # Rango nulo: igual que kdj (RSV 50)
+        inside = (rsv >= level['rsv_lo'] - self.margin) & (rsv <= level['rsv_hi'] + self.margin)
+        return bool((inside | ~active).all(axis=-1).any())
+
+    def due(self, symbols, prices, now_ms=None):
+        """Las monedas de `symbols` que hay que evaluar completas. prices: {symbol: precio}."""
+        return [symbol for symbol in symbols if self.possible(symbol, prices.get(symbol), now_ms)]
+
+    def price_levels(self, symbol, now_ms=None):
+        """{regla: (precio mínimo, precio máximo)} en que la regla puede saltar (±inf = sin tope; None = imposible)."""
+        level = self.levels.get(symbol)
+        if level is None:
+            return {}
+        now_ms = time.time() * 1000 if now_ms is None else now_ms
+        active = (now_ms < level['closes_at']) & np.isfinite(level['lo'])
+        span = level['hi'] - level['lo']
+        out = {}
+        for r, name in enumerate(self.rules.names):
+            p_lo, p_hi = -np.inf, np.inf
+            for t in np.flatnonzero(active):
+                a, b = level['rsv_lo'][r, t] - self.margin, level['rsv_hi'][r, t] + self.margin
+                if a > 100 or b < 0 or a > b:
+                    p_lo, p_hi = np.inf, -np.inf
+                    break
+                if a > 0:
+                    p_lo = max(p_lo, level['lo'][t] + a / 100 * span[t])
+                if b < 100:
+                    p_hi = min(p_hi, level['lo'][t] + b / 100 * span[t])
+            out[name] = (p_lo, p_hi) if p_lo <= p_hi else None
+        return out
+
+    def describe(self, symbol, now_ms=None):
+        """Niveles de una moneda en texto (para el log): 'LONG ≤ 0.1234 | SHORT —'."""
+        parts = []
+        for name, band in self.price_levels(symbol, now_ms).items():
+            if band is None:
+                parts.append(f"{name} —")
+            elif np.isinf(band[0]) and np.isinf(band[1]):
+                parts.append(f"{name} libre")
+            elif np.isinf(band[0]):
+                parts.append(f"{name} ≤ {band[1]:.6g}")
+            elif np.isinf(band[1]):
+                parts.append(f"{name} ≥ {band[0]:.6g}")
+            else:
+                parts.append(f"{name} {band[0]:.6g}–{band[1]:.6g}")
+        return ' | '.join(parts)
+
+    def forget(self, symbols):
+        """Descarta los niveles de las monedas que ya no están en la lista."""
+        keep = set(symbols)
+        for symbol in [s for s in self.levels if s not in keep]:
+            del self.levels[symbol]
@@ -0,0 +1,247 @@
+from collections import deque
+import numpy as np
+
+# ==========================================
+# 📐 MOTOR DE INDICADORES COMPARTIDO (VECTORIZADO)
+# ==========================================
+# Todas las funciones aceptan arrays 1-D (una moneda) o 2-D (monedas × velas).
+# El eje de las velas es SIEMPRE el último. Así un solo llamado calcula el
+# KDJ/MACD/Bollinger de todo el universo de una vez, en lugar de un bucle
+# Python por moneda.
+#
+# Los resultados son idénticos a las versiones originales con pandas
+# (bcwsma + rolling + ewm). Bollinger puede diferir en el último decimal
+# (rolling de pandas suma de forma incremental, aquí se suma la ventana).
+
+
+def _as_bars_first(values):
+    """Pasa el eje de velas al frente y en memoria contigua (recorrido rápido)."""
+    x = np.asarray(values, dtype=np.float64)
+    return np.ascontiguousarray(np.moveaxis(x, -1, 0))
+
+
+def bcwsma(values, length, weight):
+    # Media móvil suavizada (misma fórmula recursiva que el bcwsma original)
+    x = _as_bars_first(values)
+    out = np.empty_like(x)
+    if len(x) == 0:
+        return np.moveaxis(out, 0, -1)
+    out[0] = x[0]
+    rest = length - weight
+    for i in range(1, len(x)):
+        out[i] = (weight * x[i] + rest * out[i - 1]) / length
+    return np.moveaxis(out, 0, -1)
+
+
+def rolling_min(values, window):
+    x = np.asarray(values, dtype=np.float64)
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] >= window:
+        out[..., window - 1:] = np.lib.stride_tricks.sliding_window_view(x, window, axis=-1).min(axis=-1)
+    return out
+
+
+def rolling_max(values, window):
+    x = np.asarray(values, dtype=np.float64)
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] >= window:
+        out[..., window - 1:] = np.lib.stride_tricks.sliding_window_view(x, window, axis=-1).max(axis=-1)
+    return out
+
+
+def _fillna(x, value):
+    return np.where(np.isnan(x), value, x)
+
+
+def rsv(high, low, close, ilong=9):
+    low_list = rolling_min(low, ilong)
+    high_list = rolling_max(high, ilong)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100 * ((np.asarray(close, dtype=np.float64) - low_list) / (high_list - low_list))
+
+
+def kdj(high, low, close, ilong=9, isig=3):
+    """Devuelve (k, d, j) con la misma forma que `close`."""
+    k = bcwsma(_fillna(rsv(high, low, close, ilong), 50), isig, 1)
+    d = bcwsma(_fillna(k, 50), isig, 1)
+    j = 3 * k - 2 * d
+    return k, d, j
+
+
+def ewm_mean(values, span):
+    # Réplica de pandas .ewm(span=span).mean() (adjust=True) sin NaN en la entrada
+    x = _as_bars_first(values)
+    out = np.empty_like(x)
+    if len(x) == 0:
+        return np.moveaxis(out, 0, -1)
+    alpha = 2.0 / (span + 1.0)
+    old_wt_factor = 1.0 - alpha
+    weighted = x[0].copy()
+    out[0] = weighted
+    old_wt = 1.0
+    for i in range(1, len(x)):
+        cur = x[i]
+        old_wt *= old_wt_factor
+        # pandas no toca el valor cuando coincide (evita ruido en series constantes)
+        weighted = np.where(weighted != cur, (old_wt * weighted + cur) / (old_wt + 1.0), weighted)
+        old_wt += 1.0
+        out[i] = weighted
+    return np.moveaxis(out, 0, -1)
+
+
+def macd(close, fast=12, slow=26, signal=9):
+    """Devuelve (macd, señal)."""
+    line = ewm_mean(close, fast) - ewm_mean(close, slow)
+    return line, ewm_mean(line, signal)
+
+
+def bollinger(close, period=20, std_dev=2):
+    """Devuelve (upper, lower). Desvío muestral (ddof=1) como pandas."""
+    x = np.asarray(close, dtype=np.float64)
+    sma = np.full(x.shape, np.nan)
+    std = np.full(x.shape, np.nan)
+    if x.shape[-1] >= period:
+        win = np.lib.stride_tricks.sliding_window_view(x, period, axis=-1)
+        sma[..., period - 1:] = win.mean(axis=-1)
+        std[..., period - 1:] = win.std(axis=-1, ddof=1)
+    return sma + std_dev * std, sma - std_dev * std
+
+
+# ==========================================
+# 🧺 LOTES (UNIVERSO COMPLETO)
+# ==========================================
+def stack_columns(frames, column):
+    """Apila la misma columna de varios DataFrames (o dicts de arrays, igual largo) en una matriz monedas × velas."""
+    return np.vstack([np.asarray(f[column], dtype=np.float64) for f in frames])
+
+
+def group_by_length(frames):
+    """Agrupa {clave: df} por cantidad de velas -> {largo: [claves]} para poder apilarlos."""
+    groups = {}
+    for key, df in frames.items():
+        groups.setdefault(len(df['close']), []).append(key)
+    return groups
+
+
+# ==========================================
+# 🔁 INDICADORES INCREMENTALES (UNA MONEDA / UN INTERVALO)
+# ==========================================
+class IncrementalIndicators:
+    """
+    KDJ + Bollinger de una serie que se actualiza vela a vela en O(1).
+
+    Guarda K/D de la última vela cerrada, la ventana de máximos/mínimos de las
+    últimas `ilong - 1` velas cerradas y las sumas de Bollinger. La última vela
+    (la que se está formando) se recalcula encima de ese estado cada vez que llega.
+    Se siembra una sola vez con el historial (`from_history`).
+    """
+
+    def __init__(self, ilong=9, isig=3, period=20, std_dev=2):
+        self.ilong = ilong
+        self.isig = isig
+        self.period = period
+        self.std_dev = std_dev
+        self.step = None           # Duración de la vela en ms (para detectar huecos)
+        self.k_prev = None         # K/D de la última vela CERRADA
+        self.d_prev = None
+        self.highs = deque(maxlen=ilong - 1)
+        self.lows = deque(maxlen=ilong - 1)
+        self.closes = deque(maxlen=period - 1)
+        self.ref = 0.0             # Referencia para las sumas (evita cancelación numérica)
+        self.sum = 0.0
+        self.sumsq = 0.0
+        self.commits = 0
+        self.forming = None        # [open_time, high, low, close] de la vela en curso
+
+    @classmethod
+    def from_history(cls, open_times, high, low, close, **kwargs):
+        """Siembra el estado con el historial completo (la última fila es la vela en curso)."""
+        state = cls(**kwargs)
+        high = np.asarray(high, dtype=np.float64)
+        low = np.asarray(low, dtype=np.float64)
+        close = np.asarray(close, dtype=np.float64)
+        if len(close) < 2:
+            raise ValueError("Se necesitan al menos 2 velas para sembrar el estado")
+
+        k, d, _ = kdj(high[:-1], low[:-1], close[:-1], state.ilong, state.isig)
+        state.k_prev = k[-1]
+        state.d_prev = d[-1]
+        state.step = int(open_times[-1]) - int(open_times[-2])
+        state.highs.extend(high[:-1][-(state.ilong - 1):])
+        state.lows.extend(low[:-1][-(state.ilong - 1):])
+        state.closes.extend(close[:-1][-(state.period - 1):])
+        state._reset_sums()
+        state.forming = [int(open_times[-1]), high[-1], low[-1], close[-1]]
+        return state
+
+    def _reset_sums(self):
+        self.ref = self.closes[-1] if self.closes else 0.0
+        shifted = [c - self.ref for c in self.closes]
+        self.sum = sum(shifted)
+        self.sumsq = sum(x * x for x in shifted)
+
+    def _kd(self, high, low, close):
+        # K/D de la vela en curso sobre el estado cerrado (misma fórmula que kdj/bcwsma)
+        value = np.nan
+        if len(self.highs) == self.ilong - 1:
+            lo = min(min(self.lows), low)
+            hi = max(max(self.highs), high)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                value = 100 * (np.float64(close - lo) / np.float64(hi - lo))
+        if np.isnan(value):
+            value = 50.0
+        rest = self.isig - 1
+        k = (1 * value + rest * self.k_prev) / self.isig
+        d = (1 * k + rest * self.d_prev) / self.isig
+        return k, d
+
+    def _commit(self):
+        # La vela en curso se cerró: pasa a formar parte del estado fijo
+        _, high, low, close = self.forming
+        self.k_prev, self.d_prev = self._kd(high, low, close)
+        self.highs.append(high)
+        self.lows.append(low)
+        if len(self.closes) == self.closes.maxlen:
+            old = self.closes[0] - self.ref
+            self.sum -= old
+            self.sumsq -= old * old
+        self.closes.append(close)
+        x = close - self.ref
+        self.sum += x
+        self.sumsq += x * x
+        # Cada vuelta completa de la ventana se recalculan las sumas (O(1) amortizado)
+        self.commits += 1
+        if self.commits % self.closes.maxlen == 0:
+            self._reset_sums()
+
+    def update(self, open_time, high, low, close):
+        """
+        Aplica una vela (cerrada o en curso). Devuelve False si hay un hueco
+        (se perdieron velas) y hay que volver a sembrar con el historial.
+        """
+        open_time = int(open_time)
+        current = self.forming[0]
+        if open_time < current:
+            return True  # Vela vieja, ya incorporada
+        if open_time > current:
+            if open_time != current + self.step:
+                return False
+            self._commit()
+        self.forming = [open_time, float(high), float(low), float(close)]
+        return True
+
+    def values(self):
+        """Valores de la vela en curso: k, d, j, close, upper, lower."""
+        _, high, low, close = self.forming
+        k, d = self._kd(high, low, close)
+        upper = lower = np.nan
+        n = len(self.closes) + 1
+        if n >= self.period:
+            x = close - self.ref
+            s = self.sum + x
+            mean = self.ref + s / n
+            var = max((self.sumsq + x * x - s * s / n) / (n - 1), 0.0)
+            std = var ** 0.5
+            upper = mean + self.std_dev * std
+            lower = mean - self.std_dev * std
+        return {'k': k, 'd': d, 'j': 3 * k - 2 * d, 'close': close, 'upper': upper, 'lower': lower}
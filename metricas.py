@@ -0,0 +1,181 @@
+import cProfile
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# ==========================================
+# 📈 MÉTRICAS DE LOS BOTS (FORMATO PROMETHEUS)
+# ==========================================
+# Contadores, gauges e histogramas en memoria, expuestos en
+# http://127.0.0.1:<puerto>/metrics (texto de Prometheus) por un hilo
+# aparte. No hay dependencias: alcanza con curl o con apuntar Prometheus.
+#
+#   metricas.metrics.start('scalper', 9101)
+#   metricas.metrics.inc('alerts_total', type='LONG')
+#   with metricas.metrics.timer('fetch_seconds'): ...
+#
+# Con un requests.Session: session.hooks['response'].append(metrics.http_hook)
+# cuenta cada pedido por endpoint y código, su latencia y el peso usado de Binance.
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+WEIGHT_HEADER = 'X-MBX-USED-WEIGHT-1M'
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format(name, labels):
+    if not labels:
+        return name
+    inner = ','.join(f'{k}="{v}"' for k, v in labels)
+    return f"{name}{{{inner}}}"
+
+
+class Metrics:
+    def __init__(self, prefix='bot'):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.counters = {}    # {(nombre, labels): valor}
+        self.gauges = {}      # {(nombre, labels): valor}
+        self.histograms = {}  # {(nombre, labels): [cuentas por bucket..., suma, total]}
+        self.server = None
+
+    # --- REGISTRO ---
+    def inc(self, name, value=1, **labels):
+        key = (name, _labels(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.gauges[(name, _labels(labels))] = value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _labels(labels))
+        with self.lock:
+            h = self.histograms.get(key)
+            if h is None:
+                h = self.histograms[key] = [0] * (len(BUCKETS) + 2)
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    h[i] += 1
+            h[-2] += seconds
+            h[-1] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def http_hook(self, response, *args, **kwargs):
+        """Hook de respuesta de requests: pedidos por endpoint/código, latencia y peso usado."""
+        endpoint = urlparse(response.url).path
+        self.inc('http_requests_total', endpoint=endpoint, status=response.status_code)
+        self.observe('http_request_seconds', response.elapsed.total_seconds(), endpoint=endpoint)
+        weight = response.headers.get(WEIGHT_HEADER)
+        if weight is not None:
+            self.set('binance_used_weight_1m', int(weight))
+        return response
+
+    # --- ENTRE PROCESOS ---
+    def drain(self):
+        """Devuelve lo acumulado (contadores, gauges, histogramas) y lo vacía. Para mandar a otro proceso."""
+        with self.lock:
+            snapshot = (self.counters, self.gauges, self.histograms)
+            self.counters, self.gauges, self.histograms = {}, {}, {}
+        return snapshot
+
+    def merge(self, snapshot):
+        """Suma lo que devolvió drain() en otro proceso."""
+        counters, gauges, histograms = snapshot
+        with self.lock:
+            for key, value in counters.items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            self.gauges.update(gauges)
+            for key, h in histograms.items():
+                mine = self.histograms.setdefault(key, [0] * len(h))
+                for i, value in enumerate(h):
+                    mine[i] += value
+
+    # --- EXPOSICIÓN ---
+    def render(self):
+        """Todas las métricas en el formato de texto de Prometheus."""
+        lines = []
+        with self.lock:
+            for kind, series in (('counter', self.counters), ('gauge', self.gauges)):
+                for name in sorted({n for n, _ in series}):
+                    full = f"{self.prefix}_{name}"
+                    lines.append(f"# TYPE {full} {kind}")
+                    for (n, labels), value in sorted(series.items()):
+                        if n == name:
+                            lines.append(f"{_format(full, labels)} {value}")
+            for name in sorted({n for n, _ in self.histograms}):
+                full = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {full} histogram")
+                for (n, labels), h in sorted(self.histograms.items()):
+                    if n != name:
+                        continue
+                    for bound, count in zip(BUCKETS + ('+Inf',), h[:len(BUCKETS)] + [h[-1]]):
+                        lines.append(f"{_format(full + '_bucket', labels + (('le', str(bound)),))} {count}")
+                    lines.append(f"{_format(full + '_sum', labels)} {h[-2]}")
+                    lines.append(f"{_format(full + '_count', labels)} {h[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def start(self, prefix, port, host='127.0.0.1'):
+        """Levanta /metrics en un hilo daemon. port=None lo deja apagado."""
+        self.prefix = prefix
+        if port is None or self.server is not None:
+            return
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # Sin una línea por cada scrape
+
+        try:
+            self.server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            print(f"⚠️ Métricas apagadas: no se pudo abrir el puerto {port} ({e})")
+            return
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"📈 Métricas en http://{host}:{port}/metrics")
+
+
+# Un registro por proceso (cada bot corre en el suyo)
+metrics = Metrics()
+
+
+@contextmanager
+def profile_cycle(folder, name):
+    """Perfila el bloque con cProfile y lo vuelca en folder/name_AAAAMMDD_HHMMSS.prof (folder=None: no hace nada)."""
+    if folder is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{name}_{time.strftime('%Y%m%d_%H%M%S')}.prof")
+        profiler.dump_stats(path)
+        print(f"🔬 Perfil del ciclo: {path} (ver con: python -m pstats {path})")
@@ -0,0 +1,272 @@
+import itertools
+import sys
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import backtest
+import reglas
+import config_acciones
+
+# ==========================================
+# 🎛️ BARRIDO DE UMBRALES KDJ (OPTIMIZADOR PARALELO)
+# ==========================================
+# Prueba miles de combinaciones de umbrales de las reglas de los bots sobre
+# velas históricas y las ordena por tasa de acierto y retorno posterior.
+#
+# 1. Indicadores UNA sola vez: backtest.indicator_table de cada símbolo (en
+#    paralelo), con las mismas ventanas "como se veían en vivo" del backtest.
+# 2. Cada (parámetro, valor) se convierte en una máscara de bits (np.packbits)
+#    sobre todas las velas de todos los símbolos: la condición ya evaluada.
+# 3. Las máscaras, retornos, tiempos y símbolos van a memoria compartida
+#    (multiprocessing.shared_memory): los procesos del pool las leen sin
+#    copiarlas. Una combinación = AND de sus máscaras + cooldown + métricas.
+#
+# Los umbrales de cada regla son nombres de parámetro (ver TEMPLATES); los
+# valores a probar están en GRIDS. Cada señal (LONG/SHORT, compra/venta) se
+# barre por separado: sus parámetros no se cruzan.
+#
+# Uso: python optimizador.py scalper|rescate|acciones <carpeta> [salida.csv]
+
+MIN_SIGNALS = 30        # Combinaciones con menos señales no se rankean
+TOP = 10                # Filas por señal en el resumen
+JOBS_PER_TASK = 64      # Combinaciones por tarea del pool
+DIRECTION = {'LONG': 1, 'SHORT': -1, 'compra': 1, 'venta': -1}  # Acierto = retorno a favor
+
+# Mismas reglas que reglas.SCALPER / reglas.RESCATE / config_acciones.REGLAS,
+# con los umbrales a barrer como nombres de parámetro
+TEMPLATES = {
+    'scalper': {
+        'LONG': [('btc_chg', None, '>', 'btc_long')] + reglas.all_tfs([('j', '<', 'j_long'), ('d', '<', 'd_long'), ('s', '<', 0)], ['1m', '3m', '5m']),
+        'SHORT': [('btc_chg', None, '<', 'btc_short')] + reglas.all_tfs([('j', '>', 'j_short'), ('d', '>', 'd_short'), ('s', '>', 0)], ['1m', '3m', '5m']),
+    },
+    'rescate': {
+        'LONG': reglas.all_tfs([('j', '<=', 'j_long'), ('d', '<=', 'd_long')], ['4h', '1h', '15m']),
+        'SHORT': reglas.all_tfs([('j', '>=', 'j_short'), ('d', '>=', 'd_short')], ['4h', '1h', '15m']),
+    },
+    'acciones': {
+        'compra': reglas.all_tfs([('j', '<=', 'j_compra'), ('d', '<=', 'd_compra')], ['1h', '4h', '1d']),
+        'venta': [('portfolio', None, '==', 1)] + [(ind, tf, '>=', f"{ind}_venta_{tf}") for tf in ['1h', '4h', '1d'] for ind in ('j', 'd')],
+    },
+}
+
+GRIDS = {
+    'scalper': {
+        'btc_long': [-2.0, -1.2, -0.6, 0.0], 'j_long': [-20, -10, -5, 0, 5, 10], 'd_long': [15, 20, 25, 30, 35],
+        'btc_short': [0.0, 0.6, 1.2, 2.0], 'j_short': [90, 95, 100, 105, 110, 120], 'd_short': [65, 70, 75, 80, 85],
+    },
+    'rescate': {
+        'j_long': [-20, -15, -10, -5, 0, 5, 10], 'd_long': [10, 15, 20, 25, 30, 35],
+        'j_short': [90, 95, 100, 105, 110, 115, 120], 'd_short': [65, 70, 75, 80, 85, 90],
+    },
+    'acciones': {
+        'j_compra': [-20, -10, -5, 0, 5, 10], 'd_compra': [15, 20, 25, 30, 35],
+        'j_venta_1h': [85, 90, 95, 100], 'd_venta_1h': [60, 65, 70, 75],
+        'j_venta_4h': [80, 85, 90, 95], 'd_venta_4h': [55, 60, 65, 70],
+        'j_venta_1d': [70, 75, 80, 85], 'd_venta_1d': [50, 55, 60, 65],
+    },
+}
+
+# Los umbrales que usan hoy los bots (se marcan en el ranking)
+CURRENT = {
+    'scalper': {'btc_long': -1.2, 'j_long': 0, 'd_long': 25, 'btc_short': 1.2, 'j_short': 100, 'd_short': 75},
+    'rescate': {'j_long': 0, 'd_long': 25, 'j_short': 100, 'd_short': 75},
+    'acciones': {'j_compra': 0, 'd_compra': 25, 'j_venta_1h': 95, 'd_venta_1h': 70,
+                 'j_venta_4h': 90, 'd_venta_4h': 65, 'j_venta_1d': 80, 'd_venta_1d': 60},
+}
+
+
+# --- 1. INDICADORES (UNA VEZ POR SÍMBOLO) ---
+def load_symbol(bot, symbol, path, btc_path=None):
+    """Features (float32) de las velas válidas + open_time + retornos posteriores (velas × horizontes)."""
+    frame = backtest.load_candles(path)
+    table = backtest.indicator_table(frame, bot)
+    rows = np.flatnonzero(table.pop('valid'))
+    if bot == 'scalper':
+        table['btc_chg'] = backtest.btc_change(frame, backtest.load_candles(btc_path) if btc_path else None)
+    features = {name: values[rows].astype(np.float32) for name, values in table.items()}
+    features['portfolio'] = np.full(len(rows), float(symbol in config_acciones.PORTFOLIO), dtype=np.float32)
+    returns = backtest.forward_returns(frame['close'], rows, backtest.BOTS[bot]['horizons'])
+    return features, frame['open_time'][rows], np.column_stack(list(returns.values())).astype(np.float32)
+
+
+def load_all(bot, folder, workers=None):
+    cfg = backtest.BOTS[bot]
+    files = backtest.find_files(folder, cfg['base'])
+    btc_path = backtest.find_files(folder, '1m').get('BTCUSDT') if bot == 'scalper' else None
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(load_symbol, bot, s, p, btc_path) for s, p in files.items()]
+        parts = [f.result() for f in futures]
+    parts = [(s, part) for s, part in zip(files, parts) if len(part[1])]
+    features = {name: np.concatenate([p[0][name] for _, p in parts]) for name in parts[0][1][0]} if parts else {}
+    data = {
+        'open_time': np.concatenate([p[1] for _, p in parts]) if parts else np.zeros(0, dtype=np.int64),
+        'returns': np.concatenate([p[2] for _, p in parts]) if parts else np.zeros((0, len(cfg['horizons'])), dtype=np.float32),
+        'symbol': np.concatenate([np.full(len(p[1]), i, dtype=np.int32) for i, (_, p) in enumerate(parts)]) if parts else np.zeros(0, dtype=np.int32),
+    }
+    return features, data, [s for s, _ in parts]
+
+
+# --- 2. MÁSCARAS DE BITS POR (PARÁMETRO, VALOR) ---
+def condition_mask(features, n, ind, tf, op, thr):
+    values = features.get(reglas.feature_name(ind, tf))
+    if values is None:
+        return np.zeros(n, dtype=bool)  # Dato que no hay en este backtest: nunca se cumple
+    with np.errstate(invalid='ignore'):
+        return reglas.OPS[op](values, np.float32(thr))
+
+
+def build_masks(bot, features, n):
+    """
+    Devuelve (matriz de máscaras empaquetadas, combos). combos: {señal:
+    [(valores de los parámetros, índices de máscaras a combinar)]}.
+    """
+    grid = GRIDS[bot]
+    packed = []
+    combos = {}
+    for name, conds in TEMPLATES[bot].items():
+        fixed = np.ones(n, dtype=bool)
+        by_param = {}
+        for ind, tf, op, thr in conds:
+            if isinstance(thr, str):
+                by_param.setdefault(thr, []).append((ind, tf, op))
+            else:
+                fixed &= condition_mask(features, n, ind, tf, op, thr)
+        packed.append(np.packbits(fixed))
+        base = len(packed) - 1
+
+        params = list(by_param)
+        index = []
+        for param in params:
+            index.append([])
+            for value in grid[param]:
+                mask = np.ones(n, dtype=bool)
+                for ind, tf, op in by_param[param]:
+                    mask &= condition_mask(features, n, ind, tf, op, value)
+                packed.append(np.packbits(mask))
+                index[-1].append(len(packed) - 1)
+        combos[name] = [(dict(zip(params, values)), (base,) + idx)
+                        for values, idx in zip(itertools.product(*(grid[p] for p in params)), itertools.product(*index))]
+
+    masks = np.vstack(packed) if packed else np.zeros((0, 0), dtype=np.uint8)
+    pad = (-masks.shape[1]) % 8  # AND de a 64 bits
+    return np.pad(masks, ((0, 0), (0, pad))), combos
+
+
+# --- 3. MEMORIA COMPARTIDA + POOL ---
+def to_shared(arr):
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    np.ndarray(arr.shape, arr.dtype, buffer=shm.buf)[...] = arr
+    return shm, (shm.name, arr.shape, arr.dtype.str)
+
+
+_shared = {}
+
+
+def _attach(specs, n, cooldown):
+    for key, (name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=name)
+        _shared[key] = (shm, np.ndarray(shape, np.dtype(dtype), buffer=shm.buf))
+    _shared['n'] = n
+    _shared['cooldown'] = cooldown
+
+
+def evaluate(jobs):
+    """Métricas de cada combinación: [(señal, params, señales, monedas, acierto, [retorno medio por horizonte])]."""
+    masks = _shared['masks'][1].view(np.uint64)
+    returns = _shared['returns'][1]
+    times = _shared['open_time'][1]
+    symbol = _shared['symbol'][1]
+    n, cooldown = _shared['n'], _shared['cooldown']
+    out = []
+    for name, params, idx in jobs:
+        m = masks[idx[0]].copy()
+        for i in idx[1:]:
+            m &= masks[i]
+        cand = np.flatnonzero(np.unpackbits(m.view(np.uint8), count=n))
+        if cooldown > 0 and len(cand):
+            # Cooldown por símbolo (las velas de cada símbolo están juntas y ordenadas)
+            starts = np.flatnonzero(np.r_[True, symbol[cand][1:] != symbol[cand][:-1]])
+            keep = [group[backtest.apply_cooldown(times[group], cooldown)]
+                    for group in np.split(cand, starts[1:])]
+            cand = np.concatenate(keep)
+        r = returns[cand] * DIRECTION[name]
+        known = ~np.isnan(r)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.nansum(r, axis=0) / known.sum(axis=0)   # NaN si no hay ninguna
+            main = r.shape[1] // 2
+            hit = (r[:, main] > 0).sum() / known[:, main].sum() * 100
+        out.append((name, params, len(cand), len(np.unique(symbol[cand])), hit, means))
+    return out
+
+
+def sweep(bot, folder, out_path=None, workers=None):
+    cfg = backtest.BOTS[bot]
+    t0 = time.perf_counter()
+    features, data, symbols = load_all(bot, folder, workers)
+    n = len(data['open_time'])
+    t_load = time.perf_counter()
+    masks, combos = build_masks(bot, features, n)
+    del features
+    n_combos = sum(len(c) for c in combos.values())
+    print(f"🎛️ {bot}: {len(symbols)} símbolos, {n:,} velas | indicadores {t_load - t0:.1f}s | "
+          f"{len(masks)} máscaras en {time.perf_counter() - t_load:.1f}s | {n_combos:,} combinaciones")
+
+    shms = []
+    try:
+        specs = {}
+        for key, arr in (('masks', masks), ('returns', data['returns']), ('open_time', data['open_time']), ('symbol', data['symbol'])):
+            shm, specs[key] = to_shared(arr)
+            shms.append(shm)
+        del masks, data
+
+        jobs = [(name, params, idx) for name, items in combos.items() for params, idx in items]
+        tasks = [jobs[i:i + JOBS_PER_TASK] for i in range(0, len(jobs), JOBS_PER_TASK)]
+        t_eval = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(specs, n, cfg['cooldown'])) as pool:
+            rows = [row for part in pool.map(evaluate, tasks) for row in part]
+        elapsed = time.perf_counter() - t_eval
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+    print(f"⚡ {n_combos:,} combinaciones en {elapsed:.1f}s ({n_combos / max(elapsed, 1e-9):,.0f}/s)")
+    return rank(bot, rows, out_path)
+
+
+def rank(bot, rows, out_path=None):
+    horizons = backtest.BOTS[bot]['horizons']
+    main = horizons[len(horizons) // 2]
+    current = CURRENT[bot]
+    records = []
+    for name, params, count, n_symbols, hit, means in rows:
+        record = {'señal': name, **params, 'señales': count, 'monedas': n_symbols, 'acierto_%': hit}
+        record.update({f"ret_{h}": m for h, m in zip(horizons, means)})
+        record['actual'] = all(current.get(p) == v for p, v in params.items())
+        records.append(record)
+    result = pd.DataFrame(records)
+    result = result.sort_values(['señal', 'acierto_%', f"ret_{main}"], ascending=[True, False, False])
+
+    for name, group in result.groupby('señal', sort=False):
+        ranked = group[group['señales'] >= MIN_SIGNALS]
+        cols = [p for p in GRIDS[bot] if group[p].notna().any()] + \
+               ['señales', 'monedas', 'acierto_%'] + [f"ret_{h}" for h in horizons] + ['actual']
+        print(f"\n🏆 {name}: top {TOP} de {len(ranked)} (≥{MIN_SIGNALS} señales; acierto a {main} velas, retornos a favor en %)")
+        print(ranked[cols].head(TOP).round(3).to_string(index=False))
+        now = group[group['actual']]
+        if len(now):
+            pos = list(ranked.index).index(now.index[0]) + 1 if now.index[0] in ranked.index else None
+            print(f"   Umbrales actuales: {now['señales'].iloc[0]} señales, acierto {now['acierto_%'].iloc[0]:.1f}%"
+                  + (f" (puesto {pos})" if pos else " (sin señales suficientes)"))
+    if out_path:
+        result.to_csv(out_path, index=False)
+        print(f"\n💾 Guardado en {out_path}")
+    return result
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3 or sys.argv[1] not in TEMPLATES:
+        print("Uso: python optimizador.py scalper|rescate|acciones <carpeta> [salida.csv]")
+        sys.exit(1)
+    sweep(sys.argv[1], sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
@@ -0,0 +1,115 @@
+import threading
+import time
+import velas
+from metricas import metrics
+
+# ==========================================
+# ⏰ PLANIFICADOR ALINEADO AL CIERRE DE VELAS
+# ==========================================
+# En lugar de "escanear y dormir 60s" (que se corre respecto al cierre de
+# las velas y se estira si un escaneo tarda), cada tarea se dispara unos
+# segundos DESPUÉS de cada cierre de su intervalo (cortes UTC desde epoch,
+# igual que Binance):
+#
+#   plan = planificador.Planificador('scalper')
+#   plan.every('1m', scan_cycle, offset=2)
+#   plan.run()   # bloquea; plan.stop() lo corta desde otro hilo
+#
+# - Todas las tareas corren en el mismo hilo: nunca hay dos escaneos a la vez.
+# - Si una tarea termina después de su próximo tick, esos ticks se saltean
+#   (no se encolan) y se informa cuántos se perdieron.
+# - Si un tick arranca tarde (otra tarea ocupaba el hilo) también se informa.
+# - Entre ticks el hilo duerme en un Event.wait: nada de sondear cada segundo.
+
+LATE_TOLERANCE = 2.0    # Segundos de atraso que no se informan
+
+
+class Task:
+    def __init__(self, name, interval, job, offset, gate):
+        self.name = name
+        self.step = velas.interval_ms(interval) / 1000
+        self.job = job
+        self.offset = offset
+        self.gate = gate
+        self.next_tick = None
+        self.lock = threading.Lock()
+
+    def following(self, now):
+        """Primer tick (cierre + offset) estrictamente posterior a now."""
+        return (now - self.offset) // self.step * self.step + self.step + self.offset
+
+
+class Planificador:
+    def __init__(self, name):
+        self.name = name
+        self.tasks = []
+        self.stop_event = threading.Event()
+
+    def every(self, interval, job, offset=2.0, gate=None, name=None, run_now=False):
+        """
+        Corre job() `offset` segundos después de cada cierre de vela de `interval`.
+        gate: función opcional; si devuelve False el tick se saltea en silencio
+        (por ejemplo mercado_abierto). run_now: un primer disparo al arrancar.
+        """
+        task = Task(name or getattr(job, '__name__', 'tarea'), interval, job, offset, gate)
+        task.next_tick = time.time() if run_now else task.following(time.time())
+        self.tasks.append(task)
+        return task
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run_task(self, task):
+        """Corre una tarea ahora. Devuelve False si ya estaba corriendo (no se superpone)."""
+        if not task.lock.acquire(blocking=False):
+            metrics.inc('scheduler_overlaps_total', task=task.name)
+            print(f"⏰ {task.name}: el escaneo anterior sigue corriendo, se saltea este tick.")
+            return False
+        try:
+            if task.gate is not None and not task.gate():
+                return True
+            t0 = time.perf_counter()
+            try:
+                task.job()
+            except KeyboardInterrupt:
+                raise
+            except Exception as e:
+                metrics.inc('scheduler_errors_total', task=task.name)
+                print(f"⚠️ {task.name}: error en el escaneo ({e})")
+            metrics.observe('scheduler_job_seconds', time.perf_counter() - t0, task=task.name)
+            metrics.inc('scheduler_ticks_total', task=task.name)
+            return True
+        finally:
+            task.lock.release()
+
+    def run(self):
+        print(f"⏰ Planificador {self.name}: " + ", ".join(
+            f"{t.name} cada {t.step:g}s (+{t.offset:g}s)" for t in self.tasks))
+        while not self.stop_event.is_set():
+            task = min(self.tasks, key=lambda t: t.next_tick)
+            wait = task.next_tick - time.time()
+            if wait > 0 and self.stop_event.wait(wait):
+                break
+
+            tick = task.next_tick
+            start = time.time()
+            late = start - tick
+            metrics.observe('scheduler_lag_seconds', max(late, 0.0), task=task.name)
+            skipped = int(late // task.step) if late > 0 else 0
+            if skipped > 0:
+                # El hilo estaba ocupado (otra tarea): se corre solo el tick más reciente
+                metrics.inc('scheduler_missed_ticks_total', skipped, task=task.name)
+                print(f"⏰ {task.name}: {late:.1f}s de atraso, se perdieron {skipped} ticks")
+            elif late > LATE_TOLERANCE:
+                metrics.inc('scheduler_late_ticks_total', task=task.name)
+                print(f"⏰ {task.name}: tick con {late:.1f}s de atraso")
+
+            self.run_task(task)
+
+            # Próximo tick: el primero que todavía no pasó (los vencidos se pierden)
+            end = time.time()
+            task.next_tick = task.following(end)
+            overrun = int((task.next_tick - task.following(start)) // task.step)
+            if overrun > 0:
+                metrics.inc('scheduler_missed_ticks_total', overrun, task=task.name)
+                print(f"⏰ {task.name}: el escaneo duró {end - start:.1f}s, se perdieron {overrun} ticks")
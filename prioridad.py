@@ -0,0 +1,94 @@
+import numpy as np
+from metricas import metrics
+
+# ==========================================
+# 🌡️ PRIORIDAD DE ESCANEO (MONEDAS CALIENTES PRIMERO)
+# ==========================================
+# No todas las monedas merecen el mismo refresco: una con J=95 en 5m puede
+# dar señal en el próximo cierre, una con J=50 difícilmente. Cada moneda
+# escaneada recibe un puntaje:
+#
+#   puntaje = distancia a la regla más cercana / (1 + volatilidad / VOL_REFERENCE)
+#
+# distancia: lo que le falta a cada condición (reglas.RuleSet.distance),
+# normalizado con la escala de cada indicador. volatilidad: ancho de las
+# Bollinger de 5m en % del precio (una moneda que se mueve mucho se acerca
+# rápido a los umbrales). 0 = está dando señal.
+#
+# Según el puntaje la moneda cae en un nivel que define cada cuántos ciclos
+# se vuelve a pedir. Las nuevas (sin puntaje) van como calientes. Las que
+# no entraron en el presupuesto de tiempo del ciclo siguen vencidas y suben
+# de prioridad al ciclo siguiente.
+#
+# Los umbrales y los refrescos se pueden cambiar por instancia (bot_acciones
+# usa otros para la watchlist, con la distancia diaria a la zona de compra).
+
+HOT_SCORE = 0.5             # Hasta acá: caliente (todos los ciclos)
+WARM_SCORE = 1.5            # Hasta acá: tibia; más: fría
+REFRESH_CYCLES = {'caliente': 1, 'tibia': 2, 'fria': 5}
+VOL_REFERENCE = 2.0         # % de ancho de Bollinger que duplica la prioridad
+
+
+def scores(rules, X, scale, volatility):
+    """Puntaje de cada fila de X (menor = más caliente; NaN si faltan datos)."""
+    with np.errstate(invalid='ignore'):
+        distance = rules.distance(X, scale).min(axis=1)
+        return distance / (1 + np.maximum(np.asarray(volatility, dtype=np.float64), 0) / VOL_REFERENCE)
+
+
+def tier(score, hot=HOT_SCORE, warm=WARM_SCORE):
+    if score is None or not np.isfinite(score) or score <= hot:
+        return 'caliente'
+    return 'tibia' if score <= warm else 'fria'
+
+
+class ScanPriority:
+    def __init__(self, refresh=REFRESH_CYCLES, hot=HOT_SCORE, warm=WARM_SCORE):
+        self.refresh = refresh
+        self.hot = hot
+        self.warm = warm
+        self.cycle = 0
+        self.score = {}      # {symbol: último puntaje}
+        self.next_due = {}   # {symbol: ciclo en el que toca volver a pedirla}
+
+    def plan(self, symbols):
+        """
+        Arranca un ciclo: devuelve las monedas que toca escanear, de la más
+        caliente a la más fría (las atrasadas suben un puesto por ciclo de atraso).
+        """
+        self.cycle += 1
+        due = [s for s in symbols if self.next_due.get(s, 0) <= self.cycle]
+
+        def key(symbol):
+            score = self.score.get(symbol)
+            if score is None or not np.isfinite(score):
+                return -1.0  # Nueva o sin datos: primero
+            overdue = self.cycle - self.next_due.get(symbol, self.cycle)
+            return score / (1 + overdue)
+
+        due.sort(key=key)
+        for name in self.refresh:
+            metrics.set('priority_symbols', sum(self.tier(s) == name for s in due), tier=name)
+        metrics.inc('priority_resting_total', len(symbols) - len(due))
+        return due
+
+    def update(self, scanned, new_scores):
+        """Registra el resultado de las monedas escaneadas ({symbol: puntaje})."""
+        for symbol in scanned:
+            if symbol in new_scores:
+                self.score[symbol] = new_scores[symbol]
+            self.next_due[symbol] = self.cycle + self.refresh[self.tier(symbol)]
+
+    def tier(self, symbol):
+        return tier(self.score.get(symbol), self.hot, self.warm)
+
+    def defer(self, symbols):
+        """Monedas que no entraron en el presupuesto: siguen vencidas para el próximo ciclo."""
+        metrics.inc('priority_deferred_total', len(symbols))
+
+    def forget(self, listed):
+        """Olvida las monedas que ya no están en la lista (bajaron de volumen)."""
+        listed = set(listed)
+        for table in (self.score, self.next_due):
+            for symbol in [s for s in table if s not in listed]:
+                del table[symbol]
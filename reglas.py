@@ -0,0 +1,129 @@
+import numpy as np
+
+# ==========================================
+# 📐 REGLAS DE SEÑALES DECLARATIVAS (VECTORIZADAS)
+# ==========================================
+# Una regla es una lista de condiciones (indicador, timeframe, comparador, umbral)
+# que se tienen que cumplir TODAS. Un juego de reglas es un dict ordenado
+# {nombre_señal: condiciones}: si un activo cumple varias, gana la primera.
+#
+#   ('j', '1m', '<', 0)          -> J de 1m menor a 0
+#   ('btc_chg', None, '>', -1.2) -> dato sin timeframe (igual para todos o por activo)
+#
+# RuleSet compila las reglas una sola vez: las condiciones se agrupan por
+# (comparador, timeframe) en arrays de columnas/umbrales, y se evalúan sobre
+# una matriz activos × features con una operación NumPy por grupo. Así se
+# clasifica todo el universo de una vez. Un NaN nunca cumple una condición.
+#
+# Los bots toman sus reglas de config (REGLAS_SCALPER / REGLAS_RESCATE en
+# config.py, REGLAS en config_acciones.py) y si no están usan las de acá.
+
+OPS = {'<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal, '==': np.equal}
+
+
+def all_tfs(conditions, tfs):
+    """Repite las condiciones (indicador, comparador, umbral) en cada timeframe."""
+    return [(ind, tf, op, thr) for tf in tfs for ind, op, thr in conditions]
+
+
+# Scalper: triple confluencia 1m/3m/5m (J, D, señal MACD) + filtro BTC 1h
+SCALPER = {
+    'LONG': [('btc_chg', None, '>', -1.2)] + all_tfs([('j', '<', 0), ('d', '<', 25), ('s', '<', 0)], ['1m', '3m', '5m']),
+    'SHORT': [('btc_chg', None, '<', 1.2)] + all_tfs([('j', '>', 100), ('d', '>', 75), ('s', '>', 0)], ['1m', '3m', '5m']),
+}
+
+# Rescate: J y D extremos en 4H, 1H y 15m
+RESCATE = {
+    'LONG': all_tfs([('j', '<=', 0), ('d', '<=', 25)], ['4h', '1h', '15m']),
+    'SHORT': all_tfs([('j', '>=', 100), ('d', '>=', 75)], ['4h', '1h', '15m']),
+}
+
+
+def feature_name(indicator, timeframe):
+    return indicator if timeframe is None else f"{indicator}_{timeframe}"
+
+
+class RuleSet:
+    def __init__(self, rules):
+        self.names = list(rules)
+        self.rules = rules
+        self.features = sorted({feature_name(ind, tf) for conds in rules.values() for ind, tf, _, _ in conds})
+        self.timeframes = sorted({tf for conds in rules.values() for _, tf, _, _ in conds if tf is not None})
+        column = {name: i for i, name in enumerate(self.features)}
+
+        # Compilación: por regla, grupos {(comparador, timeframe): (columnas, umbrales)}
+        self.compiled = []
+        for name in self.names:
+            for ind, tf, op, thr in rules[name]:
+                if op not in OPS:
+                    raise ValueError(f"Regla {name}: comparador desconocido '{op}'")
+            groups = {}
+            for ind, tf, op, thr in rules[name]:
+                cols, thrs = groups.setdefault((op, tf), ([], []))
+                cols.append(column[feature_name(ind, tf)])
+                thrs.append(float(thr))
+            self.compiled.append([(OPS[op], tf, np.array(cols), np.array(thrs))
+                                  for (op, tf), (cols, thrs) in groups.items()])
+
+    def matrix(self, features, n):
+        """
+        Matriz n × features (en el orden de self.features). `features` es un
+        dict {nombre: escalar o array de n}; lo que falte queda en NaN.
+        """
+        X = np.full((n, len(self.features)), np.nan)
+        for i, name in enumerate(self.features):
+            if name in features:
+                X[:, i] = np.asarray(features[name], dtype=np.float64)
+        return X
+
+    def masks(self, X, timeframes=None):
+        """
+        Máscara activos × reglas. timeframes: solo se evalúan las condiciones
+        de esos timeframes (None en la lista = las que no tienen timeframe);
+        sirve para ir descartando por etapas sin tener todos los datos.
+        """
+        out = np.ones((X.shape[0], len(self.names)), dtype=bool)
+        with np.errstate(invalid='ignore'):
+            for r, groups in enumerate(self.compiled):
+                for op, tf, cols, thrs in groups:
+                    if timeframes is None or tf in timeframes:
+                        out[:, r] &= op(X[:, cols], thrs).all(axis=1)
+        return out
+
+    def distance(self, X, scale):
+        """
+        Qué tan lejos está cada activo de cumplir cada regla: activos × reglas,
+        suma de lo que le falta a cada condición dividido por `scale` (un valor
+        por feature, o una matriz como X). 0 = la regla se cumple; NaN = falta un dato.
+        """
+        gaps = np.zeros((X.shape[0], len(self.names)))
+        for r, groups in enumerate(self.compiled):
+            for op, tf, cols, thrs in groups:
+                values = X[:, cols]
+                if op in (np.less, np.less_equal):
+                    gap = values - thrs
+                elif op in (np.greater, np.greater_equal):
+                    gap = thrs - values
+                else:
+                    gap = np.abs(values - thrs)
+                s = np.broadcast_to(scale, X.shape)[:, cols]
+                gaps[:, r] += (np.maximum(gap, 0) / s).sum(axis=1)
+        return gaps
+
+    def first_match(self, masks):
+        """Índice de la primera regla que se cumple en cada activo (-1 si ninguna)."""
+        hit = masks.any(axis=1)
+        return np.where(hit, masks.argmax(axis=1), -1)
+
+    def classify(self, X):
+        """Nombre de la señal de cada activo (None si no cumple ninguna)."""
+        return [self.names[i] if i >= 0 else None for i in self.first_match(self.masks(X))]
+
+
+def from_config(name, defaults):
+    """RuleSet con REGLAS_<NAME> de config.py si existe; si no, `defaults`."""
+    try:
+        import config
+    except ImportError:
+        config = None
+    return RuleSet(getattr(config, f"REGLAS_{name.upper()}", defaults))
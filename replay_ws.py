@@ -0,0 +1,71 @@
+import asyncio
+import json
+import sys
+from urllib.parse import urlparse, parse_qs
+
+# ==========================================
+# 🎞️ SERVIDOR WEBSOCKET LOCAL QUE REPRODUCE VELAS GRABADAS
+# ==========================================
+# Sustituto local de wss://fstream.binance.com para probar el modo stream.
+# Reproduce un archivo JSONL de mensajes de stream combinado (el que graba
+# stream_velas.run_stream con record_path) respetando el tiempo entre eventos.
+#
+# Uso: python replay_ws.py grabacion.jsonl [puerto] [velocidad]
+#   velocidad 10 = 10 veces más rápido que en vivo, 0 = sin pausas.
+
+def load_messages(path):
+    messages = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                messages.append(json.loads(line))
+    return messages
+
+
+def requested_streams(path):
+    """'/stream?streams=a@kline_1m/b@kline_5m' -> {'a@kline_1m', 'b@kline_5m'} (None = todos)."""
+    query = parse_qs(urlparse(path).query)
+    if 'streams' not in query:
+        return None
+    return set(query['streams'][0].split('/'))
+
+
+async def replay(ws, messages, streams, speed):
+    prev_event = None
+    for msg in messages:
+        stream = msg.get('stream')
+        if streams is not None and stream not in streams:
+            continue
+        event_time = msg.get('data', {}).get('E')
+        if speed and prev_event is not None and event_time is not None:
+            await asyncio.sleep(max(event_time - prev_event, 0) / 1000 / speed)
+        prev_event = event_time
+        await ws.send(json.dumps(msg))
+
+
+def make_handler(messages, speed):
+    async def handler(ws, path=None):
+        # websockets >= 11 no pasa el path: está en ws.request.path
+        if path is None:
+            path = ws.request.path if hasattr(ws, 'request') else ws.path
+        await replay(ws, messages, requested_streams(path), speed)
+        await ws.close()
+    return handler
+
+
+async def serve(messages, host='127.0.0.1', port=8765, speed=0):
+    import websockets  # Dependencia opcional: pip install websockets
+
+    async with websockets.serve(make_handler(messages, speed), host, port):
+        print(f"🎞️ Reproduciendo {len(messages)} mensajes en ws://{host}:{port}")
+        await asyncio.Future()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Uso: python replay_ws.py grabacion.jsonl [puerto] [velocidad]")
+        sys.exit(1)
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8765
+    speed = float(sys.argv[3]) if len(sys.argv) > 3 else 0
+    asyncio.run(serve(load_messages(sys.argv[1]), port=port, speed=speed))
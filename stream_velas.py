@@ -0,0 +1,223 @@
+import asyncio
+import json
+import time
+import numpy as np
+import velas
+from metricas import metrics
+
+# ==========================================
+# 📡 MODO STREAM: VELAS POR WEBSOCKET + BUFFER CIRCULAR
+# ==========================================
+# En lugar de pedir velas por REST cada 60s, nos suscribimos a los streams
+# combinados <symbol>@kline_<interval> de Binance Futures. Cada (símbolo,
+# intervalo) guarda sus últimas N velas en un array fijo (memoria acotada)
+# y el bot evalúa sus reglas apenas la vela se actualiza o cierra.
+#
+# Para probar sin conexión: python replay_ws.py grabacion.jsonl
+# y apuntar STREAM_URL del bot a ws://127.0.0.1:8765
+#
+# Huecos: si tras una caída del stream llega una vela que no sigue a la
+# última guardada (o la vela en curso cerró mientras no escuchábamos), el
+# buffer queda marcado `stale` y se vuelve a sembrar por REST (función
+# `reseed` del bot) antes de avisar al bot: nunca se evalúa una serie cortada.
+
+STREAM_URL = "wss://fstream.binance.com"
+MAX_STREAMS_PER_CONNECTION = 200   # Límite de Binance por conexión
+COLUMNS = ['open_time', 'open', 'high', 'low', 'close', 'volume']
+
+
+class CandleRing:
+    """Últimas `size` velas en un array fijo (size × 6). La última puede estar en curso."""
+
+    # Valores por defecto a nivel de clase: los buffers de snapshots viejos no los traen
+    interval_ms = None  # Duración de la vela (None = sin chequeo de huecos)
+    stale = False       # ¿Hay un hueco? Hay que re-sembrar antes de usarlo
+    resync = False      # Reconexión: la próxima vela dice si nos perdimos un cierre
+
+    def __init__(self, size, interval_ms=None):
+        self.size = size
+        self.interval_ms = interval_ms
+        self.data = np.zeros((size, len(COLUMNS)), dtype=np.float64)
+        self.count = 0      # Velas válidas (hasta size)
+        self.head = 0       # Posición de la PRÓXIMA vela a escribir
+        self.closed = False # ¿La última vela ya cerró?
+
+    def last_open_time(self):
+        if self.count == 0:
+            return None
+        return int(self.data[(self.head - 1) % self.size, 0])
+
+    def push(self, open_time, o, h, l, c, v, closed=False):
+        """Agrega una vela nueva o reemplaza la última si es la misma (vela en curso)."""
+        open_time = int(open_time)
+        last = self.last_open_time()
+        if last is not None and open_time < last:
+            return  # Llegó tarde, ya la tenemos
+        if last is not None and self.interval_ms and (
+                open_time > last + self.interval_ms                     # Faltan velas enteras
+                or (self.resync and open_time > last and not self.closed)):  # La última cerró sin que la viéramos
+            self.stale = True
+        self.resync = False
+        if last is None or open_time > last:
+            self.head = (self.head + 1) % self.size
+            self.count = min(self.count + 1, self.size)
+        self.data[(self.head - 1) % self.size] = (open_time, float(o), float(h), float(l), float(c), float(v))
+        self.closed = closed
+
+    def arrays(self):
+        """Copia ordenada (vieja -> nueva) como {'open_time', 'open', 'high', 'low', 'close', 'volume'}."""
+        if self.count < self.size:
+            ordered = self.data[:self.count]
+        else:
+            ordered = np.concatenate((self.data[self.head:], self.data[:self.head]))
+        return {name: ordered[:, i] for i, name in enumerate(COLUMNS)}
+
+    def __len__(self):
+        return self.count
+
+
+class CandleStore:
+    """Todos los buffers del bot: {(symbol, interval): CandleRing}."""
+
+    def __init__(self, sizes):
+        self.sizes = sizes  # {interval: cantidad de velas a guardar}
+        self.rings = {}
+
+    def ring(self, symbol, interval):
+        key = (symbol, interval)
+        if key not in self.rings:
+            self.rings[key] = CandleRing(self.sizes[interval], velas.interval_ms(interval))
+        return self.rings[key]
+
+    def seed(self, symbol, interval, klines):
+        """Carga el historial REST (formato /fapi/v1/klines) antes de abrir el stream."""
+        ring = self.ring(symbol, interval)
+        for k in klines:
+            ring.push(k[0], k[1], k[2], k[3], k[4], k[5])
+
+    def reseed(self, symbol, interval, klines):
+        """Reemplaza el buffer por el historial REST (tras un hueco)."""
+        self.rings.pop((symbol, interval), None)
+        self.seed(symbol, interval, klines)
+
+    def resync(self, keys):
+        """Tras reconectar: la primera vela de cada buffer dirá si hubo un hueco."""
+        for key in keys:
+            ring = self.rings.get(key)
+            if ring is not None:
+                ring.resync = True
+
+    def apply(self, message):
+        """Aplica un mensaje del stream combinado. Devuelve (symbol, interval, cerrada) o None."""
+        data = message.get('data', message)
+        if data.get('e') != 'kline':
+            return None
+        k = data['k']
+        symbol = data['s']
+        interval = k['i']
+        if interval not in self.sizes:
+            return None
+        self.ring(symbol, interval).push(k['t'], k['o'], k['h'], k['l'], k['c'], k['v'], closed=k['x'])
+        return symbol, interval, k['x']
+
+    def frames(self, symbol, intervals):
+        """{interval: arrays} de un símbolo, o None si falta algún intervalo."""
+        out = {}
+        for interval in intervals:
+            ring = self.rings.get((symbol, interval))
+            if ring is None or len(ring) == 0:
+                return None
+            out[interval] = ring.arrays()
+        return out
+
+
+def stream_keys(symbols, intervals):
+    """(symbol, interval) de cada stream, en el mismo orden que stream_paths."""
+    return [(s, i) for s in symbols for i in intervals]
+
+
+def stream_paths(symbols, intervals):
+    """Arma los paths de streams combinados, partidos según el límite por conexión."""
+    streams = [f"{s.lower()}@kline_{i}" for s, i in stream_keys(symbols, intervals)]
+    chunks = [streams[x:x + MAX_STREAMS_PER_CONNECTION] for x in range(0, len(streams), MAX_STREAMS_PER_CONNECTION)]
+    return ["/stream?streams=" + "/".join(chunk) for chunk in chunks]
+
+
+async def _reseed(store, symbol, interval, reseed):
+    """Re-siembra un buffer con hueco por REST (en un hilo). False si no se pudo: queda stale."""
+    try:
+        klines = await asyncio.to_thread(reseed, symbol, interval, store.sizes[interval])
+    except Exception as e:
+        print(f"📡 No se pudo re-sembrar {symbol} {interval}: {e}")
+        return False
+    if not klines:
+        return False
+    store.reseed(symbol, interval, klines)
+    metrics.inc('stream_reseeds_total', interval=interval)
+    print(f"📡 Hueco en {symbol} {interval}: buffer re-sembrado por REST")
+    return True
+
+
+async def _listen(url, keys, store, on_update, record, reseed):
+    import websockets  # Dependencia opcional: pip install websockets
+
+    backoff = 1
+    connected = False
+    while True:
+        try:
+            async with websockets.connect(url, ping_interval=20, max_size=2 ** 22) as ws:
+                backoff = 1
+                if connected:
+                    store.resync(keys)  # Reconexión: chequear huecos con la primera vela de cada buffer
+                connected = True
+                async for raw in ws:
+                    if record is not None:
+                        record.write(raw if isinstance(raw, str) else raw.decode())
+                        record.write("\n")
+                    update = store.apply(json.loads(raw))
+                    if not update:
+                        continue
+                    if store.rings[update[:2]].stale:
+                        if reseed is None or not await _reseed(store, update[0], update[1], reseed):
+                            continue  # Serie cortada: no se evalúa hasta re-sembrar
+                    on_update(*update)
+            print(f"📡 Stream cerrado por el servidor. Reintentando en {backoff}s...")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"📡 Stream caído ({e}). Reintentando en {backoff}s...")
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, 60)
+
+
+async def run_stream(store, symbols, intervals, on_update, base_url=STREAM_URL, record_path=None, reseed=None):
+    """
+    Escucha los streams y llama on_update(symbol, interval, cerrada) en cada vela.
+    record_path: si se indica, guarda cada mensaje crudo (JSONL) para replay_ws.py.
+    reseed(symbol, interval, limit): velas REST para re-sembrar un buffer con hueco.
+    """
+    record = open(record_path, 'a') if record_path else None
+    keys = stream_keys(symbols, intervals)
+    chunks = [keys[x:x + MAX_STREAMS_PER_CONNECTION] for x in range(0, len(keys), MAX_STREAMS_PER_CONNECTION)]
+    try:
+        tasks = [asyncio.create_task(_listen(base_url + path, chunk, store, on_update, record, reseed))
+                 for path, chunk in zip(stream_paths(symbols, intervals), chunks)]
+        await asyncio.gather(*tasks)
+    finally:
+        if record is not None:
+            record.close()
+
+
+class Throttle:
+    """Evita recalcular la misma clave más de una vez cada `seconds` (salvo cierre de vela)."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.last = {}
+
+    def ready(self, key, force=False):
+        now = time.monotonic()
+        if force or now - self.last.get(key, 0) >= self.seconds:
+            self.last[key] = now
+            return True
+        return False
@@ -0,0 +1,118 @@
+import time
+import numpy as np
+import indicadores
+from metricas import metrics
+
+# ==========================================
+# 🌐 UNIVERSO DEL SCALPER EN DOS ETAPAS
+# ==========================================
+# 1. Lista de monedas aptas (volumen y antigüedad): el 24hr ticker se pide en
+#    cada ciclo, pero exchangeInfo (pesado y casi fijo) solo para las fechas
+#    de alta, con un TTL largo (OnboardCache).
+# 2. Pre-filtro barato ANTES de pedir velas, con datos que ya llegaron en
+#    bloque: el último precio del 24hr ticker de cada ciclo se guarda en
+#    TickerHistory (≈ el cierre de cada vela de 1m, porque el escaneo corre
+#    2s después del cierre). Una moneda solo pasa si su precio está en la
+#    parte baja (LONG) o alta (SHORT) del rango de los últimos
+#    PRESCREEN_WINDOW minutos: sin eso el J/D de 1m/3m/5m no puede estar en
+#    los extremos. Además, si el filtro BTC de una regla no se cumple, esa
+#    regla no puede dar señal en ninguna moneda (esto es exacto).
+#
+# El pre-filtro es una aproximación (no ve máximos y mínimos intra-vela):
+# verificar_prefiltro.py mide con velas históricas qué porcentaje pasa y
+# cuántas señales del escaneo completo se pierden.
+
+ONBOARD_TTL_SECONDS = 6 * 3600  # exchangeInfo: las fechas de alta no cambian
+PRESCREEN_WINDOW = 45           # Muestras (≈ minutos): ~9 velas de 5m, la ventana del K
+LOW_POSITION = 0.35             # LONG: precio en el 35% inferior del rango
+HIGH_POSITION = 0.65            # SHORT: precio en el 35% superior del rango
+SIDE = {'LONG': {'low'}, 'SHORT': {'high'}}  # Qué extremo necesita cada regla (otras: los dos)
+
+
+class OnboardCache:
+    """Fechas de alta {symbol: ms} de exchangeInfo, refrescadas cada `ttl` segundos."""
+
+    def __init__(self, fetch, ttl=ONBOARD_TTL_SECONDS):
+        self.fetch = fetch      # fetch() -> respuesta de /fapi/v1/exchangeInfo (o None)
+        self.ttl = ttl
+        self.dates = {}
+        self.fetched_at = 0.0
+
+    def get(self):
+        if not self.dates or time.time() - self.fetched_at > self.ttl:
+            info = self.fetch()
+            if info:
+                self.dates = {item['symbol']: item['onboardDate'] for item in info['symbols']}
+                self.fetched_at = time.time()
+                metrics.inc('exchange_info_fetches_total')
+        return self.dates
+
+
+class TickerHistory:
+    """Últimos `window` precios por moneda, uno por ciclo, tomados de los endpoints en bloque."""
+
+    def __init__(self, window=PRESCREEN_WINDOW):
+        self.size = window + 1  # + la columna que se limpia para la próxima muestra
+        self.prices = {}    # {symbol: array de size (NaN = sin dato)}
+        self.head = 0       # Columna de la próxima muestra (la misma para todas las monedas)
+
+    def record(self, ticker_data):
+        """Guarda lastPrice (24hr ticker) o price (ticker/price) de cada moneda."""
+        for item in ticker_data:
+            row = self.prices.get(item['symbol'])
+            if row is None:
+                row = self.prices[item['symbol']] = np.full(self.size, np.nan)
+            row[self.head] = float(item.get('lastPrice', item.get('price')))
+        # Las que no vinieron en esta muestra quedan en NaN en esta columna
+        self.head = (self.head + 1) % self.size
+        for row in self.prices.values():
+            row[self.head] = np.nan
+
+    def matrix(self, symbols):
+        """Monedas × muestras, de la más vieja a la más nueva (la última es la actual)."""
+        order = np.r_[self.head + 1:self.size, 0:self.head]
+        empty = np.full(self.size, np.nan)
+        return np.vstack([self.prices.get(s, empty)[order] for s in symbols]) if symbols else np.zeros((0, self.size - 1))
+
+
+def range_position(prices):
+    """Posición del último precio en el rango de cada fila (0 = mínimo, 1 = máximo; NaN sin historia)."""
+    lo = np.where(np.isnan(prices), np.inf, prices).min(axis=-1)
+    hi = np.where(np.isnan(prices), -np.inf, prices).max(axis=-1)
+    last = prices[..., -1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pos = np.where(hi > lo, (last - lo) / (hi - lo), 0.5)
+    enough = np.sum(~np.isnan(prices), axis=-1) >= prices.shape[-1] // 2
+    return np.where(enough & ~np.isnan(last), pos, np.nan)
+
+
+def rolling_position(close, window=PRESCREEN_WINDOW):
+    """range_position en cada vela de una serie de cierres (para el replay)."""
+    lo = indicadores.rolling_min(close, window)
+    hi = indicadores.rolling_max(close, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(hi > lo, (close - lo) / (hi - lo), np.where(np.isnan(lo), np.nan, 0.5))
+
+
+def passes(position, sides, low=LOW_POSITION, high=HIGH_POSITION):
+    """
+    ¿La moneda puede estar en un extremo? sides: qué lados siguen posibles
+    ({'low', 'high'}, según el filtro BTC). Sin historia (NaN) pasa siempre.
+    """
+    keep = np.isnan(position)
+    with np.errstate(invalid='ignore'):
+        if 'low' in sides:
+            keep |= position <= low
+        if 'high' in sides:
+            keep |= position >= high
+    return keep
+
+
+def possible_sides(rules, btc_chg):
+    """Lados que todavía pueden dar señal según las condiciones sin timeframe (filtro BTC)."""
+    ok = rules.masks(rules.matrix({'btc_chg': btc_chg}, 1), timeframes=[None])[0]
+    sides = set()
+    for name, allowed in zip(rules.names, ok):
+        if allowed:
+            sides |= SIDE.get(name, {'low', 'high'})
+    return sides
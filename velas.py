@@ -0,0 +1,76 @@
+import json
+from itertools import chain
+import numpy as np
+
+try:
+    import orjson  # Opcional (pip install orjson): decodifica el JSON de klines varias veces más rápido
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+# ==========================================
+# 🕯️ UTILIDADES DE VELAS (ARRAYS)
+# ==========================================
+# Las velas viajan como dicts de arrays: {'open_time', 'open', 'high',
+# 'low', 'close', ...}, el mismo formato que stream_velas.CandleRing.arrays().
+# indicadores.py y calculate_batch aceptan este formato directamente.
+
+MINUTE_MS = 60_000
+KLINE_FIELDS = ('open', 'high', 'low', 'close', 'volume')  # Columnas 1..5 de /fapi/v1/klines
+
+
+def parse_klines(raw, dtype=np.float64):
+    """
+    Klines crudas de Binance ([open_time, "o", "h", "l", "c", "v", ...]) a un
+    dict de arrays contiguos, sin pasar por un DataFrame: los strings se
+    convierten a float de una sola vez y el resto de las columnas ni se toca.
+    """
+    n = len(raw)
+    values = np.fromiter(chain.from_iterable(row[1:6] for row in raw), dtype=dtype, count=5 * n)
+    columns = values.reshape(n, 5).T.copy()  # Una fila contigua por campo
+    out = {'open_time': np.fromiter((row[0] for row in raw), dtype=np.int64, count=n)}
+    out.update(zip(KLINE_FIELDS, columns))
+    return out
+
+
+def resample(frame, minutes):
+    """
+    Arma velas de `minutes` minutos a partir de velas de 1m.
+
+    Los cortes están alineados como en Binance (múltiplos de `minutes` desde
+    epoch, en UTC). El primer bloque se descarta si está incompleto (no
+    empieza en su borde); el último se deja aunque esté en curso, igual que
+    la vela actual que devuelve el exchange.
+    """
+    t = np.asarray(frame['open_time'], dtype=np.int64)
+    if len(t) == 0:
+        return {key: np.asarray(frame[key])[:0] for key in frame}
+    step = minutes * MINUTE_MS
+    bucket = t // step
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(t)]
+
+    out = {
+        'open_time': bucket[starts] * step,
+        'open': np.asarray(frame['open'], dtype=np.float64)[starts],
+        'high': np.maximum.reduceat(np.asarray(frame['high'], dtype=np.float64), starts),
+        'low': np.minimum.reduceat(np.asarray(frame['low'], dtype=np.float64), starts),
+        'close': np.asarray(frame['close'], dtype=np.float64)[ends - 1],
+    }
+    if 'volume' in frame:
+        out['volume'] = np.add.reduceat(np.asarray(frame['volume'], dtype=np.float64), starts)
+
+    if t[0] != bucket[0] * step:
+        out = {key: values[1:] for key, values in out.items()}
+    return out
+
+
+def tail(frame, n):
+    """Últimas n velas de un dict de arrays."""
+    return {key: np.asarray(values)[-n:] for key, values in frame.items()}
+
+
+def interval_ms(interval):
+    """Duración de un intervalo de Binance ('1m', '15m', '4h', '1d', '1w') en ms."""
+    units = {'m': 1, 'h': 60, 'd': 1440, 'w': 10080}
+    return int(interval[:-1]) * units[interval[-1]] * MINUTE_MS
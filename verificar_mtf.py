@@ -0,0 +1,131 @@
+import json
+import os
+import sys
+import tempfile
+import numpy as np
+import requests
+import velas
+
+# ==========================================
+# 🔬 VERIFICACIÓN: VELAS 3m/5m/1h DERIVADAS DE 1m vs NATIVAS DEL EXCHANGE
+# ==========================================
+# 1) Grabar el fixture del repo (necesita conexión; se commitea fixture_mtf.json):
+#      python verificar_mtf.py grabar [fixture.json] [BTCUSDT ETHUSDT SOLUSDT]
+# 2) Verificar (offline, las veces que haga falta; sale con 1 si algo difiere):
+#      python verificar_mtf.py [fixture.json]
+# 3) Chequeo de referencia sin conexión (NO reemplaza al fixture grabado):
+#      python verificar_mtf.py referencia
+#    Arma las 3m/5m/1h "nativas" con una agregación en Python puro, vela por
+#    vela, desde una historia de 1m más larga que la que ve el bot (como el
+#    exchange, que sí tiene el bloque inicial completo).
+#
+# Se comparan todas las velas CERRADAS que aparecen en ambas series. La vela
+# en curso se informa aparte: entre un pedido y otro pudo haber cambiado.
+# Mientras fixture_mtf.json no esté grabado, MTF_FROM_1M (bot_scalper) solo
+# está verificado contra la referencia, no contra el exchange.
+
+BASE_URL = "https://fapi.binance.com"
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixture_mtf.json')
+FIXTURE_SYMBOLS = ['BTCUSDT', 'ETHUSDT', 'SOLUSDT']
+NATIVE = {'3m': (3, 35), '5m': (5, 35), '1h': (60, 2)}
+MTF_1M_LIMIT = 185
+
+
+def to_frame(raw):
+    arr = np.array([row[:5] for row in raw], dtype=np.float64)
+    return {'open_time': arr[:, 0].astype(np.int64), 'open': arr[:, 1], 'high': arr[:, 2],
+            'low': arr[:, 3], 'close': arr[:, 4]}
+
+
+def record(path, symbols):
+    fixture = {}
+    for symbol in symbols:
+        fixture[symbol] = {}
+        for interval, limit in [('1m', MTF_1M_LIMIT)] + [(tf, n) for tf, (_, n) in NATIVE.items()]:
+            params = {'symbol': symbol, 'interval': interval, 'limit': limit}
+            fixture[symbol][interval] = requests.get(BASE_URL + "/fapi/v1/klines", params=params, timeout=10).json()
+    with open(path, 'w') as f:
+        json.dump(fixture, f)
+    print(f"💾 Fixture guardado: {path} ({len(symbols)} monedas)")
+
+
+def reference_fixture(symbols=('AAAUSDT', 'BBBUSDT', 'CCCUSDT'), seed=7):
+    """Fixture sintético: 1m como las ve el bot y nativas agregadas vela por vela desde más historia."""
+    rng = np.random.default_rng(seed)
+    minute = velas.MINUTE_MS
+    history = MTF_1M_LIMIT + 2 * 60                      # El exchange tiene el bloque inicial completo
+    now = (1_700_000_000_000 // minute + int(rng.integers(0, 60))) * minute  # Vela en curso a mitad de hora
+    fixture = {}
+    for symbol in symbols:
+        opens = [now - (history - 1 - i) * minute for i in range(history)]
+        closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, history)))
+        rows = []
+        for t, c in zip(opens, closes):
+            o = c * (1 + rng.normal(0, 0.001))
+            h, l = max(o, c) * (1 + abs(rng.normal(0, 0.001))), min(o, c) * (1 - abs(rng.normal(0, 0.001)))
+            rows.append([t, f"{o:.4f}", f"{h:.4f}", f"{l:.4f}", f"{c:.4f}", "1.0", t + minute - 1, "1.0", 1, "0", "0", "0"])
+        fixture[symbol] = {'1m': rows[-MTF_1M_LIMIT:]}
+        for tf, (minutes, limit) in NATIVE.items():
+            buckets = {}
+            for row in rows:
+                buckets.setdefault(row[0] // (minutes * minute) * minutes * minute, []).append(row)
+            native = []
+            for start in sorted(buckets)[1:]:  # El primero puede estar cortado por el principio de la historia
+                group = buckets[start]
+                native.append([start, group[0][1], max(group, key=lambda r: float(r[2]))[2],
+                               min(group, key=lambda r: float(r[3]))[3], group[-1][4]])
+            fixture[symbol][tf] = native[-limit:]
+    return fixture
+
+
+def verify(path):
+    with open(path) as f:
+        fixture = json.load(f)
+
+    failures = 0
+    for symbol, series in fixture.items():
+        one_minute = to_frame(series['1m'])
+        for tf, (minutes, _) in NATIVE.items():
+            if tf not in series:
+                print(f"{symbol} {tf}: ❌ falta en el fixture")
+                failures += 1
+                continue
+            derived = velas.resample(one_minute, minutes)
+            native = to_frame(series[tf])
+            # Velas cerradas presentes en ambas (se excluye la última de cada serie)
+            common = np.intersect1d(derived['open_time'][:-1], native['open_time'][:-1])
+            d_idx = np.searchsorted(derived['open_time'], common)
+            n_idx = np.searchsorted(native['open_time'], common)
+            bad = [col for col in ('open', 'high', 'low', 'close')
+                   if not np.array_equal(derived[col][d_idx], native[col][n_idx])]
+            if len(common) == 0:
+                bad.append('ninguna vela en común')
+            forming = derived['open_time'][-1] == native['open_time'][-1]
+            status = "✅" if not bad else f"❌ distintas: {', '.join(bad)}"
+            failures += bool(bad)
+            print(f"{symbol} {tf}: {len(common)} velas cerradas comparadas {status} | "
+                  f"vela en curso alineada: {'sí' if forming else 'no'}")
+
+    print("✅ Todo coincide." if failures == 0 else f"❌ {failures} series con diferencias.")
+    return failures == 0
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args and args[0] == 'grabar':
+        path = args[1] if len(args) > 1 and args[1].endswith('.json') else FIXTURE_PATH
+        record(path, [a for a in args[1:] if not a.endswith('.json')] or FIXTURE_SYMBOLS)
+    elif args and args[0] == 'referencia':
+        path = os.path.join(tempfile.mkdtemp(), 'referencia_mtf.json')
+        with open(path, 'w') as f:
+            json.dump(reference_fixture(), f)
+        print("🧪 Referencia sintética (agregación vela por vela, NO velas del exchange)")
+        sys.exit(0 if verify(path) else 1)
+    elif len(args) <= 1:
+        path = args[0] if args else FIXTURE_PATH
+        if not os.path.exists(path):
+            print(f"❌ No hay fixture grabado en {path}: python verificar_mtf.py grabar (necesita conexión)")
+            sys.exit(2)
+        sys.exit(0 if verify(path) else 1)
+    else:
+        print("Uso: python verificar_mtf.py [fixture.json] | grabar [fixture.json] [SIMBOLOS...] | referencia")
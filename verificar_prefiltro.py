@@ -0,0 +1,70 @@
+import sys
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import backtest
+import universo
+
+# ==========================================
+# 🔬 VERIFICACIÓN: PRE-FILTRO DEL UNIVERSO vs ESCANEO COMPLETO
+# ==========================================
+# Repite la historia minuto a minuto con velas de 1m locales (mismo formato
+# que backtest.py, con BTCUSDT_1m para el filtro BTC):
+#   - escaneo completo: las señales del scalper en cada vela (backtest.signals)
+#   - pre-filtro: la posición del cierre en el rango de los últimos
+#     PRESCREEN_WINDOW cierres, como la ve el bot con los precios del ticker
+# y cuenta, para varios umbrales, qué porcentaje de monedas pasa (= pedidos
+# de velas que se siguen haciendo) y cuántas señales del escaneo completo
+# quedan afuera.
+#
+# Uso: python verificar_prefiltro.py <carpeta_velas_1m>
+
+THRESHOLDS = [(0.2, 0.8), (0.25, 0.75), (0.35, 0.65), (0.5, 0.5)]  # (LOW_POSITION, HIGH_POSITION)
+
+
+def replay_symbol(symbol, path, btc_path):
+    frame = backtest.load_candles(path)
+    table = backtest.indicator_table(frame, 'scalper')
+    btc = backtest.btc_change(frame, backtest.load_candles(btc_path) if btc_path else None)
+    signals = backtest.signals('scalper', table, symbol, btc)
+
+    # Lados posibles en cada vela según las condiciones sin timeframe (filtro BTC)
+    rules = backtest.RULES['scalper']
+    allowed = rules.masks(rules.matrix({'btc_chg': btc}, len(btc)), timeframes=[None])
+    sides = {side: np.zeros(len(btc), dtype=bool) for side in ('low', 'high')}
+    for r, name in enumerate(rules.names):
+        for side in universo.SIDE.get(name, {'low', 'high'}):
+            sides[side] |= allowed[:, r]
+
+    position = universo.rolling_position(frame['close'])
+    valid = table['valid']
+    fired = np.zeros(len(btc), dtype=bool)
+    for mask in signals.values():
+        fired |= mask
+    out = []
+    for low, high in THRESHOLDS:
+        with np.errstate(invalid='ignore'):
+            keep = np.isnan(position) | (sides['low'] & (position <= low)) | (sides['high'] & (position >= high))
+        out.append((int((keep & valid).sum()), int(valid.sum()), int((fired & ~keep).sum()), int(fired.sum())))
+    return out
+
+
+def run(folder, workers=None):
+    files = backtest.find_files(folder, '1m')
+    btc_path = files.get('BTCUSDT')
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(replay_symbol, files, files.values(), [btc_path] * len(files)))
+    print(f"🔬 {len(files)} monedas en {time.perf_counter() - t0:.1f}s | ventana {universo.PRESCREEN_WINDOW} min "
+          f"(en uso: {universo.LOW_POSITION}/{universo.HIGH_POSITION})")
+    print(f"{'bajo/alto':>10}{'pasan':>9}{'señales':>9}{'perdidas':>10}")
+    for i, (low, high) in enumerate(THRESHOLDS):
+        kept, total, missed, fired = (sum(part[i][k] for part in parts) for k in range(4))
+        print(f"{low:>5}/{high:<4}{kept / max(total, 1) * 100:>8.1f}%{fired:>9}{missed:>6} ({missed / max(fired, 1) * 100:.1f}%)")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Uso: python verificar_prefiltro.py <carpeta_velas_1m>")
+        sys.exit(1)
+    run(sys.argv[1])